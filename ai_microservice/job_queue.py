@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Durable job queue for the slow AI endpoints (audit, docs, issues, auto-fix...).
+# Jobs live in a local SQLite file so they survive a restart; a small pool of
+# worker threads in this one process drains them. Identical submissions (same
+# type + payload) are collapsed onto the job that is already queued/running or
+# recently finished.
+#
+# Only a raising handler is retried. A handler that returns {"error": ...}
+# reached the AI service and got an answer (and may have had side effects,
+# e.g. an auto-fix PR), so that job fails without another attempt.
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3"))
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 5          # seconds, doubled on every attempt
+DEDUP_WINDOW = 600         # reuse a succeeded job's result for 10 minutes
+KEEP_FINISHED_FOR = 7 * 24 * 3600
+
+HANDLERS = {}
+
+
+def register(job_type, func):
+    """Registers `func(payload: dict) -> dict` as the handler for `job_type`."""
+    HANDLERS[job_type] = func
+
+
+def input_hash(job_type, payload, ref=""):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{job_type}:{ref}:{canonical}".encode("utf-8")).hexdigest()
+
+
+def _to_dict(row):
+    return {
+        "id": row["id"],
+        "type": row["type"],
+        "ref": row["ref"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "finished_at": row["finished_at"],
+    }
+
+
+class JobQueue:
+    def __init__(self, db_path=JOB_DB_PATH):
+        self.db_path = db_path
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._workers = []
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    ref TEXT NOT NULL DEFAULT '',
+                    payload TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    run_after REAL NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, run_after);
+                CREATE INDEX IF NOT EXISTS jobs_input_hash ON jobs (input_hash, status);
+            """)
+        finally:
+            conn.close()
+
+    # --- Producer side ---
+
+    def enqueue(self, job_type, payload, ref=""):
+        """
+        Adds a job and returns its status dict.
+        `ref` is an opaque caller tag (e.g. "project:12") echoed back on reads.
+        If the same input is already queued/running, or succeeded within
+        DEDUP_WINDOW, that job is returned instead of creating a new one.
+        """
+        digest = input_hash(job_type, payload, ref)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE input_hash = ?
+                  AND (status IN ('queued', 'running') OR (status = 'succeeded' AND finished_at > ?))
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (digest, now - DEDUP_WINDOW),
+            ).fetchone()
+            if existing:
+                conn.execute("COMMIT")
+                return _to_dict(existing)
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, type, ref, payload, input_hash, run_after, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job_type, ref, json.dumps(payload), digest, now, now),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        self._wakeup.set()
+        return _to_dict(row)
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return _to_dict(row) if row else None
+
+    def depth(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {row["status"]: row["n"] for row in rows}
+
+    # --- Worker side ---
+
+    def _claim(self, conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY run_after, created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, conn, job_id, result):
+        conn.execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, finished_at = ? WHERE id = ?",
+            (json.dumps(result, default=str), time.time(), job_id),
+        )
+
+    def _fail(self, conn, row, error):
+        attempts = row["attempts"] + 1
+        if attempts < MAX_ATTEMPTS:
+            delay = RETRY_BACKOFF * (2 ** (attempts - 1))
+            print(f"Job {row['id']} ({row['type']}) failed attempt {attempts}, retrying in {delay}s: {error}")
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_after = ? WHERE id = ?",
+                (error, time.time() + delay, row["id"]),
+            )
+        else:
+            print(f"Job {row['id']} ({row['type']}) failed permanently: {error}")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, time.time(), row["id"]),
+            )
+
+    def _run(self, conn, row):
+        handler = HANDLERS.get(row["type"])
+        if handler is None:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (f"No handler registered for job type '{row['type']}'", time.time(), row["id"]),
+            )
+            return
+
+        try:
+            result = handler(json.loads(row["payload"]))
+        except Exception as e:
+            self._fail(conn, row, str(e))
+            return
+
+        # The AI endpoints report failures as {"error": ...} rather than raising.
+        if isinstance(result, dict) and result.get("error"):
+            print(f"Job {row['id']} ({row['type']}) returned an error: {result['error']}")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, result = ?, finished_at = ? WHERE id = ?",
+                (str(result["error"]), json.dumps(result, default=str), time.time(), row["id"]),
+            )
+        else:
+            self._finish(conn, row["id"], result)
+
+    def _worker_loop(self):
+        conn = self._connect()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    row = self._claim(conn)
+                except sqlite3.OperationalError as e:
+                    print(f"Job queue claim error: {e}")
+                    row = None
+
+                if row is None:
+                    self._wakeup.wait(timeout=1.0)
+                    self._wakeup.clear()
+                    continue
+
+                self._run(conn, row)
+        finally:
+            conn.close()
+
+    def _recover(self):
+        """
+        Re-queues jobs left 'running' by the previous process (no other process
+        runs this queue, so none of them is still in progress) and prunes old
+        finished jobs. A job that has used all its attempts is failed instead.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE status = 'running' AND attempts >= ?",
+                ("Interrupted by a restart on its last attempt", now, MAX_ATTEMPTS),
+            )
+            recovered = conn.execute(
+                "UPDATE jobs SET status = 'queued', run_after = ? WHERE status = 'running'",
+                (now,),
+            ).rowcount
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (now - KEEP_FINISHED_FOR,),
+            )
+        finally:
+            conn.close()
+        if recovered:
+            print(f"Job queue: re-queued {recovered} interrupted job(s).")
+
+    def start(self, num_workers=4):
+        if self._workers:
+            return
+        self._recover()
+        self._stopping.clear()
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f"Job queue started with {num_workers} workers ({self.db_path}).")
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wakeup.set()
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
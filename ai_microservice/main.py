@@ -1,6 +1,6 @@
 # In ai_microservice/main.py
 
-from fastapi import FastAPI
+from fastapi import FastAPI, File, Form, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from fastapi.responses import StreamingResponse
@@ -191,6 +191,9 @@ groq_manager = GroqKeyManager()
 class TextIn(BaseModel):
     text: str
 
+class TextBatchIn(BaseModel):
+    texts: list[str]
+
 class CodeReviewIn(BaseModel):
     code: str
     filename: str
@@ -676,6 +679,7 @@ class MCPChatIn(BaseModel):
     user_message: str
     student_username: str # Required to fetch context
     github_repo_link: str = "" # Optional
+    project_context: str = "" # Stored snapshot sent by Django; saves the tool round trips
 
 @app.post("/mcp-chat")
 def mcp_chat(data: MCPChatIn):
@@ -686,6 +690,8 @@ def mcp_chat(data: MCPChatIn):
     try:
         client = DjangoMCPClient()
         history = [] # To track tool results for the final answer
+        if data.project_context:
+            history.append({"step": 0, "tool": "get_full_project_report", "observation": data.project_context})
         
         # Max 3 agentic steps to avoid infinite loops/high costs
         max_steps = 3
@@ -777,32 +783,76 @@ def mcp_chat(data: MCPChatIn):
 def read_root():
     return {"status": "AI Microservice is running."}
 
+KEYWORD_MODEL = "ml6team/keyphrase-extraction-distilbert-inspec"
+SUMMARY_MODEL = "google/pegasus-xsum"
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+
+# Max texts per HF Inference call in the :batch endpoints.
+HF_BATCH_SIZE = 16
+
+def _parse_keywords(entities):
+    # Token Classification output: [{'word': ..., 'score': ...}, ...]
+    if isinstance(entities, list) and (not entities or 'word' in entities[0]):
+        return {"keywords": list(set([item['word'] for item in entities if item.get('score', 0) > 0.5]))}
+    return {"keywords": ["API Error"]}
+
+def _parse_summary(item):
+    if isinstance(item, dict) and 'summary_text' in item:
+        return {"summary": item['summary_text']}
+    return {"summary": "Summary unavailable."}
+
+def _parse_sentiment(scores):
+    # scores: [{'label': 'LABEL_0', 'score': 0.9}, ...]
+    if not isinstance(scores, list) or not scores:
+        return {"sentiment": "Neutral", "raw_label": "Unknown"}
+    scores = sorted(scores, key=lambda x: x['score'], reverse=True)
+    top_label = scores[0]['label']
+
+    sentiment = "Neutral"
+    if top_label == 'LABEL_0': sentiment = "Negative"
+    elif top_label == 'LABEL_2': sentiment = "Positive"
+
+    return {"sentiment": sentiment, "raw_label": top_label}
+
+def query_hf_api_batch(texts, model_id, parse_item):
+    """
+    Sends `texts` to the HF Inference API in chunks of HF_BATCH_SIZE and
+    returns one parsed result per input, in input order.
+    A failed chunk yields {"error": ...} for each of its items.
+    """
+    results = []
+    for start in range(0, len(texts), HF_BATCH_SIZE):
+        chunk = texts[start:start + HF_BATCH_SIZE]
+        output = query_hf_api({"inputs": chunk}, model_id)
+
+        if isinstance(output, dict) and 'error' in output:
+            results.extend({"error": output['error']} for _ in chunk)
+            continue
+        if not isinstance(output, list) or len(output) != len(chunk):
+            results.extend({"error": "Unexpected HF API response."} for _ in chunk)
+            continue
+
+        results.extend(parse_item(item) for item in output)
+    return results
+
 @app.post("/extract-keywords")
 def extract_keywords(data: TextIn):
     try:
-        # Use simple extraction or API
-        # ml6team/keyphrase-extraction-distilbert-inspec
-        output = query_hf_api({"inputs": data.text}, "ml6team/keyphrase-extraction-distilbert-inspec")
-        
-        if isinstance(output, list) and output and 'word' in output[0]:
-             # Handle Token Classification output
-             keywords = list(set([item['word'] for item in output if item.get('score', 0) > 0.5]))
-             return {"keywords": keywords}
-        elif isinstance(output, dict) and 'error' in output:
+        output = query_hf_api({"inputs": data.text}, KEYWORD_MODEL)
+        
+        if isinstance(output, dict) and 'error' in output:
              return {"error": output['error']}
-             
-        return {"keywords": ["API Error"]}
+        return _parse_keywords(output)
     except Exception as e:
         return {"error": f"Failed to extract keywords: {str(e)}"}
 
 @app.post("/summarize")
 def summarize_text(data: TextIn):
     try:
-        # google/pegasus-xsum
-        output = query_hf_api({"inputs": data.text}, "google/pegasus-xsum")
+        output = query_hf_api({"inputs": data.text}, SUMMARY_MODEL)
         
-        if isinstance(output, list) and output and 'summary_text' in output[0]:
-            return {"summary": output[0]['summary_text']}
+        if isinstance(output, list) and output:
+            return _parse_summary(output[0])
         elif isinstance(output, dict) and 'error' in output:
              return {"error": output['error']}
              
@@ -814,21 +864,11 @@ def summarize_text(data: TextIn):
 @app.post("/sentiment")
 def analyze_sentiment(data: TextIn):
     try:
-        # cardiffnlp/twitter-roberta-base-sentiment
         # This returns list of list of dicts: [[{'label': 'LABEL_0', 'score': 0.9}]]
-        output = query_hf_api({"inputs": data.text[:512]}, "cardiffnlp/twitter-roberta-base-sentiment")
+        output = query_hf_api({"inputs": data.text[:512]}, SENTIMENT_MODEL)
         
-        if isinstance(output, list) and isinstance(output[0], list):
-            # Get highest score label
-            scores = output[0]
-            scores.sort(key=lambda x: x['score'], reverse=True)
-            top_label = scores[0]['label']
-            
-            sentiment = "Neutral"
-            if top_label == 'LABEL_0': sentiment = "Negative"
-            elif top_label == 'LABEL_2': sentiment = "Positive"
-            
-            return {"sentiment": sentiment, "raw_label": top_label}
+        if isinstance(output, list) and output and isinstance(output[0], list):
+            return _parse_sentiment(output[0])
             
         elif isinstance(output, dict) and 'error' in output:
              return {"error": output['error']}
@@ -838,6 +878,32 @@ def analyze_sentiment(data: TextIn):
     except Exception as e:
         return {"error": f"Failed to analyze sentiment: {str(e)}"}
 
+# --- Batch variants (one request for many progress updates / submissions) ---
+# Each returns {"results": [...]} with one entry per input text, same order,
+# and the same per-item shape as the single-text endpoint.
+
+@app.post("/extract-keywords:batch")
+def extract_keywords_batch(data: TextBatchIn):
+    try:
+        return {"results": query_hf_api_batch(data.texts, KEYWORD_MODEL, _parse_keywords)}
+    except Exception as e:
+        return {"error": f"Failed to extract keywords: {str(e)}"}
+
+@app.post("/summarize:batch")
+def summarize_text_batch(data: TextBatchIn):
+    try:
+        return {"results": query_hf_api_batch(data.texts, SUMMARY_MODEL, _parse_summary)}
+    except Exception as e:
+        return {"error": f"Failed to summarize text: {str(e)}"}
+
+@app.post("/sentiment:batch")
+def analyze_sentiment_batch(data: TextBatchIn):
+    try:
+        texts = [t[:512] for t in data.texts]
+        return {"results": query_hf_api_batch(texts, SENTIMENT_MODEL, _parse_sentiment)}
+    except Exception as e:
+        return {"error": f"Failed to analyze sentiment: {str(e)}"}
+
 # --- (NEW) Code Review Endpoint ---
 @app.post("/review-code")
 def review_code(data: CodeReviewIn):
@@ -1008,8 +1074,11 @@ def verify_checkpoint(data: CheckpointVerificationIn):
     except Exception as e:
         return {"error": f"Verification failed: {str(e)}"}
 
-@app.post("/verify-assignment")
-def verify_assignment(data: AssignmentVerificationIn):
+# Longest edge of images passed to the vision model (callers should already
+# downscale; this guards against a raw 12MP photo slipping through).
+VISION_IMAGE_MAX_EDGE = 1600
+
+def _verify_assignment(data: AssignmentVerificationIn, image=None):
     try:
         # Construct the prompt parts
         prompt_parts = []
@@ -1042,20 +1111,10 @@ def verify_assignment(data: AssignmentVerificationIn):
         prompt_parts.append(text_prompt)
 
         # Add image if present
-        if data.image_data:
-            try:
-                import base64
-                from PIL import Image
-                import io
-                
-                # Decode base64 string
-                image_bytes = base64.b64decode(data.image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                prompt_parts.append(image)
-                print("Image added to prompt successfully.")
-            except Exception as img_err:
-                print(f"Error processing image: {img_err}")
-                # Fallback to text only if image fails
+        if image is not None:
+            image.thumbnail((VISION_IMAGE_MAX_EDGE, VISION_IMAGE_MAX_EDGE))
+            prompt_parts.append(image)
+            print("Image added to prompt successfully.")
         
         response = generate_with_retry(gemini_model, prompt_parts)
         text = response.text.strip()
@@ -1080,6 +1139,53 @@ def verify_assignment(data: AssignmentVerificationIn):
     except Exception as e:
         return {"error": f"Verification failed: {str(e)}"}
 
+@app.post("/verify-assignment")
+def verify_assignment(data: AssignmentVerificationIn):
+    image = None
+    if data.image_data:
+        try:
+            import base64
+            from PIL import Image
+            import io
+            
+            # Decode base64 string
+            image_bytes = base64.b64decode(data.image_data)
+            image = Image.open(io.BytesIO(image_bytes))
+        except Exception as img_err:
+            print(f"Error processing image: {img_err}")
+            # Fallback to text only if image fails
+    return _verify_assignment(data, image)
+
+@app.post("/verify-assignment:upload")
+def verify_assignment_upload(
+    assignment_type: str = Form(...),
+    description: str = Form(...),
+    text_content: str = Form(""),
+    project_context: str = Form(""),
+    image: UploadFile = File(None),
+):
+    """
+    Multipart variant of /verify-assignment. The image arrives as raw bytes
+    (spooled to disk by the server for large files) and PIL reads it from
+    the file handle, instead of a base64 string decoded in memory.
+    """
+    data = AssignmentVerificationIn(
+        assignment_type=assignment_type,
+        description=description,
+        text_content=text_content,
+        project_context=project_context,
+    )
+    pil_image = None
+    if image is not None:
+        try:
+            from PIL import Image
+            pil_image = Image.open(image.file)
+            pil_image.load()
+        except Exception as img_err:
+            print(f"Error processing image: {img_err}")
+            # Fallback to text only if image fails
+    return _verify_assignment(data, pil_image)
+
 @app.post("/generate-project-graph")
 def generate_project_graph(data: ProjectGraphIn):
     try:
@@ -1912,6 +2018,7 @@ def analyze_issues(data: AuditCodeIn):
 class MCPTeacherChatIn(BaseModel):
     student_username: str
     user_message: str
+    project_context: str = ""
 
 @app.post("/mcp-teacher-chat")
 def mcp_teacher_chat(data: MCPTeacherChatIn):
@@ -1922,6 +2029,8 @@ def mcp_teacher_chat(data: MCPTeacherChatIn):
     try:
         client = DjangoMCPClient()
         history = []
+        if data.project_context:
+            history.append({"step": 0, "tool": "get_full_project_report", "observation": data.project_context})
         max_steps = 4 # Teachers get more depth
         
         for step in range(max_steps):
@@ -1941,6 +2050,7 @@ def mcp_teacher_chat(data: MCPTeacherChatIn):
             6. `get_tasks`: Kanban board status.
             7. `get_assignments`: Active assignments.
             8. `get_project_artifacts`: Uploaded documents.
+            9. `get_full_project_report`: Everything above plus report critique & code reviews, in one call (prefer this for broad questions).
             
             Teacher Question: "{data.user_message}"
             
@@ -1974,6 +2084,7 @@ def mcp_teacher_chat(data: MCPTeacherChatIn):
             elif tool_name == "get_tasks": result = client.get_tasks(data.student_username)
             elif tool_name == "get_assignments": result = client.get_assignments(data.student_username)
             elif tool_name == "get_project_artifacts": result = client.get_project_artifacts(data.student_username)
+            elif tool_name == "get_full_project_report": result = client.get_full_project_report(data.student_username)
             else: result = f"Unknown tool: {tool_name}"
             
             history.append({"step": step+1, "tool": tool_name, "observation": result})
@@ -2064,3 +2175,50 @@ async def generate_refactor(request: RefactorRequest):
     except Exception as e:
         print(f"Refactor generation failed: {e}")
         return {"error": str(e)}
+
+
+# --- Background Jobs ---
+# The slow endpoints (repo audits, docs, issue analysis, auto-fix PRs, deep
+# reports) take 10-90s. Callers can enqueue them here and poll for the result
+# instead of holding a request open for the whole run.
+from fastapi.responses import JSONResponse
+import job_queue
+
+job_queue.register("audit-code", lambda payload: audit_code(AuditCodeIn(**payload)))
+job_queue.register("generate-docs", lambda payload: generate_docs(AuditCodeIn(**payload)))
+job_queue.register("analyze-issues", lambda payload: analyze_issues(AuditCodeIn(**payload)))
+job_queue.register("auto-fix", lambda payload: auto_fix(AutoFixIn(**payload)))
+job_queue.register("generate-deep-report", lambda payload: generate_deep_report(DeepReportIn(**payload)))
+
+jobs = job_queue.JobQueue()
+
+class JobIn(BaseModel):
+    type: str
+    payload: dict
+    ref: str = ""
+
+@app.on_event("startup")
+def start_job_workers():
+    jobs.start(num_workers=int(os.getenv("JOB_WORKERS", "4")))
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    jobs.stop()
+
+@app.post("/jobs")
+def create_job(data: JobIn):
+    if data.type not in job_queue.HANDLERS:
+        return JSONResponse({"error": f"Unknown job type '{data.type}'"}, status_code=400)
+    job = jobs.enqueue(data.type, data.payload, data.ref)
+    return JSONResponse({"job_id": job["id"], "status": job["status"]}, status_code=202)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return job
+
+@app.get("/jobs")
+def job_queue_depth():
+    return {"depth": jobs.depth()}
@@ -75,5 +75,9 @@ class DjangoMCPClient:
         """Fetches group info."""
         return self.call_tool("get_group_details", {"student_username": student_username})
 
+    def get_full_project_report(self, student_username: str) -> str:
+        """Fetches the whole stored project context (one snapshot row)."""
+        return self.call_tool("get_full_project_report", {"student_username": student_username})
+
     def get_all_abstracts(self):
         return self.call_tool("get_all_project_abstracts", {})
@@ -0,0 +1,75 @@
+# Run from ai_microservice/: python -m unittest discover tests
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _sentiment_output(labels):
+    """HF text-classification output: one score list per input."""
+    return [[{'label': label, 'score': 0.9}, {'label': 'LABEL_1', 'score': 0.1}] for label in labels]
+
+
+class QueryHFBatchTest(unittest.TestCase):
+    def test_chunks_keep_input_order(self):
+        texts = [f"text {i}" for i in range(40)]
+        calls = []
+
+        def fake_query(payload, model_id):
+            calls.append(list(payload['inputs']))
+            return [{'summary_text': t.upper()} for t in payload['inputs']]
+
+        with patch.object(main, 'query_hf_api', side_effect=fake_query):
+            results = main.query_hf_api_batch(texts, main.SUMMARY_MODEL, main._parse_summary)
+
+        self.assertEqual([len(chunk) for chunk in calls], [16, 16, 8])
+        self.assertEqual([r['summary'] for r in results], [t.upper() for t in texts])
+
+    def test_failed_chunk_marks_only_its_items(self):
+        texts = [f"text {i}" for i in range(20)]
+        outputs = [{'error': 'Model loading'}, _sentiment_output(['LABEL_2'] * 4)]
+
+        with patch.object(main, 'query_hf_api', side_effect=outputs):
+            results = main.query_hf_api_batch(texts, main.SENTIMENT_MODEL, main._parse_sentiment)
+
+        self.assertEqual(results[:16], [{'error': 'Model loading'}] * 16)
+        self.assertEqual([r['sentiment'] for r in results[16:]], ['Positive'] * 4)
+
+    def test_short_response_is_an_error_per_item(self):
+        with patch.object(main, 'query_hf_api', return_value=_sentiment_output(['LABEL_0'])):
+            results = main.query_hf_api_batch(['a', 'b'], main.SENTIMENT_MODEL, main._parse_sentiment)
+        self.assertEqual(results, [{'error': 'Unexpected HF API response.'}] * 2)
+
+
+class BatchEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_sentiment_batch_truncates_and_matches_single_shape(self):
+        seen = []
+
+        def fake_query(payload, model_id):
+            seen.extend(payload['inputs'])
+            return _sentiment_output(['LABEL_0', 'LABEL_2'])
+
+        with patch.object(main, 'query_hf_api', side_effect=fake_query):
+            response = self.client.post('/sentiment:batch', json={'texts': ['x' * 600, 'fine']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'sentiment': 'Negative', 'raw_label': 'LABEL_0'},
+            {'sentiment': 'Positive', 'raw_label': 'LABEL_2'},
+        ])
+        self.assertEqual(len(seen[0]), 512)
+
+    def test_keywords_batch(self):
+        output = [[{'word': 'django', 'score': 0.9}, {'word': 'noise', 'score': 0.1}], []]
+        with patch.object(main, 'query_hf_api', return_value=output):
+            response = self.client.post('/extract-keywords:batch', json={'texts': ['a', 'b']})
+        self.assertEqual(response.json()['results'], [{'keywords': ['django']}, {'keywords': []}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# Run from ai_microservice/: python -m unittest discover tests
+import os
+import tempfile
+import time
+import unittest
+
+import job_queue
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = job_queue.JobQueue(os.path.join(self.tmp.name, "jobs.sqlite3"))
+        self.conn = self.queue._connect()
+        self.calls = 0
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+        job_queue.HANDLERS.pop("test-job", None)
+
+    def _register(self, func):
+        def handler(payload):
+            self.calls += 1
+            return func(payload)
+        job_queue.register("test-job", handler)
+
+    def _run_next(self):
+        row = self.queue._claim(self.conn)
+        self.assertIsNotNone(row)
+        self.queue._run(self.conn, row)
+        return self.queue.get(row["id"])
+
+    def _make_due(self, job_id):
+        self.conn.execute("UPDATE jobs SET run_after = 0 WHERE id = ?", (job_id,))
+
+    def test_error_result_fails_without_retry(self):
+        self._register(lambda payload: {"error": "Repo not found"})
+        self.queue.enqueue("test-job", {"repo": "x"})
+        job = self._run_next()
+        self.assertEqual((job["status"], job["attempts"], self.calls), ("failed", 1, 1))
+        self.assertEqual(job["result"], {"error": "Repo not found"})
+
+    def test_exception_retries_with_backoff(self):
+        def boom(payload):
+            raise RuntimeError("timeout")
+        self._register(boom)
+        job_id = self.queue.enqueue("test-job", {"repo": "x"})["id"]
+
+        before = time.time()
+        job = self._run_next()
+        self.assertEqual(job["status"], "queued")
+        run_after = self.conn.execute("SELECT run_after FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        self.assertGreaterEqual(run_after, before + job_queue.RETRY_BACKOFF)
+        self.assertIsNone(self.queue._claim(self.conn)) # not due yet
+
+        for _ in range(job_queue.MAX_ATTEMPTS - 1):
+            self._make_due(job_id)
+            job = self._run_next()
+        self.assertEqual((job["status"], job["attempts"]), ("failed", job_queue.MAX_ATTEMPTS))
+
+    def test_restart_requeues_interrupted_jobs(self):
+        self._register(lambda payload: {"ok": True})
+        fresh = self.queue.enqueue("test-job", {"n": 1})
+        spent = self.queue.enqueue("test-job", {"n": 2})
+        # Both were mid-run when the process died, a moment ago
+        self.queue._claim(self.conn)
+        self.queue._claim(self.conn)
+        self.conn.execute("UPDATE jobs SET attempts = ? WHERE id = ?", (job_queue.MAX_ATTEMPTS, spent["id"]))
+
+        self.queue._recover()
+        self.assertEqual(self.queue.get(fresh["id"])["status"], "queued")
+        self.assertEqual(self.queue.get(spent["id"])["status"], "failed")
+        # A new request for the same input attaches to the re-queued job, which runs
+        self.assertEqual(self.queue.enqueue("test-job", {"n": 1})["id"], fresh["id"])
+        self.assertEqual(self._run_next()["status"], "succeeded")
+
+
+if __name__ == '__main__':
+    unittest.main()
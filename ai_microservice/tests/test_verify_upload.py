@@ -0,0 +1,52 @@
+# Run from ai_microservice/: python -m unittest discover tests
+import io
+import unittest
+from unittest.mock import Mock, patch
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+
+FORM = {'assignment_type': 'Diagram', 'description': 'Draw the schema', 'text_content': 'See diagram'}
+VERDICT = Mock(text='```json\n{"is_approved": true, "score": 8, "feedback": "Clear."}\n```')
+
+
+def _jpeg(size):
+    buf = io.BytesIO()
+    Image.new('RGB', size, 'blue').save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+class VerifyAssignmentUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def _post(self, files=None):
+        with patch.object(main, 'generate_with_retry', return_value=VERDICT) as generate:
+            response = self.client.post('/verify-assignment:upload', data=FORM, files=files)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'is_approved': True, 'score': 8, 'feedback': 'Clear.'})
+        (_, prompt_parts), _ = generate.call_args
+        self.assertIn('Draw the schema', prompt_parts[0])
+        return prompt_parts
+
+    def test_image_is_passed_to_the_model(self):
+        prompt_parts = self._post({'image': ('submission.jpg', _jpeg((2400, 1200)), 'image/jpeg')})
+        self.assertEqual(len(prompt_parts), 2)
+        self.assertIsInstance(prompt_parts[1], Image.Image)
+        # An oversized image is still bounded before it reaches the model
+        self.assertEqual(prompt_parts[1].size, (1600, 800))
+
+    def test_text_only(self):
+        prompt_parts = self._post()
+        self.assertEqual(len(prompt_parts), 1)
+        self.assertIn('See diagram', prompt_parts[0])
+
+    def test_corrupt_image_falls_back_to_text(self):
+        prompt_parts = self._post({'image': ('submission.jpg', b'not really a jpeg', 'image/jpeg')})
+        self.assertEqual(len(prompt_parts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
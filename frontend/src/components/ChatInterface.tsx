@@ -1,14 +1,17 @@
 // frontend/src/components/ChatInterface.tsx
 import React, { useState, useEffect, useRef } from 'react';
 import {
-    Box, VStack, HStack, Text, Input, Avatar, Flex, Badge, Spinner, useToast, IconButton
+    Box, VStack, HStack, Text, Input, Avatar, Flex, Badge, Spinner, useToast, IconButton, Button
 } from '@chakra-ui/react';
 import * as Lucide from "lucide-react";
 import axios from 'axios';
 import { motion } from 'framer-motion';
+import { refreshAccessToken } from '../config/api';
 
 const { Send, Users, Hash, RefreshCw } = Lucide;
 const MotionBox = motion(Box);
+// Messages per page; older ones load on demand
+const PAGE_SIZE = 50;
 
 interface UserSimple {
     id: number;
@@ -42,6 +45,14 @@ const ChatInterface: React.FC<ChatProps> = ({ projectId, currentUser, teamMember
     const [refreshing, setRefreshing] = useState(false);
 
     const scrollRef = useRef<HTMLDivElement>(null);
+    // Cursor of the newest loaded message; refreshes fetch only what came after it
+    const latestCursor = useRef<string | null>(null);
+    // Cursor of the oldest loaded message; "Load older" pages back from it
+    const oldestCursor = useRef<string | null>(null);
+    const [hasOlder, setHasOlder] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    // Prepending older messages keeps the scroll position instead of jumping to the bottom
+    const keepScroll = useRef(false);
     const toast = useToast();
 
     const getChannelName = () => {
@@ -52,29 +63,46 @@ const ChatInterface: React.FC<ChatProps> = ({ projectId, currentUser, teamMember
     };
 
     // --- FETCH LOGIC (Manual / On-Load Only) ---
-    const fetchMessages = async (isRefresh = false) => {
+    // Initial load gets the latest page; later calls pass `since` and append.
+    const channelParams = () => {
+        const params = new URLSearchParams();
+        params.append('type', activeChannel);
+        if (activeChannel === 'DM' && dmTargetId) {
+            params.append('target_user_id', dmTargetId.toString());
+        }
+        params.append('limit', PAGE_SIZE.toString());
+        return params;
+    };
+
+    const fetchMessages = async (isRefresh = false, incremental = true) => {
         if (isRefresh) setRefreshing(true);
         try {
             const token = localStorage.getItem('accessToken');
             if (!projectId) return;
 
-            const params = new URLSearchParams();
-            params.append('type', activeChannel);
-            if (activeChannel === 'DM' && dmTargetId) {
-                params.append('target_user_id', dmTargetId.toString());
+            const params = channelParams();
+            const since = incremental ? latestCursor.current : null;
+            if (since) {
+                params.append('since', since);
             }
 
             const response = await axios.get(
                 `http://127.0.0.1:8000/projects/${projectId}/messages/?${params.toString()}`,
                 { headers: { Authorization: `Bearer ${token}` } }
             );
+            latestCursor.current = response.headers['x-latest-cursor'] || latestCursor.current;
+            if (!since) {
+                oldestCursor.current = response.headers['x-oldest-cursor'] || null;
+                setHasOlder(response.headers['x-has-more'] === 'true');
+            }
 
             // Deduplicate
-            const uniqueMsgs = response.data.filter((msg: Message, index: number, self: Message[]) =>
-                index === self.findIndex((m) => m.id === msg.id)
-            );
-
-            setMessages(uniqueMsgs);
+            setMessages((prev) => {
+                const merged = since ? [...prev, ...response.data] : response.data;
+                return merged.filter((msg: Message, index: number, self: Message[]) =>
+                    index === self.findIndex((m) => m.id === msg.id)
+                );
+            });
 
         } catch (err) {
             console.error("Chat load error", err);
@@ -85,6 +113,32 @@ const ChatInterface: React.FC<ChatProps> = ({ projectId, currentUser, teamMember
         }
     };
 
+    const loadOlder = async () => {
+        if (!oldestCursor.current) return;
+        setLoadingOlder(true);
+        try {
+            const token = localStorage.getItem('accessToken');
+            const params = channelParams();
+            params.append('before', oldestCursor.current);
+
+            const response = await axios.get(
+                `http://127.0.0.1:8000/projects/${projectId}/messages/?${params.toString()}`,
+                { headers: { Authorization: `Bearer ${token}` } }
+            );
+            oldestCursor.current = response.headers['x-oldest-cursor'] || oldestCursor.current;
+            setHasOlder(response.headers['x-has-more'] === 'true');
+            keepScroll.current = true;
+            setMessages((prev) => {
+                const known = new Set(prev.map((m) => m.id));
+                return [...response.data.filter((m: Message) => !known.has(m.id)), ...prev];
+            });
+        } catch (err) {
+            toast({ title: "Failed to load older messages", status: "error" });
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     // --- SEND LOGIC ---
     const handleSend = async () => {
         if (!newMessage.trim()) return;
@@ -110,15 +164,68 @@ const ChatInterface: React.FC<ChatProps> = ({ projectId, currentUser, teamMember
         }
     };
 
+    // Latest fetchMessages for the realtime listener (it closes over the active channel)
+    const fetchMessagesRef = useRef(fetchMessages);
+    fetchMessagesRef.current = fetchMessages;
+
     // --- EFFECTS ---
+    // Realtime push: new messages arrive over Server-Sent Events, then only the
+    // new rows are fetched (?since=). No polling.
+    useEffect(() => {
+        if (!projectId) return;
+        let source: EventSource | null = null;
+        let stopped = false;
+        let reopened = false; // one reopen per successful connection, so a refused stream can't loop
+
+        const open = () => {
+            const token = localStorage.getItem('accessToken');
+            if (!token || stopped) return;
+            const stream = new EventSource(
+                `http://127.0.0.1:8000/realtime/stream/?token=${encodeURIComponent(token)}&projects=${projectId}`
+            );
+            stream.addEventListener('message', (e) => {
+                const msg = JSON.parse((e as MessageEvent).data);
+                if (msg.project === projectId) fetchMessagesRef.current(false, true);
+            });
+            stream.addEventListener('resync', () => fetchMessagesRef.current(false, true));
+            stream.onopen = () => {
+                reopened = false;
+            };
+            // A reconnect refused for an expired access token closes the stream for good:
+            // reopen it with a refreshed token and catch up on what was missed
+            stream.onerror = () => {
+                if (stream.readyState !== EventSource.CLOSED || stopped || reopened) return;
+                reopened = true;
+                refreshAccessToken().then(() => {
+                    open();
+                    fetchMessagesRef.current(false, true);
+                }).catch(() => {});
+            };
+            source = stream;
+        };
+
+        open();
+        return () => {
+            stopped = true;
+            source?.close();
+        };
+    }, [projectId]);
+
     // Load messages when channel changes
     useEffect(() => {
         setLoading(true);
-        fetchMessages();
+        latestCursor.current = null;
+        oldestCursor.current = null;
+        setHasOlder(false);
+        fetchMessages(false, false);
     }, [activeChannel, dmTargetId, projectId]);
 
     // Auto-scroll to bottom when messages change
     useEffect(() => {
+        if (keepScroll.current) {
+            keepScroll.current = false;
+            return;
+        }
         if (scrollRef.current) {
             scrollRef.current.scrollTop = scrollRef.current.scrollHeight;
         }
@@ -286,6 +393,18 @@ const ChatInterface: React.FC<ChatProps> = ({ projectId, currentUser, teamMember
                         </Flex>
                     ) : (
                         <VStack spacing={4} align="stretch">
+                            {hasOlder && (
+                                <Button
+                                    size="xs"
+                                    variant="ghost"
+                                    colorScheme="whiteAlpha"
+                                    alignSelf="center"
+                                    isLoading={loadingOlder}
+                                    onClick={loadOlder}
+                                >
+                                    Load older messages
+                                </Button>
+                            )}
                             {messages.map((msg) => {
                                 const isMe = msg.sender_username === currentUser.username;
                                 return (
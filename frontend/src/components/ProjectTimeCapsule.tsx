@@ -28,8 +28,17 @@ const ProjectTimeCapsule: React.FC = () => {
     useEffect(() => {
         const fetchTimeline = async () => {
             try {
-                const response = await api.get('/gamification/time-capsule/');
-                setEvents(response.data.events);
+                // Pages come oldest first; follow X-Latest-Cursor until the newest event
+                let all: TimelineEvent[] = [];
+                let since: string | undefined;
+                let hasMore = true;
+                while (hasMore) {
+                    const response = await api.get('/gamification/time-capsule/', { params: since ? { since } : {} });
+                    all = all.concat(response.data.events);
+                    since = response.headers['x-latest-cursor'];
+                    hasMore = response.headers['x-has-more'] === 'true' && !!since;
+                }
+                setEvents(all);
             } catch (err) {
                 console.error("Failed to fetch timeline", err);
                 setError("Could not load your journey.");
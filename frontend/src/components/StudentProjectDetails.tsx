@@ -79,6 +79,26 @@ const getScoreColor_Local = (score: number) => {
     return "red.400";
 };
 
+// Long AI tasks (audit, docs, issues, auto-fix) are queued by the backend and return 202 + job_id.
+// Poll the job until it finishes and hand back its result; give up after `timeoutMs`.
+const waitForJob = async (projectId: number, jobId: string, token: string | null, timeoutMs = 10 * 60 * 1000) => {
+    const deadline = Date.now() + timeoutMs;
+    while (true) {
+        if (Date.now() > deadline) {
+            throw { response: { data: { error: 'The AI service is taking too long. Please try again later.' } } };
+        }
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const res = await axios.get(
+            `http://127.0.0.1:8000/projects/${projectId}/jobs/${jobId}/`,
+            { headers: { Authorization: `Bearer ${token}` } }
+        );
+        if (res.data.status === 'succeeded') return res.data.result;
+        if (res.data.status === 'failed') {
+            throw { response: { data: { error: res.data.error || 'AI job failed' } } };
+        }
+    }
+};
+
 const StudentProjectDetails: React.FC = () => {
     const { projectId } = useParams<{ projectId: string }>();
     const [project, setProject] = useState<ProjectDetails | null>(null);
@@ -245,11 +265,12 @@ const StudentProjectDetails: React.FC = () => {
                 { headers: { Authorization: `Bearer ${token}` } }
             );
 
-            await axios.post(
+            const res = await axios.post(
                 `http://127.0.0.1:8000/projects/${project.project_id}/audit/`,
                 {},
                 { headers: { Authorization: `Bearer ${token}` } }
             );
+            await waitForJob(project.project_id, res.data.job_id, token);
             toast({ title: 'Code Audit Completed!', status: 'success' });
             fetchProjectDetails();
         } catch (e: any) {
@@ -273,8 +294,9 @@ const StudentProjectDetails: React.FC = () => {
                 {},
                 { headers: { Authorization: `Bearer ${token}` } }
             );
-            if (res.data.markdown_content) {
-                setDocsContent(res.data.markdown_content);
+            const result = await waitForJob(project.project_id, res.data.job_id, token);
+            if (result.markdown_content) {
+                setDocsContent(result.markdown_content);
                 toast({ title: 'Documentation Generated!', status: 'success' });
             }
         } catch (e: any) {
@@ -296,8 +318,9 @@ const StudentProjectDetails: React.FC = () => {
                 {},
                 { headers: { Authorization: `Bearer ${token}` } }
             );
-            if (res.data.analysis) {
-                setIssuesAnalysis(res.data.analysis);
+            const result = await waitForJob(project.project_id, res.data.job_id, token);
+            if (result.analysis) {
+                setIssuesAnalysis(result.analysis);
                 toast({ title: 'Issues Analyzed!', status: 'success' });
             }
         } catch (e: any) {
@@ -330,17 +353,18 @@ const StudentProjectDetails: React.FC = () => {
                 },
                 { headers: { Authorization: `Bearer ${token}` } }
             );
-            if (res.data.success && res.data.pr_url) {
+            const result = await waitForJob(project.project_id, res.data.job_id, token);
+            if (result.success && result.pr_url) {
                 toast({
                     title: 'Fix PR Created!',
-                    description: `Pull Request opened: ${res.data.pr_url}`,
+                    description: `Pull Request opened: ${result.pr_url}`,
                     status: 'success',
                     duration: 9000,
                     isClosable: true,
                 });
-                window.open(res.data.pr_url, '_blank');
+                window.open(result.pr_url, '_blank');
             } else {
-                toast({ title: 'Fix Failed', description: res.data.error, status: 'error' });
+                toast({ title: 'Fix Failed', description: result.error, status: 'error' });
             }
         } catch (e: any) {
             console.error('Auto-fix error:', e);
@@ -71,6 +71,7 @@ interface ApprovedProject {
   // newly added fields
   final_report?: string | null;
   ai_report_feedback?: string | null;
+  ai_report_scores?: { completeness?: number | null; accuracy?: number | null; presentation?: number | null } | null;
 
   // Audit Fields
   audit_security_score?: number | null;
@@ -759,6 +760,15 @@ const TeacherApprovedProjects: React.FC = () => {
                     <Text fontSize="sm" color="gray.300" lineHeight="tall" fontStyle="italic">
                       "{selectedProject.ai_report_feedback}"
                     </Text>
+                    {selectedProject.ai_report_scores && (
+                      <HStack mt={3} spacing={4}>
+                        {(['completeness', 'accuracy', 'presentation'] as const).map(key => (
+                          <Text key={key} fontSize="xs" color="gray.400" textTransform="capitalize">
+                            {key}: <b>{selectedProject.ai_report_scores?.[key] ?? '-'}</b>/10
+                          </Text>
+                        ))}
+                      </HStack>
+                    )}
                   </Box>
                 )}
               </VStack>
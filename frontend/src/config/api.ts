@@ -25,15 +25,56 @@ api.interceptors.request.use(
     }
 );
 
+// Access tokens are short-lived (15 minutes). On a 401 the refresh token is
+// traded for a new access token once, shared by concurrent requests, and the
+// request is retried with it.
+const REFRESH_URL = `${API_BASE_URL}/auth/jwt/refresh/`;
+let refreshing: Promise<string> | null = null;
+
+export const refreshAccessToken = (): Promise<string> => {
+    if (!refreshing) {
+        const refresh = localStorage.getItem('refreshToken');
+        refreshing = (refresh
+            ? axios.post(REFRESH_URL, { refresh }).then((response) => {
+                localStorage.setItem('accessToken', response.data.access);
+                return response.data.access as string;
+            })
+            : Promise.reject(new Error('No refresh token'))
+        ).finally(() => {
+            refreshing = null;
+        });
+    }
+    return refreshing;
+};
+
+const retryWithFreshToken = async (error: any) => {
+    const config = error.config;
+    const authorized = config && config.headers && config.headers.Authorization;
+    if (!error.response || error.response.status !== 401 || !authorized || config._retried || config.url === REFRESH_URL) {
+        return Promise.reject(error);
+    }
+    config._retried = true;
+    const token = await refreshAccessToken();
+    config.headers.Authorization = `Bearer ${token}`;
+    return axios(config);
+};
+
+// Components that call axios directly with their own Bearer header get the same retry
+axios.interceptors.response.use((response) => response, retryWithFreshToken);
+
 // Response interceptor to handle common errors (like 401 Unauthorized)
 api.interceptors.response.use(
     (response) => response,
-    (error) => {
-        if (error.response && error.response.status === 401) {
-            localStorage.removeItem('accessToken');
-            window.location.href = '/';
+    async (error) => {
+        try {
+            return await retryWithFreshToken(error);
+        } catch (retryError: any) {
+            if (error.response && error.response.status === 401) {
+                localStorage.removeItem('accessToken');
+                window.location.href = '/';
+            }
+            return Promise.reject(retryError);
         }
-        return Promise.reject(error);
     }
 );
 
@@ -3,6 +3,8 @@ import React from 'react';
 import ReactDOM from 'react-dom/client';
 import { ChakraProvider, extendTheme, type ThemeConfig } from '@chakra-ui/react';
 import App from './App';
+// Installs the token-refresh interceptors before any request is made
+import './config/api';
 
 const config: ThemeConfig = {
   initialColorMode: 'light',
@@ -0,0 +1,76 @@
+# authentication/active_project.py
+"""
+"The user's project", resolved once and cached per user.
+
+Precedence (latest submission first within each tier):
+
+    1. a project whose team the user is on
+    2. a project of a group the user studies in
+    3. a project from the user's own submission (approved ones first)
+
+With no project at all, the user's latest submission is still reported so
+proposal-stage views can show it. The lookup is one query (two if there is
+no project); signals (authentication/signals.py) drop the cached entry of
+every user a Team, Group or submission change can affect.
+"""
+from django.core.cache import cache
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+
+from .models import Group, Project, ProjectSubmission, Team
+
+ACTIVE_PROJECT_TTL = 3600 # seconds; signals keep it current, this is a safety net
+
+
+def _key(user_id):
+    return f"active_project:{user_id}"
+
+
+def _resolve(user_id):
+    on_team = Exists(Team.members.through.objects.filter(team__project_id=OuterRef('pk'), user_id=user_id))
+    in_group = Exists(Group.students.through.objects.filter(group_id=OuterRef('submission__group_id'), user_id=user_id))
+    project = Project.objects.filter(on_team | in_group | Q(submission__student_id=user_id)).annotate(
+        tier=Case(
+            When(on_team, then=Value(1)),
+            When(in_group, then=Value(2)),
+            When(submission__status='Approved', then=Value(3)),
+            default=Value(4),
+            output_field=IntegerField(),
+        )
+    ).order_by('tier', '-submission__submitted_at', '-id').values_list('id', 'submission_id').first()
+    if project:
+        return project
+    submission_id = ProjectSubmission.objects.filter(student_id=user_id).order_by(
+        '-submitted_at', '-id'
+    ).values_list('id', flat=True).first()
+    return (None, submission_id)
+
+
+def resolve_active_project(user):
+    """(project_id, submission_id) for the user; either may be None."""
+    resolved = cache.get(_key(user.pk))
+    if resolved is None:
+        resolved = _resolve(user.pk)
+        cache.set(_key(user.pk), resolved, ACTIVE_PROJECT_TTL)
+    return resolved
+
+
+def active_project(user):
+    """The user's active Project (with its submission loaded), or None."""
+    project_id, _ = resolve_active_project(user)
+    if project_id is None:
+        return None
+    return Project.objects.select_related('submission').filter(id=project_id).first()
+
+
+def active_submission(user):
+    """The submission behind the active project, else the user's latest submission, or None."""
+    _, submission_id = resolve_active_project(user)
+    if submission_id is None:
+        return None
+    return ProjectSubmission.objects.filter(id=submission_id).first()
+
+
+def forget_active_projects(user_ids):
+    user_ids = [uid for uid in set(user_ids) if uid is not None]
+    if user_ids:
+        cache.delete_many([_key(uid) for uid in user_ids])
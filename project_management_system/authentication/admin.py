@@ -1,7 +1,7 @@
 # authentication/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, ProjectSubmission, Project, Team, Group, ProjectArtifact
+from .models import User, ProjectSubmission, Project, Team, Group, ProjectArtifact, BackgroundTask
 
 # Use a custom admin class to display the 'role' field
 class CustomUserAdmin(BaseUserAdmin):
@@ -29,4 +29,10 @@ class ProjectArtifactAdmin(admin.ModelAdmin):
     readonly_fields = ('extracted_text', 'ai_tags', 'uploaded_at')
 
     def short_description(self, obj):
-        return obj.description[:50]
\ No newline at end of file
+        return obj.description[:50]
+
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'last_error')
@@ -0,0 +1,63 @@
+# authentication/membership.py
+"""
+Who is the user to a project? One query answers every role at once:
+
+    owner           submitted the project's proposal
+    member          on the project team
+    group_student   a student of the project's group
+    teacher         a teacher of the project's group
+
+Each role is an EXISTS subquery against the join tables on the project's
+own row, so checks never load member lists. Results are memoized on the
+request, so the permission class and the view share one lookup.
+"""
+from collections import namedtuple
+
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+
+from .models import Group, Project, Team
+
+
+class ProjectMembership(namedtuple('ProjectMembership', 'owner member group_student teacher')):
+    __slots__ = ()
+
+    @property
+    def is_student(self):
+        """Owner, team member or a student of the project's group."""
+        return self.owner or self.member or self.group_student
+
+    @property
+    def any(self):
+        return self.is_student or self.teacher
+
+
+NO_MEMBERSHIP = ProjectMembership(False, False, False, False)
+
+
+def _resolve(user_id, project_id):
+    row = Project.objects.filter(id=project_id).annotate(
+        is_owner=ExpressionWrapper(Q(submission__student_id=user_id), output_field=BooleanField()),
+        is_member=Exists(Team.members.through.objects.filter(team__project_id=OuterRef('pk'), user_id=user_id)),
+        is_group_student=Exists(Group.students.through.objects.filter(
+            group_id=OuterRef('submission__group_id'), user_id=user_id
+        )),
+        is_teacher=Exists(Group.teachers.through.objects.filter(
+            group_id=OuterRef('submission__group_id'), user_id=user_id
+        )),
+    ).values_list('is_owner', 'is_member', 'is_group_student', 'is_teacher').first()
+    return ProjectMembership(*map(bool, row)) if row else NO_MEMBERSHIP
+
+
+def project_membership(request, project):
+    """
+    The request user's roles on `project` (a Project or its id), looked up at
+    most once per request. A missing project has no roles.
+    """
+    project_id = getattr(project, 'pk', project)
+    # Memo lives on the Django request, shared by the DRF Request wrapping it
+    holder = getattr(request, '_request', request)
+    memo = holder.__dict__.setdefault('_project_memberships', {})
+    key = (request.user.pk, int(project_id))
+    if key not in memo:
+        memo[key] = _resolve(request.user.pk, project_id) if request.user.is_authenticated else NO_MEMBERSHIP
+    return memo[key]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_backgroundtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectContextSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overview', models.TextField(blank=True, default='')),
+                ('progress', models.TextField(blank=True, default='')),
+                ('viva', models.TextField(blank=True, default='')),
+                ('artifacts', models.TextField(blank=True, default='')),
+                ('documentation', models.TextField(blank=True, default='')),
+                ('code_reviews', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='context_snapshot', to='authentication.project')),
+            ],
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from datetime import timedelta
+
+# Copies of one broadcast were written back to back; rows further apart than
+# this are treated as separate messages even if the text is identical.
+BROADCAST_WINDOW = timedelta(seconds=10)
+
+
+def collapse_message_copies(apps, schema_editor):
+    """
+    Old layout: one Message row per recipient (plus a read self-copy for the
+    sender) for group messages. Each broadcast becomes one Message whose
+    copies turn into MessageReceipt rows; DMs keep their row and get a receipt.
+    """
+    Message = apps.get_model('authentication', 'Message')
+    MessageReceipt = apps.get_model('authentication', 'MessageReceipt')
+
+    receipts = []
+    duplicate_ids = []
+    keep_ids = []
+    current_key, current = None, None
+
+    rows = Message.objects.order_by('project_id', 'sender_id', 'message_type', 'content', 'timestamp', 'id').values(
+        'id', 'project_id', 'sender_id', 'recipient_id', 'message_type', 'content', 'timestamp', 'is_read'
+    )
+    for row in rows.iterator():
+        if row['message_type'] == 'DM':
+            receipts.append(MessageReceipt(message_id=row['id'], recipient_id=row['recipient_id'], is_read=row['is_read']))
+            continue
+
+        key = (row['project_id'], row['sender_id'], row['message_type'], row['content'])
+        seen = current['recipients'] if current else set()
+        if (
+            key != current_key
+            or row['timestamp'] - current['timestamp'] > BROADCAST_WINDOW
+            or row['recipient_id'] in seen # same text sent again
+        ):
+            current_key = key
+            current = {'id': row['id'], 'timestamp': row['timestamp'], 'recipients': set()}
+            keep_ids.append(row['id'])
+        else:
+            duplicate_ids.append(row['id'])
+
+        current['recipients'].add(row['recipient_id'])
+        receipts.append(MessageReceipt(message_id=current['id'], recipient_id=row['recipient_id'], is_read=row['is_read']))
+
+    MessageReceipt.objects.bulk_create(receipts, batch_size=1000)
+    for start in range(0, len(duplicate_ids), 500):
+        Message.objects.filter(id__in=duplicate_ids[start:start + 500]).delete()
+    for start in range(0, len(keep_ids), 500):
+        Message.objects.filter(id__in=keep_ids[start:start + 500]).update(recipient=None)
+
+
+def expand_message_copies(apps, schema_editor):
+    """Reverse: one Message row per receipt again."""
+    Message = apps.get_model('authentication', 'Message')
+    MessageReceipt = apps.get_model('authentication', 'MessageReceipt')
+
+    for message in Message.objects.exclude(message_type='DM').iterator():
+        receipts = list(MessageReceipt.objects.filter(message=message).order_by('id'))
+        if not receipts:
+            message.delete()
+            continue
+        first, rest = receipts[0], receipts[1:]
+        message.recipient_id = first.recipient_id
+        message.is_read = first.is_read
+        message.save(update_fields=['recipient', 'is_read'])
+        copies = Message.objects.bulk_create([
+            Message(
+                project_id=message.project_id, sender_id=message.sender_id, recipient_id=r.recipient_id,
+                content=message.content, message_type=message.message_type, is_read=r.is_read,
+            )
+            for r in rest
+        ])
+        # auto_now_add stamped the copies with the current time
+        Message.objects.filter(id__in=[c.id for c in copies]).update(timestamp=message.timestamp)
+
+    for receipt in MessageReceipt.objects.filter(message__message_type='DM'):
+        Message.objects.filter(id=receipt.message_id).update(is_read=receipt.is_read)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_projectcontextsnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='recipient',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='MessageReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='authentication.message')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient', 'is_read'], name='authenticat_recipie_aa1a8f_idx')],
+                'unique_together': {('message', 'recipient')},
+            },
+        ),
+        migrations.RunPython(collapse_message_copies, expand_message_copies),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_message_receipts'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='TypingStatus',
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:50
+
+from collections import defaultdict
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def _bulk_create_batched(model, events):
+    batch = []
+    for event in events:
+        batch.append(event)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def backfill_events(apps, schema_editor):
+    """Seeds the feed from the rows the old feed views used to scan, a batch at a time."""
+    ActivityEvent = apps.get_model('authentication', 'ActivityEvent')
+    ProjectSubmission = apps.get_model('authentication', 'ProjectSubmission')
+    Message = apps.get_model('authentication', 'Message')
+    StudentActivityLog = apps.get_model('authentication', 'StudentActivityLog')
+    TimedAssignment = apps.get_model('authentication', 'TimedAssignment')
+    Group = apps.get_model('authentication', 'Group')
+    Team = apps.get_model('authentication', 'Team')
+
+    group_of_project = dict(ProjectSubmission.objects.filter(project__isnull=False).values_list('project__id', 'group_id'))
+    # Team projects submitted without a group are filed under their members' group (lowest id wins)
+    # for teachers; their messages go to the team members only
+    ungrouped = {project_id for project_id, group_id in group_of_project.items() if group_id is None}
+    member_groups = Group.objects.filter(
+        students__active_projects__project_id__in=ungrouped
+    ).order_by('-id').values_list('students__active_projects__project_id', 'id')
+    for project_id, group_id in member_groups:
+        group_of_project[project_id] = group_id
+    team_of_project = defaultdict(list)
+    for project_id, user_id in Team.members.through.objects.filter(
+        team__project_id__in=ungrouped
+    ).values_list('team__project_id', 'user_id'):
+        team_of_project[project_id].append(user_id)
+
+    def submissions():
+        for sub in ProjectSubmission.objects.all().iterator(chunk_size=BATCH_SIZE):
+            yield ActivityEvent(
+                kind='submission', ref=f"sub_{sub.id}", actor_id=sub.student_id, group_id=sub.group_id,
+                user_id=sub.student_id, summary=sub.title[:255], timestamp=sub.submitted_at,
+            )
+
+    def messages():
+        for msg in Message.objects.all().iterator(chunk_size=BATCH_SIZE):
+            is_dm = msg.message_type == 'DM'
+            fields = dict(
+                kind='message', ref=f"msg_{msg.id}", actor_id=msg.sender_id, project_id=msg.project_id,
+                summary=msg.content[:255], timestamp=msg.timestamp,
+            )
+            group_id = group_of_project.get(msg.project_id)
+            if is_dm or msg.project_id not in ungrouped:
+                yield ActivityEvent(
+                    group_id=group_id, user_id=msg.recipient_id if is_dm else None, broadcast=not is_dm, **fields
+                )
+                continue
+            yield ActivityEvent(group_id=group_id, **fields)
+            for user_id in team_of_project[msg.project_id]:
+                yield ActivityEvent(user_id=user_id, **fields)
+
+    def logs():
+        for log in StudentActivityLog.objects.all().iterator(chunk_size=BATCH_SIZE):
+            yield ActivityEvent(
+                kind='system', ref=f"log_{log.id}", actor_id=log.student_id, project_id=log.project_id,
+                group_id=group_of_project.get(log.project_id), summary=log.action[:255], timestamp=log.timestamp,
+            )
+
+    def assignments():
+        for assignment in TimedAssignment.objects.prefetch_related('assigned_groups').iterator(chunk_size=BATCH_SIZE):
+            for group in assignment.assigned_groups.all():
+                yield ActivityEvent(
+                    kind='assignment', ref=f"assign_{assignment.id}", actor_id=assignment.created_by_id,
+                    group_id=group.id, broadcast=True, summary=assignment.title[:255], timestamp=assignment.start_time,
+                )
+
+    for events in (submissions(), messages(), logs(), assignments()):
+        _bulk_create_batched(ActivityEvent, events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_drop_typingstatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('submission', 'Submission'), ('message', 'Message'), ('system', 'Student Activity'), ('assignment', 'Assignment')], max_length=20)),
+                ('ref', models.CharField(max_length=40)),
+                ('broadcast', models.BooleanField(default=False)),
+                ('summary', models.CharField(blank=True, max_length=255)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='authentication.group')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='authentication.project')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'timestamp'], name='authenticat_group_i_56bc1c_idx'), models.Index(fields=['user', 'timestamp'], name='authenticat_user_id_aec375_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    """Seeds the rollups the way `manage.py refresh_analytics` rebuilds them."""
+    Project = apps.get_model('authentication', 'Project')
+    Group = apps.get_model('authentication', 'Group')
+    ProjectRollup = apps.get_model('authentication', 'ProjectRollup')
+    InnovationTotal = apps.get_model('authentication', 'InnovationTotal')
+
+    group_names = dict(Group.objects.values_list('id', 'name'))
+    rollups = []
+    for dimension, field in (('status', 'status'), ('category', 'category'), ('group', 'submission__group')):
+        rows = Project.objects.filter(**{f'{field}__isnull': False}).order_by().values(field).annotate(n=Count('id'))
+        for row in rows:
+            key = row[field]
+            label = group_names.get(key, '') if dimension == 'group' else key
+            rollups.append(ProjectRollup(dimension=dimension, key=str(key), label=label, count=row['n']))
+    ProjectRollup.objects.bulk_create(rollups)
+
+    rows = Project.objects.filter(
+        status='Completed', submission__innovation_score__isnull=False, team__members__isnull=False
+    ).order_by().values('team__members').annotate(total=Sum('submission__innovation_score'), projects=Count('id'))
+    InnovationTotal.objects.bulk_create([
+        InnovationTotal(user_id=row['team__members'], total=row['total'], completed_projects=row['projects'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_activityevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InnovationTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.FloatField(db_index=True, default=0.0)),
+                ('completed_projects', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='innovation_total', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('status', 'Status'), ('category', 'Category'), ('group', 'Group')], max_length=20)),
+                ('key', models.CharField(max_length=50)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('dimension', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_completed_at(apps, schema_editor):
+    """Done tasks never recorded when; creation time is the best estimate left."""
+    Task = apps.get_model('authentication', 'Task')
+    Task.objects.filter(status='Done').update(completed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0008_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
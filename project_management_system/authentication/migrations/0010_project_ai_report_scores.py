@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_task_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='ai_report_scores',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -87,6 +87,7 @@ class Project(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='In Progress')
     final_report = models.FileField(upload_to='final_reports/', null=True, blank=True)
     ai_report_feedback = models.TextField(null=True, blank=True)
+    ai_report_scores = JSONField(null=True, blank=True) # {completeness, accuracy, presentation}: 0-10
     final_report_content = models.TextField(null=True, blank=True)
     progress_percentage = models.IntegerField(default=0) 
     ai_resume_points = JSONField(null=True, blank=True)
@@ -119,18 +120,36 @@ class Message(models.Model):
 
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
-    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
+    # Set for DMs only; group messages reach their audience through MessageReceipt rows
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages', null=True, blank=True)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
     message_type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='GUIDE_GROUP')
 
     def __str__(self):
-        return f'[{self.message_type}] {self.sender.username} -> {self.recipient.username}'
+        target = self.recipient.username if self.recipient else self.message_type
+        return f'[{self.message_type}] {self.sender.username} -> {target}'
 
     class Meta:
         ordering = ['timestamp']
 
+class MessageReceipt(models.Model):
+    """
+    Delivery and read state of one Message for one user. A broadcast is a
+    single Message plus one receipt per member (the sender's own receipt is
+    created already read, so their sent messages show up in the channel).
+    """
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='receipts')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='message_receipts')
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('message', 'recipient')
+        indexes = [models.Index(fields=['recipient', 'is_read'])]
+
+    def __str__(self):
+        return f'{self.recipient.username} <- message #{self.message_id} ({"read" if self.is_read else "unread"})'
+
 class VivaSession(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='viva_sessions')
     student = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -235,6 +254,20 @@ class Task(models.Model):
     description = models.TextField(blank=True) 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='To Do')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by save() when status becomes Done (read by the time capsule).
+    # Queryset .update(status=...) bypasses save(): set completed_at in the same call.
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        if self.status == 'Done':
+            if not self.completed_at:
+                self.completed_at = timezone.now()
+        else:
+            self.completed_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'completed_at'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} ({self.status})"
@@ -242,14 +275,6 @@ class Task(models.Model):
     class Meta:
         ordering = ['created_at']
 
-class TypingStatus(models.Model):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now=True) 
-
-    def __str__(self):
-        return f"{self.user.username} typing in {self.project.title}"
-
 class TimedAssignment(models.Model):
     ASSIGNMENT_TYPES = (
         ('Code', 'Code'),
@@ -306,3 +331,143 @@ class StudentActivityLog(models.Model):
 
     def __str__(self):
         return f"{self.student.username} - {self.action} - {self.timestamp}"
+
+class ActivityEvent(models.Model):
+    """
+    Append-only feed entry, written by signals (authentication/signals.py) when
+    a submission, message, activity log or assignment is created. Teacher feeds
+    read by `group`; student feeds by `user` (personal events) or `broadcast`
+    events of their groups. Text is rendered per audience at read time.
+    """
+    KIND_CHOICES = (
+        ('submission', 'Submission'),
+        ('message', 'Message'),
+        ('system', 'Student Activity'),
+        ('assignment', 'Assignment'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    ref = models.CharField(max_length=40) # source row, e.g. "sub_12"
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='activity_events')
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True, related_name='activity_events')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='activity_events')
+    broadcast = models.BooleanField(default=False) # shown to every student of `group`
+    summary = models.CharField(max_length=255, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'timestamp']),
+            models.Index(fields=['user', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"[{self.kind}] {self.ref} @ {self.timestamp}"
+
+class BackgroundTask(models.Model):
+    """
+    A unit of deferred work (AI verification, report grading) picked up by
+    `manage.py run_workers`. Failed tasks are retried with backoff until
+    max_attempts is reached.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100) # key in authentication.tasks.TASKS
+    payload = JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+class RealtimeEvent(models.Model):
+    """
+    A realtime event relayed between processes by
+    project_management.realtime.DatabaseBroker. Rows only live a few minutes.
+    """
+    topic = models.CharField(max_length=100)
+    payload = JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+class ProjectContextSnapshot(models.Model):
+    """
+    Stored AI context for a project, one text column per section.
+    Kept fresh by the signals in authentication/signals.py, which rebuild
+    only the section a change touches (see project_management.utils).
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='context_snapshot')
+    overview = models.TextField(blank=True, default='')
+    progress = models.TextField(blank=True, default='')
+    viva = models.TextField(blank=True, default='')
+    artifacts = models.TextField(blank=True, default='')
+    documentation = models.TextField(blank=True, default='')
+    code_reviews = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def as_text(self):
+        return "".join([self.overview, self.progress, self.viva, self.artifacts, self.documentation, self.code_reviews])
+
+    def __str__(self):
+        return f"Context snapshot for {self.project.title}"
+
+
+class ProjectRollup(models.Model):
+    """
+    Precomputed project count for one analytics bucket: a status, a category
+    or a group. Maintained by project_management.analytics_rollups; read by
+    AnalyticsView instead of grouping every project per request.
+    """
+    DIMENSION_CHOICES = (
+        ('status', 'Status'),
+        ('category', 'Category'),
+        ('group', 'Group'),
+    )
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=50) # status/category value, or group id
+    label = models.CharField(max_length=255, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('dimension', 'key')
+
+    def __str__(self):
+        return f"{self.dimension}={self.label or self.key}: {self.count}"
+
+
+class InnovationTotal(models.Model):
+    """
+    A student's summed innovation score over the completed projects they are a
+    team member of, for the innovation leaderboard. Maintained by
+    project_management.analytics_rollups.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='innovation_total')
+    total = models.FloatField(default=0.0, db_index=True)
+    completed_projects = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.total}"
@@ -0,0 +1,132 @@
+# authentication/pagination.py
+"""
+Keyset (cursor) pagination on (timestamp, id).
+
+Every list is paged; without parameters it returns the newest `page_size`
+items, a default large enough that most lists still arrive whole. Pages
+keep the plain-array body and the cursors travel in response headers:
+
+    ?limit=50                  newest `limit` items (at most `max_page_size`)
+    ?before=<cursor>           the `limit` items just older than the cursor
+    ?since=<cursor>            items newer than the cursor (incremental polling)
+
+    X-Latest-Cursor   pass back as `since` to fetch only what is new
+    X-Oldest-Cursor   pass back as `before` to load older history
+    X-Has-More        'true' if the page was cut at `limit`
+
+Every page is one indexed range query, however long the history is.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValidationError({'error': 'Invalid cursor.'})
+
+
+class KeysetPagination(BasePagination):
+    # Model field (may span relations, e.g. 'submission__submitted_at'); `id` breaks ties
+    cursor_field = 'timestamp'
+    page_size = 200
+    max_page_size = 500
+    # Order of the returned page; chat reads oldest-first, feeds newest-first
+    newest_first = True
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.page_size))
+        except ValueError:
+            limit = self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def _value(self, obj):
+        for attr in self.cursor_field.split('__'):
+            obj = getattr(obj, attr)
+        return obj
+
+    def paginate_queryset(self, queryset, request, view=None):
+        field = self.cursor_field
+        limit = self.get_limit(request)
+        since = request.query_params.get('since')
+        before = request.query_params.get('before')
+
+        self.since = since
+        if since:
+            timestamp, pk = decode_cursor(since)
+            queryset = queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+            queryset = queryset.order_by(field, 'id')
+        else:
+            if before:
+                timestamp, pk = decode_cursor(before)
+                queryset = queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+            queryset = queryset.order_by(f'-{field}', '-id')
+
+        page = list(queryset[:limit + 1])
+        self.has_more = len(page) > limit
+        page = page[:limit]
+
+        # `page` is in the direction of travel; flip it to the display order
+        ascending = bool(since)
+        if ascending == self.newest_first:
+            page.reverse()
+        self.page = page
+        return page
+
+    def get_cursors(self):
+        if not self.page:
+            return self.since, None
+        ends = [encode_cursor(self._value(obj), obj.pk) for obj in (self.page[0], self.page[-1])]
+        newest, oldest = ends if self.newest_first else ends[::-1]
+        return newest, oldest
+
+    def get_paginated_response(self, data):
+        response = Response(data)
+        newest, oldest = self.get_cursors()
+        if newest:
+            response['X-Latest-Cursor'] = newest
+        if oldest:
+            response['X-Oldest-Cursor'] = oldest
+        response['X-Has-More'] = 'true' if self.has_more else 'false'
+        return response
+
+
+class MessageCursorPagination(KeysetPagination):
+    cursor_field = 'timestamp'
+    newest_first = False
+
+
+class ArtifactCursorPagination(KeysetPagination):
+    cursor_field = 'uploaded_at'
+
+
+class ProjectCursorPagination(KeysetPagination):
+    cursor_field = 'submission__submitted_at'
+
+
+class SubmissionCursorPagination(KeysetPagination):
+    cursor_field = 'submitted_at'
+
+
+class ActivityCursorPagination(KeysetPagination):
+    cursor_field = 'timestamp'
+    page_size = 20
+
+
+class UserCursorPagination(KeysetPagination):
+    cursor_field = 'date_joined'
@@ -1,5 +1,11 @@
+import logging
+
 from rest_framework import permissions
-from .models import Project, Team
+from .models import Project
+from .membership import project_membership
+
+logger = logging.getLogger(__name__)
+
 class IsTeacherOrAdmin(permissions.BasePermission):
     """
     Custom permission to allow only 'Teacher' or 'HOD/Admin' users to access a view.
@@ -29,14 +35,7 @@ class IsProjectMemberOrTeacher(permissions.BasePermission):
             return True
 
         if 'project_id' in view.kwargs:
-            # ... existing logic ...
-            project_id = view.kwargs['project_id']
-            try:
-                project = Project.objects.get(id=project_id)
-                return self.has_object_permission(request, view, project)
-            except Project.DoesNotExist:
-                print(f"DEBUG: Project {project_id} not found.")
-                return False
+            return self._allowed(request, view.kwargs['project_id'])
         return True
 
     def has_object_permission(self, request, view, obj):
@@ -47,35 +46,20 @@ class IsProjectMemberOrTeacher(permissions.BasePermission):
             return True
         
         if isinstance(obj, Project):
-            # ... existing logic ...
-            project = obj
-        elif hasattr(obj, 'project'):
-             project = obj.project
+            project_id = obj.pk
+        elif hasattr(obj, 'project_id'):
+            project_id = obj.project_id
         else:
-             print("DEBUG: Object has no project context.")
+             logger.debug("Permission denied: object has no project context.")
              return False
 
-        # 0. Check owner
-        try:
-            if project.submission.student == user:
-                return True
-        except:
-            pass
+        return self._allowed(request, project_id)
 
-        # 1. Check team
-        try:
-            if user in project.team.members.all():
-                return True
-        except Team.DoesNotExist:
-             pass 
+    def _allowed(self, request, project_id):
+        # Owner, team member or teacher of the project's group (one memoized query)
+        membership = project_membership(request, project_id)
+        if not (membership.owner or membership.member or membership.teacher):
+            logger.debug(f"Permission denied for user {request.user.id} on project {project_id}")
+            return False
+        return True
 
-        # 2. Check teacher
-        try:
-            if project.submission and project.submission.group:
-                 if user in project.submission.group.teachers.all():
-                      return True
-        except AttributeError:
-             pass
-        
-        print(f"DEBUG: Permission Denied for User {user.id} on Project {project.id}")
-        return False
\ No newline at end of file
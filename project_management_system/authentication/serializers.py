@@ -4,7 +4,7 @@ from djoser.serializers import UserSerializer as BaseUserSerializer
 from rest_framework import serializers
 from django.utils import timezone
 from .models import User, ProjectSubmission, Group, Project, Team, Message, VivaSession, VivaQuestion, ProgressUpdate, ProjectArtifact, Task, CodeReview, Checkpoint, TimedAssignment, AssignmentSubmission, StudentActivityLog
-from django.db.models import JSONField
+from django.db.models import JSONField, Count, Avg, Prefetch, OuterRef, Subquery, Exists
 
 
 # User serializers
@@ -126,6 +126,11 @@ class TeacherSubmissionSerializer(serializers.ModelSerializer):
              return None
         return None
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Loads the student, group and project with the submissions (no per-row queries)."""
+        return queryset.select_related('student', 'group', 'project')
+
 class ProjectSerializer(serializers.ModelSerializer):
     submission = ProjectSubmissionSerializer(read_only=True)
     team = serializers.StringRelatedField(read_only=True)
@@ -173,7 +178,7 @@ class ApprovedProjectSerializer(serializers.ModelSerializer):
             'id', 'submission_id', 'title', 'abstract_text', 'student_name', 
             'group_name',
             'status', 'progress_percentage', 'category', 'final_report',
-            'ai_report_feedback', 'team_members', 'member_stats',
+            'ai_report_feedback', 'ai_report_scores', 'team_members', 'member_stats',
             'relevance_score', 'feasibility_score', 'innovation_score',
             'audit_security_score', 'audit_quality_score', 'audit_report', 'last_audit_date',
             'teachers'
@@ -198,7 +203,13 @@ class ApprovedProjectSerializer(serializers.ModelSerializer):
             return []
 
     def get_member_stats(self, obj):
-        stats = []
+        # Views listing many projects pass the stats for the whole page in the
+        # context (see build_member_stats); a single project computes its own.
+        page_stats = self.context.get('member_stats')
+        if page_stats is None:
+            page_stats = build_member_stats([obj])
+        project_stats = page_stats.get(obj.id, {})
+
         members = []
         if hasattr(obj, 'team'):
             members = list(obj.team.members.all())
@@ -206,31 +217,57 @@ class ApprovedProjectSerializer(serializers.ModelSerializer):
         if not members and obj.submission.student:
             members = [obj.submission.student]
 
+        stats = []
         for member in members:
-            updates_count = ProgressUpdate.objects.filter(project=obj, author=member).count()
-            reviews_count = CodeReview.objects.filter(project=obj, student=member).count()
-            viva_sessions = VivaSession.objects.filter(project=obj, student=member)
-            avg_viva = 0
-            if viva_sessions.exists():
-                total_score = 0
-                count = 0
-                for vs in viva_sessions:
-                    for q in vs.questions.all():
-                        if q.ai_score is not None:
-                             total_score += q.ai_score
-                             count += 1
-                if count > 0:
-                    avg_viva = round(total_score / count, 1)
-
+            member_stats = project_stats.get(member.id, {})
             stats.append({
                 "student_id": member.id,
                 "username": member.username,
-                "updates_count": updates_count,
-                "reviews_count": reviews_count,
-                "viva_average": avg_viva
+                "updates_count": member_stats.get('updates_count', 0),
+                "reviews_count": member_stats.get('reviews_count', 0),
+                "viva_average": member_stats.get('viva_average', 0)
             })
         return stats
 
+
+def build_member_stats(projects):
+    """
+    Per-member activity for a page of projects, in three grouped queries
+    (however many projects or members there are):
+    {project_id: {user_id: {"updates_count", "reviews_count", "viva_average"}}}
+    """
+    project_ids = [p.id for p in projects]
+    stats = {pid: {} for pid in project_ids}
+    if not project_ids:
+        return stats
+
+    def member(project_id, user_id):
+        return stats[project_id].setdefault(user_id, {})
+
+    updates = (
+        ProgressUpdate.objects.filter(project_id__in=project_ids)
+        .values('project_id', 'author_id').annotate(n=Count('id')).order_by()
+    )
+    for row in updates:
+        member(row['project_id'], row['author_id'])['updates_count'] = row['n']
+
+    reviews = (
+        CodeReview.objects.filter(project_id__in=project_ids)
+        .values('project_id', 'student_id').annotate(n=Count('id')).order_by()
+    )
+    for row in reviews:
+        member(row['project_id'], row['student_id'])['reviews_count'] = row['n']
+
+    # Avg() skips unscored questions, like the old per-question loop did
+    viva = (
+        VivaQuestion.objects.filter(session__project_id__in=project_ids, ai_score__isnull=False)
+        .values('session__project_id', 'session__student_id').annotate(avg=Avg('ai_score')).order_by()
+    )
+    for row in viva:
+        member(row['session__project_id'], row['session__student_id'])['viva_average'] = round(row['avg'], 1)
+
+    return stats
+
 class StudentSubmissionSerializer(serializers.ModelSerializer):
     group_name = serializers.CharField(source='group.name', read_only=True)
     progress = serializers.IntegerField(source='project.progress_percentage', read_only=True, allow_null=True)
@@ -238,6 +275,7 @@ class StudentSubmissionSerializer(serializers.ModelSerializer):
     abstract = serializers.CharField(source='abstract_text', read_only=True)
     final_report = serializers.SerializerMethodField()
     ai_report_feedback = serializers.SerializerMethodField()
+    ai_report_scores = serializers.JSONField(source='project.ai_report_scores', read_only=True, allow_null=True)
     ai_resume_points = serializers.SerializerMethodField()
     team_members = serializers.SerializerMethodField()
     github_repo_link = serializers.CharField(source='project.github_repo_link', read_only=True, allow_null=True)
@@ -251,7 +289,7 @@ class StudentSubmissionSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'group_name', 'title', 'abstract', 'status', 'progress',
             'project_id','ai_similarity_report', 'ai_suggested_features' ,'final_report',
-            'ai_report_feedback','ai_resume_points','team_members',
+            'ai_report_feedback', 'ai_report_scores', 'ai_resume_points','team_members',
             'relevance_score', 'feasibility_score', 'innovation_score',
             'github_repo_link', 'audit_security_score', 'audit_quality_score', 
             'audit_report', 'last_audit_date'
@@ -263,6 +301,19 @@ class StudentSubmissionSerializer(serializers.ModelSerializer):
             'audit_report', 'last_audit_date'
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Loads everything get_team_members and the project fields read, so a
+        dashboard of any size costs the same four queries.
+        """
+        member_fields = User.objects.only('id', 'username', 'email', 'role')
+        return queryset.select_related('group', 'project__team').prefetch_related(
+            Prefetch('project__team__members', queryset=member_fields),
+            Prefetch('group__students', queryset=member_fields),
+            Prefetch('group__teachers', queryset=member_fields),
+        )
+
     def get_team_members(self, obj):
         members = []
         # 1. Get students from Project Team if it exists
@@ -315,7 +366,8 @@ class StudentSubmissionSerializer(serializers.ModelSerializer):
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_username = serializers.CharField(source='sender.username', read_only=True)
-    recipient_username = serializers.CharField(source='recipient.username', read_only=True)
+    recipient_username = serializers.CharField(source='recipient.username', read_only=True, allow_null=True)
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
@@ -328,6 +380,10 @@ class MessageSerializer(serializers.ModelSerializer):
             'sender_username', 'recipient_username', 'is_read'
         )
 
+    def get_is_read(self, obj):
+        # Read state lives on MessageReceipt; list views annotate it per user
+        return bool(getattr(obj, 'is_read', False))
+
     def create(self, validated_data):
         validated_data['sender'] = self.context['request'].user
         return super().create(validated_data)
@@ -410,15 +466,24 @@ class CheckpointSerializer(serializers.ModelSerializer):
         fields = ('id', 'project', 'title', 'description', 'deadline', 'is_completed', 'date_completed', 'status')
         read_only_fields = ('id', 'status')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotates the status of each checkpoint's latest update (one subquery, not one query per row)."""
+        latest_update = ProgressUpdate.objects.filter(checkpoint=OuterRef('pk')).order_by('-created_at', '-id')
+        return queryset.annotate(latest_update_status=Subquery(latest_update.values('status')[:1]))
+
     def get_status(self, obj):
         if obj.is_completed:
             return 'Completed'
-        latest = obj.updates.order_by('-created_at').first()
-        if latest:
-            if latest.status == 'Pending':
-                return 'Pending Approval'
-            if latest.status == 'Rejected':
-                return 'Rejected'
+        if hasattr(obj, 'latest_update_status'):
+            latest_status = obj.latest_update_status
+        else:
+            latest = obj.updates.order_by('-created_at').first()
+            latest_status = latest.status if latest else None
+        if latest_status == 'Pending':
+            return 'Pending Approval'
+        if latest_status == 'Rejected':
+            return 'Rejected'
         return 'Incomplete'
 
 class TimedAssignmentSerializer(serializers.ModelSerializer):
@@ -444,7 +509,15 @@ class TimedAssignmentSerializer(serializers.ModelSerializer):
         remaining = obj.end_time - timezone.now()
         return max(0, int(remaining.total_seconds()))
 
+    @staticmethod
+    def setup_eager_loading(queryset, user):
+        """Annotates whether `user` has submitted each assignment and prefetches the assigned groups."""
+        submitted = AssignmentSubmission.objects.filter(assignment=OuterRef('pk'), submitted_by=user)
+        return queryset.annotate(is_submitted_by_user=Exists(submitted)).prefetch_related('assigned_groups')
+
     def get_is_submitted(self, obj):
+        if hasattr(obj, 'is_submitted_by_user'):
+            return obj.is_submitted_by_user
         user = self.context['request'].user
         if user.is_authenticated:
             return AssignmentSubmission.objects.filter(assignment=obj, submitted_by=user).exists()
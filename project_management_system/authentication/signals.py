@@ -0,0 +1,399 @@
+import logging
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (
+    Project, ProjectSubmission, Team, ProgressUpdate, VivaSession, VivaQuestion,
+    ProjectArtifact, CodeReview, Message, StudentActivityLog, TimedAssignment,
+    ActivityEvent, Group, User
+)
+
+logger = logging.getLogger(__name__)
+
+def _refresh_context(project_id, *sections):
+    """Rebuilds the affected snapshot sections once the change has committed."""
+    def refresh():
+        from project_management.utils import refresh_project_context
+        try:
+            refresh_project_context(project_id, list(sections))
+        except Project.DoesNotExist:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not refresh context snapshot for project {project_id}: {e}")
+    transaction.on_commit(refresh)
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_context(instance.id, 'overview', 'documentation')
+
+@receiver(post_save, sender=ProjectSubmission)
+def submission_saved(sender, instance, raw=False, **kwargs):
+    # Scores and abstract live on the submission
+    if not raw and hasattr(instance, 'project'):
+        _refresh_context(instance.project.id, 'overview')
+
+@receiver(m2m_changed, sender=Team.members.through)
+def team_members_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Team):
+        _refresh_context(instance.project_id, 'overview')
+
+# User fields shown in the overview section (lead, team or group member lists)
+OVERVIEW_USER_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+
+def _refresh_overviews(projects):
+    # Projects without a snapshot build it in full on first read; nothing to refresh
+    for project_id in projects.filter(context_snapshot__isnull=False).values_list('id', flat=True).distinct():
+        _refresh_context(project_id, 'overview')
+
+@receiver(m2m_changed, sender=Group.students.through)
+def group_students_changed(sender, instance, action, pk_set, **kwargs):
+    # A project with no team lists its group's students instead
+    if action in ('post_add', 'post_remove'):
+        changed_group_ids = {instance.pk} if isinstance(instance, Group) else pk_set
+    elif action == 'pre_clear':
+        if isinstance(instance, Group):
+            changed_group_ids = {instance.pk}
+        else:
+            changed_group_ids = set(sender.objects.filter(user_id=instance.pk).values_list('group_id', flat=True))
+    else:
+        return
+    _refresh_overviews(Project.objects.filter(submission__group_id__in=changed_group_ids, team__isnull=True))
+
+@receiver(post_save, sender=User)
+def user_overview_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if update_fields is not None and not set(update_fields) & OVERVIEW_USER_FIELDS:
+        return
+    _refresh_overviews(Project.objects.filter(
+        Q(submission__student=instance) | Q(team__members=instance)
+        | Q(team__isnull=True, submission__group__students=instance)
+    ))
+
+@receiver([post_save, post_delete], sender=ProgressUpdate)
+def progress_update_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_context(instance.project_id, 'progress')
+
+@receiver([post_save, post_delete], sender=VivaSession)
+def viva_session_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_context(instance.project_id, 'viva')
+
+@receiver([post_save, post_delete], sender=VivaQuestion)
+def viva_question_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The session may already be gone when it is deleted along with its questions
+    project_id = VivaSession.objects.filter(id=instance.session_id).values_list('project_id', flat=True).first()
+    if project_id is not None:
+        _refresh_context(project_id, 'viva')
+
+@receiver([post_save, post_delete], sender=ProjectArtifact)
+def artifact_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_context(instance.project_id, 'artifacts')
+
+@receiver([post_save, post_delete], sender=CodeReview)
+def code_review_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_context(instance.project_id, 'code_reviews')
+
+
+# --- Activity feed events ---
+
+def _project_group(project_id):
+    """
+    (group_id, own). A team project submitted without a group is filed under its
+    members' group (own=False): that group's teachers follow it, but the
+    group's other students are not its audience.
+    """
+    group_id = ProjectSubmission.objects.filter(project__id=project_id).values_list('group_id', flat=True).first()
+    if group_id is not None:
+        return group_id, True
+    group_id = Group.objects.filter(
+        students__active_projects__project_id=project_id
+    ).order_by('id').values_list('id', flat=True).first()
+    return group_id, False
+
+@receiver(post_save, sender=ProjectSubmission)
+def submission_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ActivityEvent.objects.create(
+            kind='submission', ref=f"sub_{instance.id}", actor_id=instance.student_id,
+            group_id=instance.group_id, user_id=instance.student_id,
+            summary=instance.title[:255], timestamp=instance.submitted_at,
+        )
+
+@receiver(post_save, sender=Message)
+def message_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        is_dm = instance.message_type == 'DM'
+        group_id, own_group = _project_group(instance.project_id)
+        fields = dict(
+            kind='message', ref=f"msg_{instance.id}", actor_id=instance.sender_id, project_id=instance.project_id,
+            summary=instance.content[:255], timestamp=instance.timestamp,
+        )
+        if is_dm or own_group:
+            # DMs are personal; group channels go to the group's students
+            ActivityEvent.objects.create(
+                group_id=group_id, user_id=instance.recipient_id if is_dm else None, broadcast=not is_dm, **fields
+            )
+            return
+        # No group of its own: one row for the teachers' feed, one personal row per team member
+        member_ids = Team.members.through.objects.filter(
+            team__project_id=instance.project_id
+        ).values_list('user_id', flat=True)
+        ActivityEvent.objects.bulk_create(
+            [ActivityEvent(group_id=group_id, **fields)] + [ActivityEvent(user_id=uid, **fields) for uid in member_ids]
+        )
+
+@receiver(post_save, sender=StudentActivityLog)
+def activity_log_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ActivityEvent.objects.create(
+            kind='system', ref=f"log_{instance.id}", actor_id=instance.student_id,
+            project_id=instance.project_id,
+            group_id=_project_group(instance.project_id)[0] if instance.project_id else None,
+            summary=instance.action[:255], timestamp=instance.timestamp,
+        )
+
+@receiver(m2m_changed, sender=TimedAssignment.assigned_groups.through)
+def assignment_groups_added(sender, instance, action, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if isinstance(instance, TimedAssignment):
+        pairs = [(instance, group_id) for group_id in pk_set]
+    else: # group.assignments.add(...)
+        pairs = [(assignment, instance.id) for assignment in TimedAssignment.objects.filter(id__in=pk_set)]
+    ActivityEvent.objects.bulk_create([
+        ActivityEvent(
+            kind='assignment', ref=f"assign_{assignment.id}", actor_id=assignment.created_by_id,
+            group_id=group_id, broadcast=True,
+            summary=assignment.title[:255], timestamp=assignment.start_time,
+        )
+        for assignment, group_id in pairs
+    ])
+
+
+# --- Teacher dashboard stats cache ---
+
+def _invalidate_teacher_stats(names):
+    from project_management.dashboard_stats import bump_stats_version
+    transaction.on_commit(lambda: bump_stats_version(names))
+
+@receiver([post_save, post_delete], sender=ProjectSubmission)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=VivaSession)
+@receiver([post_save, post_delete], sender=TimedAssignment)
+def teacher_stats_source_changed(sender, raw=False, update_fields=None, **kwargs):
+    from project_management.dashboard_stats import STATS_AFFECTED_BY
+    if raw:
+        return
+    fields, names = STATS_AFFECTED_BY[sender.__name__]
+    # Saves limited to other fields (scores, reports, ...) can't move a counter
+    if update_fields is not None and not kwargs.get('created') and not fields & {f.removesuffix('_id') for f in update_fields}:
+        return
+    _invalidate_teacher_stats(names)
+
+@receiver(m2m_changed, sender=Group.teachers.through)
+def group_teachers_changed(sender, action, **kwargs):
+    from project_management.dashboard_stats import GROUP_TEACHER_STATS
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate_teacher_stats(GROUP_TEACHER_STATS)
+
+
+# --- Analytics rollups ---
+
+def _refresh_rollups(keys=(), user_ids=()):
+    """Recounts the touched analytics buckets and innovation totals after commit."""
+    keys, user_ids = set(keys), set(user_ids)
+    if not keys and not user_ids:
+        return
+    def refresh():
+        from project_management.analytics_rollups import refresh_project_rollups, refresh_innovation_totals
+        try:
+            if keys:
+                refresh_project_rollups(keys)
+            if user_ids:
+                refresh_innovation_totals(user_ids)
+        except Exception as e:
+            # `manage.py refresh_analytics` repairs whatever was missed
+            logger.warning(f"Could not refresh analytics rollups: {e}")
+    transaction.on_commit(refresh)
+
+def _team_member_ids(project_id):
+    return set(Team.members.through.objects.filter(team__project_id=project_id).values_list('user_id', flat=True))
+
+@receiver(pre_save, sender=Project)
+def project_rollup_before(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._rollup_before = Project.objects.filter(pk=instance.pk).values(
+            'status', 'category', 'submission__group'
+        ).first()
+
+@receiver(post_save, sender=Project)
+def project_rollup_after(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from project_management.analytics_rollups import project_keys
+    before = getattr(instance, '_rollup_before', None)
+    after = {'status': instance.status, 'category': instance.category, 'submission__group': instance.submission.group_id}
+    if before == after:
+        return # e.g. audit or progress saves: no bucket moved
+    keys = project_keys(*after.values())
+    user_ids = ()
+    if before:
+        keys |= project_keys(*before.values())
+    if 'Completed' in (instance.status, before and before['status']):
+        user_ids = _team_member_ids(instance.id)
+    _refresh_rollups(keys, user_ids)
+
+@receiver(pre_delete, sender=Project)
+def project_rollup_deleted(sender, instance, **kwargs):
+    # The team rows are still there before the delete; the recount runs after commit
+    from project_management.analytics_rollups import project_keys
+    _refresh_rollups(
+        project_keys(instance.status, instance.category, instance.submission.group_id),
+        _team_member_ids(instance.id) if instance.status == 'Completed' else (),
+    )
+
+@receiver(pre_save, sender=ProjectSubmission)
+def submission_rollup_before(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._rollup_before = ProjectSubmission.objects.filter(pk=instance.pk).values(
+            'group_id', 'innovation_score'
+        ).first()
+
+@receiver(post_save, sender=ProjectSubmission)
+def submission_rollup_after(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, '_rollup_before', None)
+    if raw or not before or not hasattr(instance, 'project'):
+        return
+    project = instance.project
+    keys, user_ids = set(), ()
+    if before['group_id'] != instance.group_id:
+        keys = {('group', str(gid)) for gid in (before['group_id'], instance.group_id) if gid is not None}
+    if before['innovation_score'] != instance.innovation_score and project.status == 'Completed':
+        user_ids = _team_member_ids(project.id)
+    _refresh_rollups(keys, user_ids)
+
+@receiver(m2m_changed, sender=Team.members.through)
+def team_members_rollup(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        _refresh_rollups(user_ids=pk_set if isinstance(instance, Team) else {instance.pk})
+    elif action == 'pre_clear':
+        _refresh_rollups(user_ids=set(instance.members.values_list('id', flat=True)) if isinstance(instance, Team) else {instance.pk})
+
+@receiver(post_save, sender=Group)
+def group_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        from project_management.analytics_rollups import rename_group
+        rename_group(instance)
+
+
+# --- Active project cache ---
+
+def _forget_active_projects(user_ids=(), group_ids=()):
+    """Drops cached active projects of these users and the students of these groups, after commit."""
+    user_ids = set(user_ids)
+    group_ids = {gid for gid in group_ids if gid is not None}
+    def forget():
+        from .active_project import forget_active_projects
+        ids = set(user_ids)
+        if group_ids:
+            ids.update(Group.students.through.objects.filter(group_id__in=group_ids).values_list('user_id', flat=True))
+        forget_active_projects(ids)
+    transaction.on_commit(forget)
+
+@receiver(m2m_changed, sender=Team.members.through)
+@receiver(m2m_changed, sender=Group.students.through)
+def active_project_membership_changed(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        user_ids = pk_set if isinstance(instance, (Team, Group)) else {instance.pk}
+    elif action == 'pre_clear':
+        if isinstance(instance, Team):
+            user_ids = set(instance.members.values_list('id', flat=True))
+        elif isinstance(instance, Group):
+            user_ids = set(instance.students.values_list('id', flat=True))
+        else:
+            user_ids = {instance.pk}
+    else:
+        return
+    _forget_active_projects(user_ids)
+
+@receiver(pre_delete, sender=Team)
+@receiver(pre_delete, sender=Group)
+def active_project_container_deleted(sender, instance, **kwargs):
+    # The cascade removes the through rows without m2m_changed: collect the users while they are there
+    if isinstance(instance, Team):
+        user_ids = set(instance.members.values_list('id', flat=True))
+    else:
+        user_ids = set(instance.students.values_list('id', flat=True))
+        user_ids.update(ProjectSubmission.objects.filter(group=instance).values_list('student_id', flat=True))
+    _forget_active_projects(user_ids)
+
+@receiver([post_save, post_delete], sender=ProjectSubmission)
+def active_project_submission_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The group it may have just left (captured by submission_rollup_before)
+    before = getattr(instance, '_rollup_before', None) or {}
+    _forget_active_projects({instance.student_id}, {instance.group_id, before.get('group_id')})
+
+@receiver(post_save, sender=Project)
+@receiver(pre_delete, sender=Project) # team rows are gone by post_delete
+def active_project_project_changed(sender, instance, signal, raw=False, created=False, **kwargs):
+    # Only a new or deleted project changes who resolves to what
+    if raw or (signal is post_save and not created):
+        return
+    submission = instance.submission
+    _forget_active_projects(_team_member_ids(instance.id) | {submission.student_id}, {submission.group_id})
+
+
+# --- Token claims ---
+
+def _mark_claims_stale(user_ids):
+    """Sends tokens issued to these users back to database lookups, after commit."""
+    user_ids = set(user_ids)
+    def mark():
+        from .tokens import mark_claims_stale
+        mark_claims_stale(user_ids)
+    transaction.on_commit(mark)
+
+@receiver(post_save, sender=User)
+def user_claims_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    from .tokens import CLAIM_FIELDS
+    if raw or created:
+        return
+    # e.g. a last_login-only save leaves the claims as they were
+    if update_fields is not None and not set(update_fields) & set(CLAIM_FIELDS):
+        return
+    _mark_claims_stale({instance.pk})
+
+@receiver(post_delete, sender=User)
+def user_deleted_claims(sender, instance, **kwargs):
+    _mark_claims_stale({instance.pk})
+
+@receiver(pre_delete, sender=Group)
+def group_deleted_claims(sender, instance, **kwargs):
+    # The cascade removes the through rows without m2m_changed
+    _mark_claims_stale(
+        set(instance.teachers.values_list('id', flat=True)) | set(instance.students.values_list('id', flat=True))
+    )
+
+@receiver(m2m_changed, sender=Group.teachers.through)
+@receiver(m2m_changed, sender=Group.students.through)
+def group_claims_changed(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        user_ids = pk_set if isinstance(instance, Group) else {instance.pk}
+    elif action == 'pre_clear':
+        if isinstance(instance, Group):
+            user_ids = set(sender.objects.filter(group_id=instance.pk).values_list('user_id', flat=True))
+        else:
+            user_ids = {instance.pk}
+    else:
+        return
+    _mark_claims_stale(user_ids)
@@ -0,0 +1,389 @@
+# authentication/tasks.py
+"""
+DB-backed background tasks.
+
+Views call `enqueue(name, **payload)` to store a BackgroundTask row and return
+immediately; `python manage.py run_workers` drains the table with a bounded
+pool of worker threads. A task that raises is retried with exponential backoff
+until `max_attempts`, then marked failed (and its `on_failure` hook, if any, runs).
+When a task finishes either way, a 'task' event is pushed to the realtime
+topics its `notify` function returns. A task that is waiting on something
+else raises `Reschedule` to run again later without using an attempt.
+"""
+import codecs
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import requests
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import AssignmentSubmission, BackgroundTask, Project
+from project_management.utils import downscale_image_for_model
+from project_management.realtime import publish, user_topic, project_topic
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+RETRY_BASE_DELAY = 30    # seconds; doubles on each attempt
+RETRY_MAX_DELAY = 600
+STALE_AFTER = timedelta(minutes=15) # 'running' longer than this = worker died
+STALE_SWEEP_INTERVAL = 60 # seconds between run_workers' stale-task sweeps
+
+# Microservice job queue (audit, docs, issues, auto-fix)
+AI_JOBS_URL = "http://127.0.0.1:8001/jobs"
+AI_JOB_POLL_SECONDS = 5
+AI_JOB_DEADLINE = timedelta(hours=2) # stop following a job that never finishes
+
+# Bytes of an uploaded text/code file read for AI verification
+CODE_READ_LIMIT = 512 * 1024
+TEXT_READ_LIMIT = 20 * 1024
+
+
+def task(name, on_failure=None, notify=None):
+    """
+    Registers a function as a background task under `name`.
+    `notify(**payload)` returns the realtime topics told when it finishes.
+    """
+    def decorator(func):
+        func.task_name = name
+        func.on_failure = on_failure
+        func.notify = notify
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+class Reschedule(Exception):
+    """Raised by a task that isn't done yet: it runs again in `delay` seconds."""
+
+    def __init__(self, delay):
+        super().__init__(f"rescheduled in {delay}s")
+        self.delay = delay
+
+
+def enqueue(name, max_attempts=3, delay=0, **payload):
+    if name not in TASKS:
+        raise ValueError(f"Unknown task '{name}'")
+    return BackgroundTask.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+# -----------------------
+# Worker side
+# -----------------------
+
+def claim_next_task(worker_id):
+    """
+    Atomically moves the oldest due task from 'queued' to 'running'.
+    The conditional UPDATE makes the claim safe across threads and processes
+    without relying on SELECT ... FOR UPDATE (which SQLite ignores).
+    """
+    now = timezone.now()
+    candidates = list(
+        BackgroundTask.objects.filter(status='queued', run_after__lte=now)
+        .values_list('id', flat=True)[:5]
+    )
+    for task_id in candidates:
+        claimed = BackgroundTask.objects.filter(id=task_id, status='queued').update(
+            status='running',
+            attempts=F('attempts') + 1,
+            started_at=now,
+            locked_by=worker_id,
+        )
+        if claimed:
+            return BackgroundTask.objects.get(id=task_id)
+    return None
+
+
+def run_task(bg_task):
+    func = TASKS.get(bg_task.name)
+    now = timezone.now()
+    try:
+        if func is None:
+            raise LookupError(f"No task registered as '{bg_task.name}'")
+        func(**bg_task.payload)
+    except Reschedule as r:
+        bg_task.status = 'queued'
+        bg_task.attempts -= 1 # waiting isn't failing
+        bg_task.run_after = now + timedelta(seconds=r.delay)
+        bg_task.locked_by = ''
+        bg_task.save(update_fields=['status', 'attempts', 'run_after', 'locked_by'])
+        return True
+    except Exception as e:
+        bg_task.last_error = f"{type(e).__name__}: {e}"
+        if func is not None and bg_task.attempts < bg_task.max_attempts:
+            delay = min(RETRY_BASE_DELAY * (2 ** (bg_task.attempts - 1)), RETRY_MAX_DELAY)
+            bg_task.status = 'queued'
+            bg_task.run_after = now + timedelta(seconds=delay)
+            logger.warning(f"Task {bg_task.name} #{bg_task.id} failed (attempt {bg_task.attempts}), retrying in {delay}s: {e}")
+        else:
+            bg_task.status = 'failed'
+            bg_task.finished_at = now
+            logger.error(f"Task {bg_task.name} #{bg_task.id} failed permanently: {e}")
+            _run_failure_hook(func, bg_task)
+        bg_task.locked_by = ''
+        bg_task.save(update_fields=['status', 'run_after', 'last_error', 'finished_at', 'locked_by'])
+        if bg_task.status == 'failed':
+            _notify_finished(func, bg_task)
+        return False
+
+    bg_task.status = 'succeeded'
+    bg_task.finished_at = timezone.now()
+    bg_task.locked_by = ''
+    bg_task.save(update_fields=['status', 'finished_at', 'locked_by'])
+    _notify_finished(func, bg_task)
+    return True
+
+
+def _run_failure_hook(func, bg_task):
+    if func is not None and func.on_failure:
+        try:
+            func.on_failure(bg_task, **bg_task.payload)
+        except Exception as hook_error:
+            logger.error(f"on_failure hook for {bg_task} crashed: {hook_error}")
+
+
+def _notify_finished(func, bg_task):
+    if func is None or not func.notify:
+        return
+    try:
+        topics = func.notify(**bg_task.payload)
+    except Exception as e:
+        logger.warning(f"notify for {bg_task} failed: {e}")
+        return
+    event = {"task_id": bg_task.id, "name": bg_task.name, "status": bg_task.status, "payload": bg_task.payload}
+    for topic in topics:
+        publish(topic, 'task', event)
+
+
+def requeue_stale_tasks():
+    """
+    Puts tasks orphaned by a killed worker back on the queue. A task that was
+    on its last attempt fails instead (running its on_failure hook), so a task
+    that kills its worker can't loop forever. `run_workers` calls this on start
+    and every STALE_SWEEP_INTERVAL. Returns (requeued, failed) counts.
+    """
+    now = timezone.now()
+    stale = BackgroundTask.objects.filter(status='running', started_at__lt=now - STALE_AFTER)
+
+    failed = 0
+    for bg_task in stale.filter(attempts__gte=F('max_attempts')):
+        # Conditional, so a worker finishing it just now wins
+        if not BackgroundTask.objects.filter(id=bg_task.id, status='running').update(
+            status='failed', locked_by='', finished_at=now,
+            last_error=f"Worker stopped responding (attempt {bg_task.attempts} of {bg_task.max_attempts})",
+        ):
+            continue
+        bg_task.refresh_from_db()
+        logger.error(f"Task {bg_task.name} #{bg_task.id} failed permanently: {bg_task.last_error}")
+        func = TASKS.get(bg_task.name)
+        _run_failure_hook(func, bg_task)
+        _notify_finished(func, bg_task)
+        failed += 1
+
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status='queued', locked_by='', run_after=now
+    )
+    return requeued, failed
+
+
+def queue_depth():
+    """Counts per status, per-task backlog and the age of the oldest due task."""
+    by_status = dict(
+        BackgroundTask.objects.values_list('status').annotate(n=Count('id')).order_by()
+    )
+    queued = BackgroundTask.objects.filter(status='queued')
+    by_name = dict(queued.values_list('name').annotate(n=Count('id')).order_by())
+    oldest = queued.filter(run_after__lte=timezone.now()).aggregate(oldest=Min('run_after'))['oldest']
+    return {
+        'queued': by_status.get('queued', 0),
+        'running': by_status.get('running', 0),
+        'succeeded': by_status.get('succeeded', 0),
+        'failed': by_status.get('failed', 0),
+        'queued_by_task': by_name,
+        'oldest_wait_seconds': int((timezone.now() - oldest).total_seconds()) if oldest else 0,
+    }
+
+
+# -----------------------
+# Tasks
+# -----------------------
+
+def _assignment_verification_failed(bg_task, submission_id):
+    AssignmentSubmission.objects.filter(id=submission_id).update(
+        ai_feedback=f"Background verification failed: {bg_task.last_error}"
+    )
+
+
+def _assignment_submitter(submission_id):
+    submitter = AssignmentSubmission.objects.filter(id=submission_id).values_list('submitted_by_id', flat=True).first()
+    return [user_topic(submitter)] if submitter else []
+
+
+@task('verify_assignment', on_failure=_assignment_verification_failed, notify=_assignment_submitter)
+def verify_assignment_submission(submission_id):
+    """
+    AI check for a TimedAssignment submission (code review or generic/vision verification).
+    Network errors and 5xx responses raise so the runner retries them.
+    """
+    submission = AssignmentSubmission.objects.select_related('assignment', 'group').get(id=submission_id)
+    assignment = submission.assignment
+
+    # --- 1. Fetch Project Context (Applies to ALL assignment types) ---
+    group = submission.group
+    project_context = ""
+    if group:
+        # Find active project for this group via submission relationship
+        active_project = Project.objects.filter(
+            submission__group=group,
+            submission__status__in=['Approved', 'In Progress']
+        ).first()
+
+        if active_project:
+            project_context = f"Project: {active_project.title}\nAbstract: {active_project.abstract}\nCategory: {active_project.category}"
+
+    # --- 2. Determine Content to Verify ---
+    content_to_verify = submission.text_content or ""
+    image = None # downscaled JPEG (BytesIO) for the vision model
+
+    # Handle File Content Safely
+    if submission.file:
+        try:
+            file_name = submission.file.name.lower()
+            # Check if it's an image
+            if file_name.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
+                with submission.file.open('rb') as f:
+                    image = downscale_image_for_model(f)
+                content_to_verify += f"\n\n[Image File Uploaded]: {submission.file.name}"
+            else:
+                # Try to read as text (e.g., code files, txt). Only the prefix the AI
+                # will actually see is read; a large PDF is never pulled in whole.
+                read_limit = CODE_READ_LIMIT if assignment.assignment_type == 'Code' else TEXT_READ_LIMIT
+                with submission.file.open('rb') as f:
+                    # Incremental decoder: a multi-byte char cut at the limit is not an error
+                    file_content = codecs.getincrementaldecoder('utf-8')().decode(f.read(read_limit), final=False)
+                if not content_to_verify:
+                    content_to_verify = file_content
+                else:
+                    content_to_verify += f"\n\n[Attached File Content]:\n{file_content}"
+        except UnicodeDecodeError:
+            # Binary file (PDF, etc.) - Don't crash!
+            content_to_verify += f"\n\n[Binary File Uploaded]: {submission.file.name}\n(AI Note: Assume this file contains the required diagram/report as described by the filename.)"
+        except Exception as e:
+            content_to_verify += f"\n\n[Error reading file]: {str(e)}"
+
+    # --- 3. Route to Appropriate AI Endpoint ---
+    if assignment.assignment_type == 'Code' and submission.file and image is None:
+        # --- Code Review Specific Logic (Text Only) ---
+        ai_payload = {
+            'code': content_to_verify,
+            'filename': submission.file.name,
+            'context': f"{assignment.description}\n\n{project_context}" if project_context else assignment.description
+        }
+        ai_response = requests.post('http://127.0.0.1:8001/review-code', json=ai_payload, timeout=45)
+        ai_response.raise_for_status()
+
+        result = ai_response.json()
+        security_score = result.get('security_score', 0)
+        quality_score = result.get('quality_score', 0)
+        submission.ai_verified = True
+        submission.ai_score = (security_score + quality_score) / 2
+        submission.ai_feedback = f"Security: {security_score}/10, Quality: {quality_score}/10\n{result.get('ai_feedback', '')}"
+
+    else:
+        # --- Generic Verification (Diagram, Report, Other) ---
+        # Multipart upload so the image travels as raw JPEG bytes, not base64 JSON
+        ai_payload = {
+            'assignment_type': assignment.assignment_type,
+            'description': assignment.description,
+            'text_content': content_to_verify[:5000], # Limit char count
+            'project_context': project_context,
+        }
+        files = {'image': ('submission.jpg', image, 'image/jpeg')} if image is not None else None
+        ai_response = requests.post(
+            'http://127.0.0.1:8001/verify-assignment:upload',
+            data=ai_payload,
+            files=files,
+            timeout=45
+        )
+        ai_response.raise_for_status()
+
+        result = ai_response.json()
+        submission.ai_verified = result.get('is_approved', False)
+        submission.ai_score = result.get('score', 0)
+        submission.ai_feedback = result.get('feedback', '')
+
+    submission.save(update_fields=['ai_verified', 'ai_score', 'ai_feedback'])
+
+
+_analyzer = None
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from project_management.project_analyzer import ProjectAnalyzer
+        _analyzer = ProjectAnalyzer()
+    return _analyzer
+
+
+def _report_grading_failed(bg_task, project_id):
+    Project.objects.filter(id=project_id).update(
+        ai_report_feedback=f"Analysis failed: {bg_task.last_error}"
+    )
+
+
+@task('grade_final_report', on_failure=_report_grading_failed, notify=lambda project_id: [project_topic(project_id)])
+def grade_final_report(project_id):
+    project = Project.objects.get(id=project_id)
+    if not project.final_report:
+        return
+
+    result = _get_analyzer().grade_final_report(project.final_report.path)
+
+    project.ai_report_feedback = result['feedback']
+    project.ai_report_scores = result.get('scores')
+    project.final_report_content = result['content']
+    project.save(update_fields=['ai_report_feedback', 'ai_report_scores', 'final_report_content'])
+
+
+def apply_audit_result(project, job):
+    """Stores a finished audit job on the project once (it can be seen more than once)."""
+    finished_at = datetime.fromtimestamp(job["finished_at"], tz=dt_timezone.utc)
+    if project.last_audit_date and project.last_audit_date >= finished_at:
+        return
+    result = job["result"]
+    project.audit_security_score = result.get('security_score', 0)
+    project.audit_quality_score = result.get('quality_score', 0)
+    project.audit_report = result # Save full JSON
+    project.last_audit_date = finished_at
+    project.save()
+
+
+@task('collect_ai_job', notify=lambda job_id, project_id, queued_at: [project_topic(project_id)])
+def collect_ai_job(job_id, project_id, queued_at):
+    """
+    Follows a microservice job queued for a project until it finishes and
+    stores what it produced, whether or not a client is still polling.
+    """
+    response = requests.get(f"{AI_JOBS_URL}/{job_id}", timeout=10)
+    response.raise_for_status()
+    job = response.json()
+
+    if job["status"] in ('queued', 'running'):
+        if time.time() - queued_at > AI_JOB_DEADLINE.total_seconds():
+            logger.warning(f"Gave up following AI job {job_id} for project {project_id}: still {job['status']}")
+            return
+        raise Reschedule(AI_JOB_POLL_SECONDS)
+
+    if job["status"] == 'succeeded' and job["type"] == 'audit-code':
+        project = Project.objects.filter(id=project_id).first()
+        if project:
+            apply_audit_result(project, job)
+
@@ -1,3 +1,1433 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from PIL import Image
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from .models import (
+    User, Group, ProjectSubmission, Project, Team, ProgressUpdate,
+    VivaSession, VivaQuestion, ProjectArtifact, CodeReview, Checkpoint,
+    TimedAssignment, AssignmentSubmission, Message, MessageReceipt, StudentActivityLog,
+    ActivityEvent, ProjectRollup, InnovationTotal, BackgroundTask, ProjectContextSnapshot, RealtimeEvent
+)
+from .membership import project_membership
+from .active_project import resolve_active_project
+from .tokens import ClaimsJWTAuthentication, group_ids
+from . import tasks
+from project_management.utils import (
+    _build_project_context, get_project_context, refresh_project_context, downscale_image_for_model
+)
+from project_management.realtime import InMemoryBroker, DatabaseBroker, Subscription, SUBSCRIBER_QUEUE_SIZE, prune_events
+from project_management import pdf_extractor, report_grader
+
+
+class ProjectContextQueryCountTest(TestCase):
+    """_build_project_context must cost the same number of queries however much history a project has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lead = User.objects.create_user(username='lead', password='x', first_name='Lead', last_name='Student')
+        cls.group = Group.objects.create(name='G1')
+        submission = ProjectSubmission.objects.create(
+            student=cls.lead, group=cls.group, title='Smart Campus', abstract_text='IoT sensors', status='Approved'
+        )
+        cls.project = Project.objects.create(submission=submission, title='Smart Campus', abstract='IoT sensors')
+        cls.team = Team.objects.create(project=cls.project)
+        cls.team.members.add(cls.lead)
+        cls.group.students.add(cls.lead)
+
+    def _add_history(self, n):
+        for i in range(n):
+            member = User.objects.create_user(username=f'member{n}_{i}', password='x')
+            self.team.members.add(member)
+            ProgressUpdate.objects.create(project=self.project, author=member, update_text=f'Log {i}')
+            session = VivaSession.objects.create(project=self.project, student=member)
+            for j in range(3):
+                VivaQuestion.objects.create(session=session, question_text=f'Q{j}', ai_score=7)
+            ProjectArtifact.objects.create(project=self.project, image_file='a.png', description=f'Shot {i}')
+            CodeReview.objects.create(project=self.project, student=member, file_name=f'f{i}.py', code_content='x')
+
+    def test_query_count_is_fixed(self):
+        self._add_history(2)
+        with self.assertNumQueries(8):
+            small = _build_project_context(self.project)
+
+        self._add_history(10)
+        with self.assertNumQueries(8):
+            large = _build_project_context(self.project)
+
+        self.assertIn('Smart Campus', small)
+        self.assertIn('member10_9', large)
+        self.assertIn('Q2', large)
+
+
+class ProjectContextSnapshotTest(TestCase):
+    """A change rebuilds only its own snapshot section, and the chat views read the snapshot."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lead = User.objects.create_user(username='snap_lead', password='x')
+        cls.group = Group.objects.create(name='Snapshot')
+        submission = ProjectSubmission.objects.create(
+            student=cls.lead, group=cls.group, title='Smart Campus', abstract_text='IoT sensors', status='Approved'
+        )
+        cls.project = Project.objects.create(submission=submission, title='Smart Campus', abstract='IoT sensors')
+        cls.team = Team.objects.create(project=cls.project)
+        cls.team.members.add(cls.lead)
+        cls.session = VivaSession.objects.create(project=cls.project, student=cls.lead)
+        cls.question = VivaQuestion.objects.create(session=cls.session, question_text='Why MQTT?', ai_score=7)
+
+    def setUp(self):
+        get_project_context(self.project)
+        # Sentinels show which sections a later change rebuilt
+        ProjectContextSnapshot.objects.filter(project=self.project).update(
+            **{section: 'untouched' for section in ('overview', 'progress', 'viva', 'artifacts', 'code_reviews')}
+        )
+
+    def _snapshot(self):
+        return ProjectContextSnapshot.objects.get(project=self.project)
+
+    def test_progress_update_refreshes_only_progress(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ProgressUpdate.objects.create(project=self.project, author=self.lead, update_text='Wired the sensors')
+        snapshot = self._snapshot()
+        self.assertIn('Wired the sensors', snapshot.progress)
+        self.assertEqual(
+            {snapshot.overview, snapshot.viva, snapshot.artifacts, snapshot.code_reviews}, {'untouched'}
+        )
+
+    def test_viva_question_delete_refreshes_viva(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.delete()
+        snapshot = self._snapshot()
+        self.assertNotEqual(snapshot.viva, 'untouched')
+        self.assertNotIn('Why MQTT?', snapshot.viva)
+        self.assertEqual(snapshot.progress, 'untouched')
+
+    def test_mentor_chat_sends_snapshot(self):
+        client = APIClient()
+        client.force_authenticate(self.lead)
+        reply = Mock(status_code=200)
+        reply.json.return_value = {'response': 'ok'}
+        with patch('project_management.mentor_views.requests.post', return_value=reply) as post:
+            response = client.post(reverse('ai-mentor-chat'), {'message': 'How am I doing?'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(post.call_args.kwargs['json']['project_context'], self._snapshot().as_text())
+
+
+    def test_concurrent_first_build_updates_the_row(self):
+        # Another worker inserted the row between our existence check and our write
+        with patch.object(ProjectContextSnapshot.objects, 'filter', return_value=Mock(**{'first.return_value': None})):
+            refresh_project_context(self.project.id)
+        self.assertEqual(ProjectContextSnapshot.objects.filter(project=self.project).count(), 1)
+        self.assertIn('Why MQTT?', self._snapshot().viva)
+
+    def test_member_rename_refreshes_overview(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lead.first_name = 'Renamed'
+            self.lead.save()
+        self.assertIn('Renamed', self._snapshot().overview)
+
+        # A last_login-only save leaves it alone
+        ProjectContextSnapshot.objects.filter(project=self.project).update(overview='untouched')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lead.save(update_fields=['last_login'])
+        self.assertEqual(self._snapshot().overview, 'untouched')
+
+    def test_group_students_refresh_teamless_overview(self):
+        owner = User.objects.create_user(username='solo_lead', password='x')
+        submission = ProjectSubmission.objects.create(student=owner, group=self.group, title='Solo', abstract_text='x')
+        solo = Project.objects.create(submission=submission, title='Solo', abstract='x')
+        get_project_context(solo)
+        joiner = User.objects.create_user(username='late_joiner', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            joiner.student_groups.add(self.group)
+        self.assertIn('late_joiner', ProjectContextSnapshot.objects.get(project=solo).overview)
+        # The team project lists its team, not the group
+        self.assertEqual(self._snapshot().overview, 'untouched')
+
+    def test_chatbot_checks_membership_and_sends_snapshot(self):
+        outsider = User.objects.create_user(username='snap_outsider', password='x')
+        client = APIClient()
+        client.force_authenticate(outsider)
+        url = reverse('ai-chat')
+        payload = {'prompt': 'Summarise it', 'project_id': self.project.submission_id}
+        with patch('authentication.views.analyzer.get_chat_response', return_value='ok') as chat:
+            self.assertEqual(client.post(url, payload, format='json').status_code, 403)
+            chat.assert_not_called()
+
+            client.force_authenticate(self.lead)
+            response = client.post(url, payload, format='json')
+        self.assertEqual(response.data, {'response': 'ok'})
+        self.assertIn(self._snapshot().as_text(), chat.call_args.kwargs['context'])
+
+    def test_long_context_keeps_the_question(self):
+        from project_management.project_analyzer import CHAT_PROMPT_CHARS, ProjectAnalyzer
+        analyzer = ProjectAnalyzer.__new__(ProjectAnalyzer)
+        with patch.object(ProjectAnalyzer, '_ask_ai_with_fallback', return_value='ok') as ask:
+            analyzer.get_chat_response('What is left to do?', context='x' * 100000)
+        prompt = ask.call_args.args[0]
+        self.assertIn('User Query: What is left to do?', prompt)
+        self.assertLessEqual(len(prompt), CHAT_PROMPT_CHARS + 50)
+
+
+class ApprovedProjectsMemberStatsTest(TestCase):
+    """Member stats are aggregated per page, so the query count ignores team and list size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='guide', password='x', role='Teacher')
+        cls.group = Group.objects.create(name='Guided')
+        cls.group.teachers.add(cls.teacher)
+
+    def _add_project(self, name, team_size):
+        lead = User.objects.create_user(username=f'{name}_lead', password='x')
+        submission = ProjectSubmission.objects.create(
+            student=lead, group=self.group, title=name, abstract_text='x', status='Approved'
+        )
+        project = Project.objects.create(submission=submission, title=name, abstract='x', status='In Progress')
+        team = Team.objects.create(project=project)
+        for i in range(team_size):
+            member = User.objects.create_user(username=f'{name}_m{i}', password='x')
+            team.members.add(member)
+            ProgressUpdate.objects.create(project=project, author=member, update_text='log')
+            ProgressUpdate.objects.create(project=project, author=member, update_text='log')
+            CodeReview.objects.create(project=project, student=member, file_name='a.py', code_content='x')
+            session = VivaSession.objects.create(project=project, student=member)
+            VivaQuestion.objects.create(session=session, question_text='Q1', ai_score=6)
+            VivaQuestion.objects.create(session=session, question_text='Q2', ai_score=9)
+            VivaQuestion.objects.create(session=session, question_text='Q3')
+        return project
+
+    def _fetch(self):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        response = client.get(reverse('teacher-approved-projects'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_is_fixed(self):
+        self._add_project('alpha', 1)
+        with self.assertNumQueries(6):
+            small = self._fetch()
+
+        for name in ('beta', 'gamma', 'delta'):
+            self._add_project(name, 5)
+        with self.assertNumQueries(6):
+            large = self._fetch()
+
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 4)
+        stats = {s['username']: s for p in large for s in p['member_stats']}
+        self.assertEqual(stats['beta_m4']['updates_count'], 2)
+        self.assertEqual(stats['beta_m4']['reviews_count'], 1)
+        self.assertEqual(stats['beta_m4']['viva_average'], 7.5)
+
+
+class DashboardQueryCountTest(TestCase):
+    """Student and teacher submission dashboards cost a fixed number of queries per page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='dash_guide', password='x', role='Teacher')
+        cls.student = User.objects.create_user(username='dash_student', password='x')
+        cls.group = Group.objects.create(name='Dashboard')
+        cls.group.teachers.add(cls.teacher)
+        cls.group.students.add(cls.student)
+
+    def _add_submissions(self, n, team_size):
+        for i in range(n):
+            tag = f'{ProjectSubmission.objects.count()}'
+            submission = ProjectSubmission.objects.create(
+                student=self.student, group=self.group, title=f'Idea {tag}', abstract_text='x', status='Submitted'
+            )
+            project = Project.objects.create(submission=submission, title=f'Idea {tag}', abstract='x')
+            team = Team.objects.create(project=project)
+            team.members.add(self.student)
+            for j in range(team_size):
+                team.members.add(User.objects.create_user(username=f'dash_{tag}_{j}', password='x'))
+
+    def _get(self, user, url_name):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_student_dashboard(self):
+        self._add_submissions(1, 1)
+        with self.assertNumQueries(4):
+            small = self._get(self.student, 'student-submissions')
+
+        self._add_submissions(6, 4)
+        with self.assertNumQueries(4):
+            large = self._get(self.student, 'student-submissions')
+
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 7)
+        # Team members plus the group's teacher, who students can DM
+        usernames = {m['username'] for m in large[0]['team_members']}
+        self.assertIn('dash_guide', usernames)
+        self.assertEqual(len(usernames), 6)
+
+    def test_teacher_dashboards(self):
+        self._add_submissions(1, 0)
+        for url_name in ('teacher-submissions', 'teacher-appointed-submissions'):
+            with self.assertNumQueries(1):
+                self._get(self.teacher, url_name)
+
+        self._add_submissions(6, 0)
+        for url_name in ('teacher-submissions', 'teacher-appointed-submissions'):
+            with self.assertNumQueries(1):
+                data = self._get(self.teacher, url_name)
+            self.assertEqual(len(data), 7)
+            self.assertEqual(data[0]['student']['username'], 'dash_student')
+            self.assertIsNotNone(data[0]['project_id'])
+
+
+class AnnotatedListQueryCountTest(TestCase):
+    """Checkpoint status and assignment submitted flags come from annotations, not per-row queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='cp_guide', password='x', role='Teacher')
+        cls.student = User.objects.create_user(username='cp_student', password='x')
+        cls.group = Group.objects.create(name='Checkpoints')
+        cls.group.students.add(cls.student)
+        submission = ProjectSubmission.objects.create(
+            student=cls.student, group=cls.group, title='Roadmap', abstract_text='x', status='Approved'
+        )
+        cls.project = Project.objects.create(submission=submission, title='Roadmap', abstract='x')
+
+    def _get(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_checkpoint_status(self):
+        statuses = ['Approved', 'Pending', 'Rejected', None]
+        for i in range(8):
+            checkpoint = Checkpoint.objects.create(project=self.project, title=f'Step {i}')
+            ProgressUpdate.objects.create(project=self.project, author=self.student, update_text='old', checkpoint=checkpoint, status='Approved')
+            if statuses[i % 4]:
+                ProgressUpdate.objects.create(project=self.project, author=self.student, update_text='new', checkpoint=checkpoint, status=statuses[i % 4])
+        Checkpoint.objects.filter(title='Step 0').update(is_completed=True)
+
+        with self.assertNumQueries(2):
+            data = self._get(self.teacher, reverse('checkpoint-list', args=[self.project.id]))
+
+        self.assertEqual(
+            [c['status'] for c in data[:4]],
+            ['Completed', 'Pending Approval', 'Rejected', 'Incomplete']
+        )
+
+    def test_assignment_submitted_flag(self):
+        for i in range(6):
+            assignment = TimedAssignment.objects.create(
+                title=f'Task {i}', description='x', created_by=self.teacher, duration_minutes=30
+            )
+            assignment.assigned_groups.add(self.group)
+            if i % 2:
+                AssignmentSubmission.objects.create(assignment=assignment, group=self.group, submitted_by=self.student)
+
+        with self.assertNumQueries(2):
+            data = self._get(self.student, reverse('assignment-list'))
+
+        flags = {a['title']: a['is_submitted'] for a in data}
+        self.assertEqual(flags, {f'Task {i}': bool(i % 2) for i in range(6)})
+        self.assertEqual(data[0]['assigned_groups'], [self.group.id])
+
+
+class MessageReceiptTest(TestCase):
+    """A broadcast is one Message row plus a receipt per member; read state is per receipt."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='msg_guide', password='x', role='Teacher')
+        cls.students = [User.objects.create_user(username=f'msg_s{i}', password='x') for i in range(4)]
+        cls.group = Group.objects.create(name='Messaging')
+        cls.group.teachers.add(cls.teacher)
+        cls.group.students.add(*cls.students)
+        submission = ProjectSubmission.objects.create(
+            student=cls.students[0], group=cls.group, title='Chat', abstract_text='x', status='Approved'
+        )
+        cls.project = Project.objects.create(submission=submission, title='Chat', abstract='x')
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_broadcast_and_read_state(self):
+        url = reverse('project-messages', args=[self.project.id])
+        response = self._client(self.teacher).post(url, {'content': 'Standup at 10', 'message_type': 'GUIDE_GROUP'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertEqual(MessageReceipt.objects.count(), 5)
+
+        reader = self._client(self.students[1])
+        messages = reader.get(url, {'type': 'GUIDE_GROUP'}).json()
+        self.assertEqual([(m['content'], m['is_read']) for m in messages], [('Standup at 10', False)])
+        # The sender sees their own message in the channel
+        self.assertEqual(len(self._client(self.teacher).get(url).json()), 1)
+
+        response = reader.post(reverse('mark-messages-read', args=[self.project.id]))
+        self.assertEqual(response.json()['detail'], 'Marked 1 messages as read.')
+        self.assertTrue(reader.get(url).json()[0]['is_read'])
+        self.assertFalse(self._client(self.students[2]).get(url).json()[0]['is_read'])
+
+        # TEAM_GROUP goes to students only
+        self._client(self.students[0]).post(url, {'content': 'Team only', 'message_type': 'TEAM_GROUP'})
+        self.assertEqual(len(self._client(self.students[3]).get(url, {'type': 'TEAM_GROUP'}).json()), 1)
+        self.assertEqual(self._client(self.teacher).get(url, {'type': 'TEAM_GROUP'}).json(), [])
+
+    def test_dm_read_state_is_the_recipients(self):
+        url = reverse('project-messages', args=[self.project.id])
+        sender, recipient = self.students[0], self.teacher
+        self._client(sender).post(url, {'content': 'Question', 'message_type': 'DM', 'recipient_id': recipient.id})
+
+        query = {'type': 'DM', 'target_user_id': recipient.id}
+        sent = self._client(sender).get(url, query).json()
+        self.assertEqual((sent[0]['recipient_username'], sent[0]['is_read']), ('msg_guide', False))
+
+        self._client(recipient).post(reverse('mark-messages-read', args=[self.project.id]))
+        self.assertTrue(self._client(sender).get(url, query).json()[0]['is_read'])
+
+
+class KeysetPaginationTest(TestCase):
+    """Chat history is paged on (timestamp, id); `since` returns only newer messages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(username='page_student', password='x')
+        cls.group = Group.objects.create(name='Paging')
+        cls.group.students.add(cls.student)
+        submission = ProjectSubmission.objects.create(
+            student=cls.student, group=cls.group, title='Paging', abstract_text='x', status='Approved'
+        )
+        cls.project = Project.objects.create(submission=submission, title='Paging', abstract='x')
+        for i in range(7):
+            message = Message.objects.create(project=cls.project, sender=cls.student, content=f'm{i}', message_type='GUIDE_GROUP')
+            MessageReceipt.objects.create(message=message, recipient=cls.student, is_read=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = reverse('project-messages', args=[self.project.id])
+
+    def test_latest_page_then_older_then_since(self):
+        response = self.client.get(self.url, {'limit': 3})
+        self.assertEqual([m['content'] for m in response.json()], ['m4', 'm5', 'm6'])
+        self.assertEqual(response['X-Has-More'], 'true')
+
+        older = self.client.get(self.url, {'limit': 3, 'before': response['X-Oldest-Cursor']})
+        self.assertEqual([m['content'] for m in older.json()], ['m1', 'm2', 'm3'])
+
+        latest = response['X-Latest-Cursor']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, {'since': latest}).json(), [])
+
+        self.client.post(self.url, {'content': 'new', 'message_type': 'GUIDE_GROUP'})
+        newer = self.client.get(self.url, {'since': latest})
+        self.assertEqual([m['content'] for m in newer.json()], ['new'])
+        self.assertNotEqual(newer['X-Latest-Cursor'], latest)
+
+    def test_default_page_is_bounded(self):
+        response = self.client.get(self.url)
+        self.assertEqual([m['content'] for m in response.json()], [f'm{i}' for i in range(7)])
+        self.assertEqual(response['X-Has-More'], 'false')
+
+        with patch('authentication.pagination.KeysetPagination.page_size', 5), \
+                patch('authentication.pagination.KeysetPagination.max_page_size', 6):
+            self.assertEqual([m['content'] for m in self.client.get(self.url).json()], ['m2', 'm3', 'm4', 'm5', 'm6'])
+            capped = self.client.get(self.url, {'limit': 1000})
+        self.assertEqual(len(capped.json()), 6)
+        self.assertEqual(capped['X-Has-More'], 'true')
+
+    def test_admin_dashboard_bounds_users_and_groups(self):
+        admin = User.objects.create_user(username='page_admin', password='x', role='HOD/Admin')
+        Group.objects.create(name='Paging 2')
+        self.client.force_authenticate(admin)
+        with patch('authentication.views.ADMIN_GROUP_LIMIT', 1):
+            response = self.client.get(reverse('admin-dashboard'), {'limit': 1})
+        data = response.json()
+        self.assertEqual([u['username'] for u in data['users']], ['page_admin'])
+        self.assertEqual(response['X-Has-More'], 'true')
+        self.assertEqual(([g['name'] for g in data['groups']], data['groups_truncated']), (['Paging'], True))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid cursor.'})
+
+
+class RealtimeBrokerTest(TestCase):
+    """Published events reach only the subscribed topics; slow streams are told to resync."""
+
+    def test_publish_and_overflow(self):
+        broker = InMemoryBroker()
+
+        async def scenario():
+            mine = broker.subscribe(['user:1', 'project:7'])
+            other = broker.subscribe(['user:2'])
+            broker.publish('project:7', {'event': 'typing'})
+            await asyncio.sleep(0)
+            received = mine.queue.get_nowait()
+            self.assertTrue(other.queue.empty())
+
+            for i in range(SUBSCRIBER_QUEUE_SIZE + 5):
+                broker.publish('user:1', {'event': 'message', 'data': i})
+            await asyncio.sleep(0)
+            self.assertTrue(mine.overflowed)
+
+            broker.unsubscribe(mine)
+            broker.unsubscribe(other)
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), {'event': 'typing'})
+        self.assertEqual(dict(broker._subscribers), {})
+
+    def test_database_broker_relays_between_processes(self):
+        worker, web = DatabaseBroker(), DatabaseBroker()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        stream = Subscription(['project:7'], loop)
+        web._subscribers['project:7'].add(stream)
+
+        worker.publish('project:7', {'event': 'before the stream opened'})
+        self.assertEqual(web.relay_new_events(), 0) # starts from the tail
+        worker.publish('project:7', {'event': 'task'})
+        worker.publish('user:1', {'event': 'message'})
+        self.assertEqual(web.relay_new_events(), 2)
+
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(stream.queue.get_nowait(), {'event': 'task'})
+        self.assertTrue(stream.queue.empty())
+
+    def test_database_broker_relays_late_commits_and_keeps_typing_local(self):
+        web = DatabaseBroker()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        stream = Subscription(['project:7'], loop)
+        web._subscribers['project:7'].add(stream)
+        web.relay_new_events()
+
+        RealtimeEvent.objects.create(id=100, topic='project:7', payload={'event': 'first'})
+        self.assertEqual(web.relay_new_events(), 1)
+        # A transaction that took id 50 earlier commits only now
+        RealtimeEvent.objects.create(id=50, topic='project:7', payload={'event': 'late'})
+        self.assertEqual(web.relay_new_events(), 1)
+        self.assertEqual(web.relay_new_events(), 0)
+
+        web.publish('project:7', {'event': 'typing'})
+        self.assertEqual(RealtimeEvent.objects.count(), 2)
+        loop.run_until_complete(asyncio.sleep(0))
+        received = [stream.queue.get_nowait()['event'] for _ in range(3)]
+        self.assertEqual(received, ['first', 'late', 'typing'])
+
+    def test_prune_events(self):
+        old = RealtimeEvent.objects.create(topic='user:1', payload={})
+        RealtimeEvent.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(hours=1))
+        RealtimeEvent.objects.create(topic='user:1', payload={})
+        self.assertEqual(prune_events(), 1)
+        self.assertEqual(RealtimeEvent.objects.count(), 1)
+
+
+class TypingPresenceTest(TestCase):
+    """Typing indicators live in the cache, and so does the membership check: keystrokes and polls cost no queries."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_typing_round_trip(self):
+        alice = User.objects.create_user(username='alice', password='x')
+        bob = User.objects.create_user(username='bob', password='x')
+        mallory = User.objects.create_user(username='mallory', password='x')
+        submission = ProjectSubmission.objects.create(student=alice, title='Typing', abstract_text='x', status='Approved')
+        project = Project.objects.create(submission=submission, title='Typing', abstract='x')
+        Team.objects.create(project=project).members.add(alice, bob)
+        url = reverse('project-typing', args=[project.id])
+        client = APIClient()
+
+        client.force_authenticate(alice)
+        self.assertEqual(client.post(url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.post(url).status_code, 200)
+            self.assertEqual(client.get(url).json(), {"typing_users": []})
+
+        client.force_authenticate(mallory)
+        self.assertEqual(client.post(url).status_code, 403)
+        self.assertEqual(client.get(url).status_code, 403)
+        self.assertEqual(client.post(reverse('project-typing', args=[999999])).status_code, 403)
+
+        client.force_authenticate(bob)
+        self.assertEqual(client.get(url).json(), {"typing_users": ['alice']})
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(url).json(), {"typing_users": ['alice']})
+
+
+class ActivityFeedTest(TestCase):
+    """Feeds are one range query over ActivityEvent rows written by signals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='feed_guide', password='x', role='Teacher')
+        cls.student = User.objects.create_user(username='feed_student', password='x')
+        cls.outsider = User.objects.create_user(username='feed_outsider', password='x')
+        cls.group = Group.objects.create(name='Feed')
+        cls.group.teachers.add(cls.teacher)
+        cls.group.students.add(cls.student, cls.outsider)
+        submission = ProjectSubmission.objects.create(
+            student=cls.student, group=cls.group, title='Feed Project', abstract_text='x'
+        )
+        cls.project = Project.objects.create(submission=submission, title='Feed Project', abstract='x')
+        Message.objects.create(project=cls.project, sender=cls.teacher, content='Welcome to the project', message_type='GUIDE_GROUP')
+        Message.objects.create(project=cls.project, sender=cls.teacher, recipient=cls.student, content='Private note', message_type='DM')
+        StudentActivityLog.objects.create(student=cls.student, project=cls.project, action='Code Copied')
+        assignment = TimedAssignment.objects.create(title='ER Diagram', description='x', created_by=cls.teacher, duration_minutes=30)
+        assignment.assigned_groups.add(cls.group)
+
+    def _feed(self, user, url_name):
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.assertNumQueries(1):
+            response = client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return [item['text'] for item in response.json()]
+
+    def test_signals_write_events(self):
+        self.assertEqual(
+            sorted(ActivityEvent.objects.values_list('kind', flat=True)),
+            ['assignment', 'message', 'message', 'submission', 'system']
+        )
+
+    def test_teacher_feed(self):
+        texts = self._feed(self.teacher, 'teacher-activity')
+        self.assertEqual(texts, [
+            'feed_student: Code Copied',
+            'New message from feed_guide in Feed Project',
+            'New message from feed_guide in Feed Project',
+            "New project 'Feed Project' submitted by feed_student",
+        ])
+
+    def test_student_feeds(self):
+        self.assertEqual(self._feed(self.student, 'student-activity'), [
+            'New assignment: ER Diagram',
+            'Message from feed_guide: Private note...',
+            'Message from feed_guide: Welcome to the project...',
+            "You submitted project 'Feed Project'",
+        ])
+        # Others in the group see the broadcasts but not the DM or my submission
+        self.assertEqual(self._feed(self.outsider, 'student-activity'), [
+            'New assignment: ER Diagram',
+            'Message from feed_guide: Welcome to the project...',
+        ])
+
+    def test_team_project_without_group_reaches_team_and_teachers_only(self):
+        submission = ProjectSubmission.objects.create(student=self.student, title='Team Project', abstract_text='x')
+        project = Project.objects.create(submission=submission, title='Team Project', abstract='x')
+        Team.objects.create(project=project).members.add(self.student)
+        Message.objects.create(project=project, sender=self.student, content='Standup at 5', message_type='TEAM_GROUP')
+        self.assertEqual(
+            set(ActivityEvent.objects.filter(summary='Standup at 5').values_list('group_id', 'user_id', 'broadcast')),
+            {(self.group.id, None, False), (None, self.student.id, False)},
+        )
+        self.assertIn('New message from feed_student in Team Project', self._feed(self.teacher, 'teacher-activity'))
+        self.assertIn('Message from feed_student: Standup at 5...', self._feed(self.student, 'student-activity'))
+        # A classmate in the members' group who is not on the team doesn't see it
+        self.assertNotIn('Message from feed_student: Standup at 5...', self._feed(self.outsider, 'student-activity'))
+
+        # The 0007 backfill files old messages the same way
+        from django.apps import apps
+        backfill = importlib.import_module('authentication.migrations.0007_activityevent').backfill_events
+        written = set(ActivityEvent.objects.values_list('kind', 'ref', 'group_id', 'user_id', 'broadcast'))
+        ActivityEvent.objects.all().delete()
+        backfill(apps, None)
+        self.assertEqual(set(ActivityEvent.objects.values_list('kind', 'ref', 'group_id', 'user_id', 'broadcast')), written)
+
+
+class TeacherStatsCacheTest(TestCase):
+    """Dashboard counters come from one query, then the cache until a signal bumps the version."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='stats_guide', password='x', role='Teacher')
+        self.student = User.objects.create_user(username='stats_student', password='x')
+        self.mine = Group.objects.create(name='Stats Mine')
+        self.mine.teachers.add(self.teacher)
+        self.orphan = Group.objects.create(name='Stats Orphan')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def _submit(self, group, title, status='Submitted', project_status=None):
+        submission = ProjectSubmission.objects.create(
+            student=self.student, group=group, title=title, abstract_text='x', status=status
+        )
+        if project_status:
+            return Project.objects.create(submission=submission, title=title, abstract='x', status=project_status)
+        return submission
+
+    def _stats(self, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(reverse('teacher-stats')).json()
+
+    def test_counts_cache_and_invalidation(self):
+        active = self._submit(self.mine, 'Active', status='Approved', project_status='In Progress')
+        VivaSession.objects.create(project=active, student=self.student)
+        VivaSession.objects.create(project=active, student=self.student)
+        self._submit(self.orphan, 'Orphan', status='Approved', project_status='In Progress')
+        TimedAssignment.objects.create(title='Live', description='x', created_by=self.teacher, duration_minutes=30)
+        other_group = Group.objects.create(name='Stats Pending')
+        other_group.teachers.add(self.teacher)
+        self._submit(other_group, 'Waiting')
+        self._submit(self.mine, 'Pivot')  # group already has a project: not pending
+
+        expected = {
+            "pending_approvals": 1,
+            "active_projects": 1,
+            "active_assignments": 1,
+            "vivas_scheduled": 2,
+            "unappointed_ongoing": 1,
+        }
+        self.assertEqual(self._stats(1), expected)
+        self.assertEqual(self._stats(0), expected)
+
+        # The version bump waits for the commit, like in production
+        with self.captureOnCommitCallbacks(execute=True):
+            self._submit(self.orphan, 'Second Orphan', status='Approved', project_status='In Progress')
+        self.assertEqual(self._stats(1)['unappointed_ongoing'], 2)
+
+        # Saves that can't move a counter keep the cache; a viva session only orphans its own counter
+        versions = cache.get_many([f'teacher_stats:version:{name}' for name in expected])
+        with self.captureOnCommitCallbacks(execute=True):
+            active.ai_report_scores = {'clarity': 8}
+            active.save(update_fields=['ai_report_scores'])
+        self._stats(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            VivaSession.objects.create(project=active, student=self.student)
+        bumped = {
+            key for key, value in cache.get_many(versions).items() if value != versions[key]
+        }
+        self.assertEqual(bumped, {'teacher_stats:version:vivas_scheduled'})
+        self.assertEqual(self._stats(1)['vivas_scheduled'], 3)
+
+
+class AnalyticsRollupTest(TestCase):
+    """Analytics and the innovation leaderboard read rollup rows that signals keep current."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='rollup_guide', password='x', role='Teacher')
+        self.alice = User.objects.create_user(username='rollup_alice', password='x')
+        self.bob = User.objects.create_user(username='rollup_bob', password='x')
+        self.group = Group.objects.create(name='Rollup A')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def _project(self, title, members, score, status='In Progress', category='IoT'):
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = ProjectSubmission.objects.create(
+                student=members[0], group=self.group, title=title, abstract_text='x',
+                status='Approved', innovation_score=score
+            )
+            project = Project.objects.create(submission=submission, title=title, abstract='x', status=status, category=category)
+            team = Team.objects.create(project=project)
+            team.members.add(*members)
+        return project
+
+    def test_rollups_follow_changes(self):
+        one = self._project('One', [self.alice, self.bob], 4.0, status='Completed')
+        self._project('Two', [self.alice], 9.0, category='Mobile App')
+
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('analytics')).json()
+        self.assertEqual(data['project_status_counts'], [
+            {'status': 'Completed', 'count': 1}, {'status': 'In Progress', 'count': 1},
+        ])
+        self.assertEqual(data['project_group_counts'], [{'group': self.group.id, 'group_name': 'Rollup A', 'count': 2}])
+        self.assertEqual(InnovationTotal.objects.get(user=self.alice).total, 4.0)
+
+        # Completing 'Two' moves its status bucket and adds its score to alice only
+        two = Project.objects.get(title='Two')
+        with self.captureOnCommitCallbacks(execute=True):
+            two.status = 'Completed'
+            two.save()
+        self.assertEqual(ProjectRollup.objects.get(dimension='status', key='Completed').count, 2)
+        self.assertFalse(ProjectRollup.objects.filter(dimension='status', key='In Progress').exists())
+        self.assertEqual(InnovationTotal.objects.get(user=self.alice).total, 13.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            one.team.members.remove(self.bob)
+        self.assertFalse(InnovationTotal.objects.filter(user=self.bob).exists())
+
+        board = self.client.get(reverse('leaderboard')).json()
+        self.assertEqual([u['username'] for u in board], ['rollup_alice'])
+
+        # The full rebuild agrees with the incremental rows
+        incremental = sorted(ProjectRollup.objects.values_list('dimension', 'key', 'label', 'count'))
+        call_command('refresh_analytics', stdout=io.StringIO())
+        self.assertEqual(sorted(ProjectRollup.objects.values_list('dimension', 'key', 'label', 'count')), incremental)
+        self.assertEqual(InnovationTotal.objects.get(user=self.alice).completed_projects, 2)
+
+
+class ProjectMembershipTest(TestCase):
+    """One memoized EXISTS query resolves a user's roles on a project for the whole request."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='mem_owner', password='x')
+        self.member = User.objects.create_user(username='mem_member', password='x')
+        self.classmate = User.objects.create_user(username='mem_classmate', password='x')
+        self.teacher = User.objects.create_user(username='mem_teacher', password='x', role='Teacher')
+        self.outsider = User.objects.create_user(username='mem_outsider', password='x')
+        group = Group.objects.create(name='Membership Group')
+        group.students.add(self.owner, self.classmate)
+        group.teachers.add(self.teacher)
+        submission = ProjectSubmission.objects.create(student=self.owner, group=group, title='Mem', abstract_text='x')
+        self.project = Project.objects.create(submission=submission, title='Mem', abstract='x')
+        Team.objects.create(project=self.project).members.add(self.owner, self.member)
+
+    def _request(self, user):
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        return request
+
+    def test_roles_resolved_once_per_request(self):
+        request = self._request(self.classmate)
+        with self.assertNumQueries(1):
+            roles = project_membership(request, self.project)
+            self.assertIs(project_membership(request, self.project.id), roles)
+        self.assertEqual(tuple(roles), (False, False, True, False))
+        self.assertEqual(tuple(project_membership(self._request(self.owner), self.project)), (True, True, True, False))
+        self.assertEqual(tuple(project_membership(self._request(self.teacher), self.project)), (False, False, False, True))
+        self.assertFalse(project_membership(self._request(self.outsider), self.project).any)
+        self.assertFalse(project_membership(self._request(self.owner), 999999).any)
+
+    def test_permission_class_and_view_share_the_lookup(self):
+        client = APIClient()
+        url = reverse('project-progress-logs', args=[self.project.id])
+        client.force_authenticate(self.teacher)
+        # project fetch, one membership query for both permission hooks, the list
+        with self.assertNumQueries(3):
+            self.assertEqual(client.get(url).status_code, 200)
+        # Group classmates aren't owner, member or teacher
+        client.force_authenticate(self.classmate)
+        self.assertEqual(client.get(url).status_code, 403)
+        # A project without a team used to 500 here
+        Team.objects.filter(project=self.project).delete()
+        client.force_authenticate(self.outsider)
+        response = client.post(reverse('checkpoint-generate', args=[self.project.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class ActiveProjectResolverTest(TestCase):
+    """'The user's project' is resolved in one query, cached, and dropped when memberships change."""
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='active_student', password='x')
+        self.lead = User.objects.create_user(username='active_lead', password='x')
+        self.group = Group.objects.create(name='Active Group')
+
+    def _project(self, owner, title, group=None):
+        submission = ProjectSubmission.objects.create(student=owner, group=group, title=title, abstract_text='x')
+        return Project.objects.create(submission=submission, title=title, abstract='x')
+
+    def _resolve(self, queries):
+        with self.assertNumQueries(queries):
+            return resolve_active_project(self.student)
+
+    def test_precedence_and_invalidation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            proposal = ProjectSubmission.objects.create(student=self.student, title='Idea', abstract_text='x')
+        self.assertEqual(self._resolve(2), (None, proposal.id))
+        self.assertEqual(self._resolve(0), (None, proposal.id))
+
+        # A project in one of my groups beats a bare proposal
+        with self.captureOnCommitCallbacks(execute=True):
+            group_project = self._project(self.lead, 'Group Work', self.group)
+            self.group.students.add(self.student)
+        self.assertEqual(self._resolve(1), (group_project.id, group_project.submission_id))
+
+        # ...and a team I am on beats the group
+        with self.captureOnCommitCallbacks(execute=True):
+            team_project = self._project(self.lead, 'Team Work')
+            Team.objects.create(project=team_project).members.add(self.student)
+        self.assertEqual(self._resolve(1)[0], team_project.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            team_project.team.members.remove(self.student)
+        self.assertEqual(self._resolve(1)[0], group_project.id)
+
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get(reverse('student-my-project')).json()['title'], 'Group Work')
+
+    def test_deleting_team_or_group_forgets(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            group_project = self._project(self.lead, 'Group Work', self.group)
+            self.group.students.add(self.student)
+            team_project = self._project(self.lead, 'Team Work')
+            Team.objects.create(project=team_project).members.add(self.student)
+        self.assertEqual(self._resolve(1)[0], team_project.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            team_project.team.delete()
+        self.assertEqual(self._resolve(1)[0], group_project.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        self.assertEqual(self._resolve(2), (None, None))
+
+
+class SharedTestCache(LocMemCache):
+    """Stands in for Redis: a backend the token code treats as shared between processes."""
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'authentication.tests.SharedTestCache'}})
+class ClaimsJWTAuthenticationTest(TestCase):
+    """With a shared cache, safe requests with fresh token claims authenticate without a user lookup."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='claims_teacher', password='x', role='Teacher')
+        self.group = Group.objects.create(name='Claims Group')
+        self.group.teachers.add(self.teacher)
+
+    def _token(self):
+        response = APIClient().post(reverse('jwt-create'), {'username': 'claims_teacher', 'password': 'x'})
+        return response.json()['access']
+
+    def _authenticate(self, token, method='get', queries=0):
+        request = getattr(RequestFactory(), method)('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.assertNumQueries(queries):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+            return user.pk, user.role
+
+    def test_claims_user_and_fallbacks(self):
+        token = self._token()
+        self.assertEqual(self._authenticate(token), (self.teacher.pk, 'Teacher'))
+        # Writes always read the user row
+        self.assertEqual(self._authenticate(token, 'post', queries=1), (self.teacher.pk, 'Teacher'))
+
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        user, _ = ClaimsJWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(group_ids(user, 'teaching'), [self.group.id])
+        with self.assertNumQueries(1): # deferred, loaded on demand
+            self.assertIsNotNone(user.date_joined)
+
+        # A last_login-only save keeps the claims fresh; a role change doesn't
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.save(update_fields=['last_login'])
+        self.assertEqual(self._authenticate(token), (self.teacher.pk, 'Teacher'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.role = 'HOD/Admin'
+            self.teacher.save()
+        self.assertEqual(self._authenticate(token, queries=1), (self.teacher.pk, 'HOD/Admin'))
+        self.assertEqual(self._authenticate(self._token()), (self.teacher.pk, 'HOD/Admin'))
+
+        # So does a group membership change
+        token = self._token()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.teachers.remove(self.teacher)
+        self._authenticate(token, queries=1)
+
+        # ...and deleting a group, whose membership rows go without m2m_changed
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.create(name='Doomed').teachers.add(self.teacher)
+        token = self._token()
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(name='Doomed').delete()
+        self._authenticate(token, queries=1)
+
+    def test_polling_endpoint_with_bearer_token(self):
+        ActivityEvent.objects.create(kind='system', ref='sys_1', group=self.group, summary='Hello')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._token()}')
+        response = client.get(reverse('teacher-activity'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a['id'] for a in response.json()], ['sys_1'])
+
+
+class LocalCacheClaimsTest(TestCase):
+    """With a per-process cache, stale marks can be missing, so the user row is always read."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='local_teacher', password='x', role='Teacher')
+        response = APIClient().post(reverse('jwt-create'), {'username': 'local_teacher', 'password': 'x'})
+        self.token = response.json()['access']
+
+    def _authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_missing_stale_mark_after_role_change_or_delete(self):
+        # The change happened in another process (or before a restart): no mark here
+        User.objects.filter(pk=self.teacher.pk).update(role='Student')
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._authenticate().role, 'Student')
+
+        User.objects.filter(pk=self.teacher.pk).delete()
+        cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_stream_token_reads_the_user_row(self):
+        from project_management.realtime_views import _authenticate
+        User.objects.filter(pk=self.teacher.pk).update(role='Student')
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(_authenticate(RequestFactory().get('/', {'token': self.token})).role, 'Student')
+
+
+class BackfillSentimentTest(TestCase):
+    """backfill_sentiment scores missing sentiments through /sentiment:batch in id-ordered batches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='sentiment_author', password='x')
+        submission = ProjectSubmission.objects.create(student=author, title='Mood', abstract_text='x')
+        project = Project.objects.create(submission=submission, title='Mood', abstract='x')
+        cls.updates = [
+            ProgressUpdate.objects.create(project=project, author=author, update_text=f'update {i}')
+            for i in range(5)
+        ]
+        cls.updates[0].sentiment = 'Positive'
+        cls.updates[0].save()
+
+    def _fake_post(self, url, json, timeout):
+        self.sent.append(json['texts'])
+        canned = {'update 3': {"sentiment": "Negative"}, 'update 4': {"error": "Model loading"}}
+        results = [canned.get(text, {"sentiment": "Neutral"}) for text in json['texts']]
+        return Mock(status_code=200, **{'json.return_value': {"results": results}})
+
+    def test_batches_and_bulk_saves(self):
+        self.sent = []
+        with patch('project_management.management.commands.backfill_sentiment.requests.post', side_effect=self._fake_post):
+            call_command('backfill_sentiment', batch_size=2, stdout=io.StringIO())
+
+        # Already-scored update 0 is skipped; the rest go two at a time
+        self.assertEqual(self.sent, [['update 1', 'update 2'], ['update 3', 'update 4']])
+        sentiments = dict(ProgressUpdate.objects.values_list('update_text', 'sentiment'))
+        self.assertEqual(sentiments, {
+            'update 0': 'Positive', 'update 1': 'Neutral', 'update 2': 'Neutral',
+            'update 3': 'Negative', 'update 4': None,
+        })
+
+
+class AIJobCollectorTest(TestCase):
+    """Queued microservice jobs are followed by one background task that stores the audit when it finishes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(username='audit_student', password='x')
+        submission = ProjectSubmission.objects.create(student=cls.student, title='Repo', abstract_text='x')
+        cls.project = Project.objects.create(
+            submission=submission, title='Repo', abstract='x', github_repo_link='https://github.com/a/b'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = reverse('project-audit', args=[self.project.id])
+
+    def test_enqueue_follows_each_job_once(self):
+        queued = Mock(status_code=202, **{'json.return_value': {"job_id": "job1", "status": "queued"}})
+        with patch('authentication.views.requests.post', return_value=queued):
+            self.assertEqual(self.client.post(self.url).status_code, 202)
+            self.assertEqual(self.client.post(self.url).status_code, 202)
+        collectors = BackgroundTask.objects.filter(name='collect_ai_job')
+        self.assertEqual([t.payload['job_id'] for t in collectors], ['job1'])
+
+    def test_non_json_error_is_a_502(self):
+        broken = Mock(status_code=500, text='<html>Internal Server Error</html>')
+        broken.json.side_effect = ValueError
+        with patch('authentication.views.requests.post', return_value=broken):
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json(), {"error": "AI Service error"})
+
+    def test_collector_waits_then_stores_audit(self):
+        bg_task = tasks.enqueue('collect_ai_job', job_id='job1', project_id=self.project.id, queued_at=time.time())
+        running = {"type": "audit-code", "status": "running"}
+        done = {
+            "type": "audit-code", "status": "succeeded", "finished_at": time.time(),
+            "result": {"security_score": 7, "quality_score": 9},
+        }
+        broker = Mock()
+        for job in (running, done):
+            claimed = tasks.claim_next_task('test')
+            self.assertEqual(claimed.id, bg_task.id)
+            with patch('authentication.tasks.requests.get', return_value=Mock(**{'json.return_value': job})), \
+                    patch('project_management.realtime.get_broker', return_value=broker), \
+                    self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(tasks.run_task(claimed))
+            BackgroundTask.objects.filter(id=bg_task.id).update(run_after=timezone.now())
+
+        bg_task.refresh_from_db()
+        self.assertEqual((bg_task.status, bg_task.attempts), ('succeeded', 1))
+        # The project's streams hear about the finished job once
+        pushed = [
+            payload['data']['name'] for (topic, payload), _ in broker.publish.call_args_list
+            if topic == f'project:{self.project.id}'
+        ]
+        self.assertEqual(pushed, ['collect_ai_job'])
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.audit_security_score, self.project.audit_quality_score), (7, 9))
+
+
+class BackgroundTaskRunnerTest(TestCase):
+    """Claims are exclusive; failures back off, then fail with the on_failure hook; dead workers' tasks are swept."""
+
+    def setUp(self):
+        self.failures = []
+
+        def flaky():
+            raise RuntimeError("AI service timeout")
+        tasks.task('test_flaky', on_failure=lambda bg_task: self.failures.append(bg_task.id))(flaky)
+
+    def tearDown(self):
+        tasks.TASKS.pop('test_flaky', None)
+
+    def _run_due(self, bg_task):
+        BackgroundTask.objects.filter(id=bg_task.id).update(run_after=timezone.now())
+        claimed = tasks.claim_next_task('worker-a')
+        self.assertEqual(claimed.id, bg_task.id)
+        self.assertFalse(tasks.run_task(claimed))
+        claimed.refresh_from_db()
+        return claimed
+
+    def test_claim_is_exclusive_and_waits_for_run_after(self):
+        later = tasks.enqueue('test_flaky', delay=60)
+        self.assertIsNone(tasks.claim_next_task('worker-a'))
+        now = tasks.enqueue('test_flaky')
+        claimed = tasks.claim_next_task('worker-a')
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts, claimed.locked_by), (now.id, 'running', 1, 'worker-a'))
+        self.assertIsNone(tasks.claim_next_task('worker-b'))
+        self.assertEqual(BackgroundTask.objects.get(id=later.id).status, 'queued')
+
+    def test_retries_back_off_then_fail(self):
+        bg_task = tasks.enqueue('test_flaky')
+        for attempt, delay in ((1, 30), (2, 60)):
+            before = timezone.now()
+            bg_task = self._run_due(bg_task)
+            self.assertEqual((bg_task.status, bg_task.attempts), ('queued', attempt))
+            self.assertGreaterEqual(bg_task.run_after, before + timedelta(seconds=delay))
+            self.assertEqual(self.failures, [])
+
+        bg_task = self._run_due(bg_task)
+        self.assertEqual(bg_task.status, 'failed')
+        self.assertEqual(bg_task.last_error, 'RuntimeError: AI service timeout')
+        self.assertEqual(self.failures, [bg_task.id])
+
+    def test_sweep_requeues_or_fails_dead_workers_tasks(self):
+        started = timezone.now() - tasks.STALE_AFTER - timedelta(minutes=1)
+        retry = tasks.enqueue('test_flaky')
+        spent = tasks.enqueue('test_flaky')
+        fresh = tasks.enqueue('test_flaky')
+        BackgroundTask.objects.filter(id__in=[retry.id, spent.id]).update(status='running', started_at=started, attempts=1)
+        BackgroundTask.objects.filter(id=spent.id).update(attempts=3)
+        BackgroundTask.objects.filter(id=fresh.id).update(status='running', started_at=timezone.now(), attempts=1)
+
+        self.assertEqual(tasks.requeue_stale_tasks(), (1, 1))
+        statuses = dict(BackgroundTask.objects.values_list('id', 'status'))
+        self.assertEqual(
+            (statuses[retry.id], statuses[spent.id], statuses[fresh.id]), ('queued', 'failed', 'running')
+        )
+        self.assertEqual(self.failures, [spent.id])
+
+    def test_report_grading_errors_are_retried(self):
+        student = User.objects.create_user(username='grader', password='x')
+        submission = ProjectSubmission.objects.create(student=student, title='R', abstract_text='x')
+        project = Project.objects.create(submission=submission, title='R', abstract='x', final_report='final_reports/r.pdf')
+        analyzer = Mock(**{'grade_final_report.side_effect': RuntimeError('Gemini quota')})
+        bg_task = tasks.enqueue('grade_final_report', project_id=project.id, max_attempts=2)
+        with patch('authentication.tasks._get_analyzer', return_value=analyzer):
+            self.assertEqual(self._run_due(bg_task).status, 'queued')
+            self.assertEqual(self._run_due(bg_task).status, 'failed')
+        project.refresh_from_db()
+        self.assertEqual(project.ai_report_feedback, 'Analysis failed: RuntimeError: Gemini quota')
+
+
+def _write_text_pdf(path, pages):
+    """A PDF whose page i reads 'Page i+1'."""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for i in range(pages):
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td (Page {i + 1}) Tj ET".encode())
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+class PDFExtractorTest(TestCase):
+    """Long PDFs are read in ordered page ranges; full extractions are cached by content hash."""
+
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _pdf(self, name, pages):
+        path = os.path.join(self.tmp.name, name)
+        _write_text_pdf(path, pages)
+        return path
+
+    def _recording_pool(self):
+        """Runs range jobs on threads (no process spawn in tests) and records them."""
+        ranges = []
+
+        class RecordingPool(ThreadPoolExecutor):
+            def submit(self, fn, path, start, end):
+                ranges.append((start, end))
+                return super().submit(fn, path, start, end)
+
+        pool = RecordingPool(max_workers=2)
+        self.addCleanup(pool.shutdown)
+        return pool, ranges
+
+    def test_short_pdf_is_read_in_process(self):
+        path = self._pdf('short.pdf', 3)
+        with patch('project_management.pdf_extractor._get_pool') as get_pool:
+            pages = list(pdf_extractor.iter_pdf_pages(path))
+        get_pool.assert_not_called()
+        self.assertEqual([p.strip() for p in pages], ['Page 1', 'Page 2', 'Page 3'])
+
+    def test_long_pdf_pages_come_back_in_order(self):
+        path = self._pdf('long.pdf', 20)
+        pool, ranges = self._recording_pool()
+        with patch('project_management.pdf_extractor._get_pool', return_value=pool):
+            pages = list(pdf_extractor.iter_pdf_pages(path))
+        self.assertEqual(sorted(ranges), [(0, 8), (8, 16), (16, 20)])
+        self.assertEqual([p.strip() for p in pages], [f'Page {i}' for i in range(1, 21)])
+
+    def test_cache_is_keyed_by_content_and_skips_partial_reads(self):
+        path = self._pdf('report.pdf', 20)
+        cache_key = f"pdf_text:{hashlib.sha256(open(path, 'rb').read()).hexdigest()}"
+        pool, _ = self._recording_pool()
+        with patch('project_management.pdf_extractor._get_pool', return_value=pool):
+            self.assertEqual(pdf_extractor.extract_pdf_text(path, max_chars=20), 'Page 1\nPage 2\nPage 3')
+            self.assertIsNone(cache.get(cache_key))
+            full = pdf_extractor.extract_pdf_text(path)
+        self.assertIn('Page 20', full)
+        self.assertEqual(cache.get(cache_key), full)
+
+        # Same bytes under another name: served from the cache without parsing
+        copy = shutil.copy(path, os.path.join(self.tmp.name, 'copy.pdf'))
+        with patch('project_management.pdf_extractor.iter_pdf_pages', side_effect=AssertionError('re-parsed')):
+            self.assertEqual(pdf_extractor.extract_pdf_text(copy), full)
+            self.assertEqual(pdf_extractor.extract_pdf_text(copy, max_chars=6), 'Page 1')
+
+
+class ReportGraderTest(TestCase):
+    """Reports are chunked at section boundaries, critiqued per chunk and merged with length-weighted scores."""
+
+    REPORT = (
+        "Title page\n\n"
+        "1. Introduction\n" + "intro " * 50 + "\n\n"
+        "CHAPTER 2 System Design\n" + "design " * 50 + "\n\n"
+        "Conclusion\n" + "end " * 10 + "\n"
+    )
+
+    def _analyzer(self, answer):
+        """An analyzer with no Gemini keys, so every prompt goes to the mocked fallback chain."""
+        return Mock(api_keys=[], _extract_json=json.loads, **{'_ask_ai_gemini_first.side_effect': answer})
+
+    def test_sections_and_chunks(self):
+        sections = report_grader.split_report_sections(self.REPORT)
+        self.assertEqual(
+            [title for title, _ in sections],
+            ['Front Matter', '1. Introduction', 'CHAPTER 2 System Design', 'Conclusion'],
+        )
+        self.assertEqual(''.join(body for _, body in sections), self.REPORT)
+
+        # Sections are packed whole; only an oversized one is cut, on paragraph breaks
+        chunks = report_grader.pack_chunks(sections, chunk_chars=450)
+        self.assertEqual([titles for titles, _ in chunks], [
+            ['Front Matter', '1. Introduction'], ['CHAPTER 2 System Design', 'Conclusion'],
+        ])
+        big = [('Huge', 'a' * 150 + '\n\n' + 'b' * 150 + '\n\n' + 'c' * 150)]
+        pieces = [text for _, text in report_grader.pack_chunks(big, chunk_chars=200)]
+        self.assertEqual(''.join(pieces), big[0][1])
+        self.assertTrue(all(len(p) <= 200 for p in pieces))
+        self.assertEqual([p[0] for p in pieces], ['a', 'b', 'c'])
+
+    def test_map_reduce_merges_weighted_scores(self):
+        prompts = []
+
+        def answer(prompt, task_name, expect_json):
+            prompts.append(task_name)
+            if task_name == 'Report Reduce':
+                self.assertIn("'completeness': 6.0", prompt)
+                return json.dumps({"feedback": "Solid report.", "scores": {"presentation": 9}})
+            if 'Introduction' in prompt.split('--- REPORT PART ---')[0]:
+                return json.dumps({"summary": "intro", "scores": {"completeness": 4, "accuracy": 8}})
+            return json.dumps({"summary": "design", "scores": {"completeness": 8, "accuracy": "n/a"}})
+
+        # Two sections too big to share a chunk
+        half = report_grader.CHUNK_CHARS * 2 // 3
+        text = "1. Introduction\n" + "x" * half + "\n2. Design\n" + "y" * half + "\n"
+        result = report_grader.ReportGrader(self._analyzer(answer)).grade(text)
+
+        self.assertEqual(sorted(prompts), ['Report Part 1/2', 'Report Part 2/2', 'Report Reduce'])
+        self.assertEqual(result['feedback'], 'Solid report.')
+        # Near-equal parts: about the mean; a non-numeric score is skipped; reduce overrides presentation
+        self.assertEqual(result['scores'], {'completeness': 6.0, 'accuracy': 8.0, 'presentation': 9})
+
+    def test_failed_reduce_falls_back_to_part_notes(self):
+        def answer(prompt, task_name, expect_json):
+            if task_name == 'Report Reduce':
+                return None
+            return json.dumps({"summary": "covers setup", "weaknesses": ["no tests"], "scores": {"accuracy": 7}})
+
+        result = report_grader.ReportGrader(self._analyzer(answer)).grade(self.REPORT)
+        self.assertIn('covers setup', result['feedback'])
+        self.assertIn('no tests', result['feedback'])
+        self.assertEqual(result['scores']['accuracy'], 7.0)
+
+    def test_scanned_pdf_falls_back_to_native_gemini(self):
+        from project_management.project_analyzer import ProjectAnalyzer
+        analyzer = ProjectAnalyzer.__new__(ProjectAnalyzer)
+        analyzer.api_keys = ['key']
+        uploaded = Mock(**{'state.name': 'ACTIVE'})
+        reply = Mock(text='{"feedback": "Well structured.", "scores": {"presentation": 8}}')
+        analyzer.client = Mock(**{'files.upload.return_value': uploaded, 'models.generate_content.return_value': reply})
+
+        with patch('project_management.project_analyzer.extract_pdf_text', return_value='\n\n'), \
+                patch('project_management.project_analyzer.ReportGrader') as grader:
+            result = analyzer.grade_final_report('scanned.pdf')
+
+        grader.assert_not_called()
+        analyzer.client.files.upload.assert_called_once_with(file='scanned.pdf')
+        self.assertIs(analyzer.client.models.generate_content.call_args.kwargs['contents'][1], uploaded)
+        self.assertEqual(result, {"feedback": "Well structured.", "scores": {"presentation": 8}, "content": ""})
+
+    def test_task_stores_scores(self):
+        student = User.objects.create_user(username='report_owner', password='x')
+        submission = ProjectSubmission.objects.create(student=student, title='R', abstract_text='x')
+        project = Project.objects.create(submission=submission, title='R', abstract='x', final_report='final_reports/r.pdf')
+        graded = {"feedback": "Good.", "scores": {"completeness": 7.5}, "content": "full text"}
+        with patch('authentication.tasks._get_analyzer', return_value=Mock(**{'grade_final_report.return_value': graded})):
+            tasks.grade_final_report(project.id)
+        project.refresh_from_db()
+        self.assertEqual(
+            (project.ai_report_feedback, project.ai_report_scores, project.final_report_content),
+            ('Good.', {"completeness": 7.5}, 'full text'),
+        )
+
+
+
+class ModelImageTest(TestCase):
+    """Submitted images reach the vision model as upright JPEGs no larger than 1600px, sent as multipart."""
+
+    def _image(self, mode, size, fmt, **save_kwargs):
+        buf = io.BytesIO()
+        Image.new(mode, size, 'red' if mode != 'P' else 1).save(buf, format=fmt, **save_kwargs)
+        buf.seek(0)
+        return buf
+
+    def _downscaled(self, buf):
+        output = downscale_image_for_model(buf)
+        image = Image.open(output)
+        self.assertEqual((image.format, image.mode), ('JPEG', 'RGB'))
+        self.assertLessEqual(max(image.size), 1600)
+        return image
+
+    def test_large_exif_rotated_jpeg_is_upright_and_bounded(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 CW to display
+        image = self._downscaled(self._image('RGB', (3000, 1000), 'JPEG', exif=exif.tobytes()))
+        self.assertEqual(image.size, (533, 1600))
+
+    def test_transparent_and_palette_images_are_flattened(self):
+        transparent = Image.new('RGBA', (2400, 2400), (0, 0, 0, 0))
+        buf = io.BytesIO()
+        transparent.save(buf, format='PNG')
+        buf.seek(0)
+        image = self._downscaled(buf)
+        self.assertEqual(image.size, (1600, 1600))
+        # Transparency becomes white, not black
+        self.assertGreater(min(image.getpixel((800, 800))), 245)
+
+        image = self._downscaled(self._image('P', (800, 600), 'PNG'))
+        self.assertEqual(image.size, (800, 600))
+
+    def test_task_sends_image_as_multipart(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        teacher = User.objects.create_user(username='assign_teacher', password='x', role='Teacher')
+        student = User.objects.create_user(username='assign_student', password='x')
+        group = Group.objects.create(name='Vision')
+        assignment = TimedAssignment.objects.create(
+            title='ER diagram', description='Draw the schema', assignment_type='Diagram',
+            created_by=teacher, duration_minutes=30,
+        )
+        response = Mock(**{'json.return_value': {'is_approved': True, 'score': 8, 'feedback': 'Clear.'}})
+
+        with override_settings(MEDIA_ROOT=tmp.name):
+            upload = SimpleUploadedFile('diagram.png', self._image('RGB', (2000, 2000), 'PNG').read())
+            submission = AssignmentSubmission.objects.create(
+                assignment=assignment, group=group, submitted_by=student, file=upload, text_content='See diagram',
+            )
+            with patch('authentication.tasks.requests.post', return_value=response) as post:
+                tasks.verify_assignment_submission(submission.id)
+
+        (url,), kwargs = post.call_args
+        self.assertEqual(url, 'http://127.0.0.1:8001/verify-assignment:upload')
+        self.assertEqual(kwargs['data']['assignment_type'], 'Diagram')
+        self.assertIn('See diagram', kwargs['data']['text_content'])
+        name, image, content_type = kwargs['files']['image']
+        self.assertEqual((name, content_type), ('submission.jpg', 'image/jpeg'))
+        self.assertLessEqual(max(Image.open(image).size), 1600)
+
+        submission.refresh_from_db()
+        self.assertEqual((submission.ai_verified, submission.ai_score, submission.ai_feedback), (True, 8, 'Clear.'))
+
+    def test_task_without_image_sends_text_only(self):
+        teacher = User.objects.create_user(username='assign_teacher2', password='x', role='Teacher')
+        student = User.objects.create_user(username='assign_student2', password='x')
+        group = Group.objects.create(name='Text')
+        assignment = TimedAssignment.objects.create(
+            title='Essay', description='Explain', assignment_type='Report', created_by=teacher, duration_minutes=30,
+        )
+        submission = AssignmentSubmission.objects.create(
+            assignment=assignment, group=group, submitted_by=student, text_content='My answer',
+        )
+        response = Mock(**{'json.return_value': {'is_approved': False, 'score': 3, 'feedback': 'Thin.'}})
+        with patch('authentication.tasks.requests.post', return_value=response) as post:
+            tasks.verify_assignment_submission(submission.id)
+        self.assertIsNone(post.call_args.kwargs['files'])
+        self.assertEqual(post.call_args.kwargs['data']['text_content'], 'My answer')
@@ -0,0 +1,143 @@
+# authentication/tokens.py
+"""
+Stateless JWT authentication.
+
+Tokens issued at login carry the user's profile fields, role and group ids
+as claims, stamped with `claims_at`. Safe (read-only) requests rebuild the
+user from those claims without a database round trip. The user is loaded from
+the database as before for writes, for tokens issued without claims, and for
+tokens whose claims predate a change to the user or their groups.
+
+Such changes are recorded as a "stale since" timestamp per user in the default
+cache (signals in authentication/signals.py). The marks must reach every
+process (changes are made from run_workers and manage.py too) and outlive
+restarts, so the claims path is only used with a shared cache backend
+(REDIS_URL, see settings). With the local-memory or dummy cache every request
+loads the user from the database, as plain JWTAuthentication does. A mark lost
+anyway (e.g. evicted) leaves old claims trusted for at most the short
+ACCESS_TOKEN_LIFETIME.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+CLAIM_FIELDS = ('username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'is_staff', 'is_superuser')
+GROUP_RELATIONS = ('teaching', 'student')
+# Per-process cache backends: stale marks set elsewhere never show up in them
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def claims_cache_shared():
+    """Whether stale marks are visible to every process, so token claims can be trusted."""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def _stale_key(user_id):
+    return f"auth_claims_stale:{user_id}"
+
+
+def _stale_ttl():
+    # Refreshed access tokens copy the refresh token's claims, so old claims
+    # can be presented for up to both lifetimes after login
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME + api_settings.REFRESH_TOKEN_LIFETIME
+    return int(lifetime.total_seconds())
+
+
+def user_claims(user):
+    """The claims embedded in a new token for `user`."""
+    claims = {field: getattr(user, field) for field in CLAIM_FIELDS}
+    for relation in GROUP_RELATIONS:
+        claims[f'{relation}_group_ids'] = list(getattr(user, f'{relation}_groups').values_list('id', flat=True))
+    claims['claims_at'] = time.time()
+    return claims
+
+
+def mark_claims_stale(user_ids):
+    """Tokens issued to these users until now fall back to the database."""
+    user_ids = {uid for uid in user_ids if uid is not None}
+    if user_ids:
+        now = time.time()
+        cache.set_many({_stale_key(uid): now for uid in user_ids}, _stale_ttl())
+
+
+def group_ids(user, relation):
+    """
+    Ids of the user's 'teaching' or 'student' groups: the token's list when the
+    user was built from claims, else a lazy queryset usable in `__in` filters.
+    """
+    claimed = getattr(user, '_claimed_group_ids', None)
+    if claimed is not None:
+        return claimed[relation]
+    return getattr(user, f'{relation}_groups').values_list('id', flat=True)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the user lookup on safe requests with fresh
+    claims, when a shared cache holds the stale marks.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS or not claims_cache_shared():
+            return super().authenticate(request)
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_claims_user(validated_token), validated_token
+
+    def get_claims_user(self, validated_token):
+        """The user rebuilt from the token's claims, or from the database when they can't be trusted."""
+        # Without a shared cache a stale mark set by another process would be missed
+        if not claims_cache_shared():
+            return self.get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        claims_at = validated_token.get('claims_at')
+        if claims_at is None or any(field not in validated_token for field in CLAIM_FIELDS):
+            return self.get_user(validated_token)
+        stale_since = cache.get(_stale_key(user_id))
+        if stale_since is not None and claims_at <= stale_since:
+            return self.get_user(validated_token)
+
+        # The id claim is serialized as a string
+        id_field = User._meta.get_field(api_settings.USER_ID_FIELD)
+        values = {id_field.attname: id_field.to_python(user_id)}
+        values.update((field, validated_token[field]) for field in CLAIM_FIELDS)
+        if api_settings.CHECK_USER_IS_ACTIVE and not values['is_active']:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        # Fields not in the token (password, last_login, ...) stay deferred and
+        # load on first access
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+        user = User.from_db(router.db_for_read(User), fields, [values[name] for name in fields])
+        user._claimed_group_ids = {
+            relation: validated_token.get(f'{relation}_group_ids', []) for relation in GROUP_RELATIONS
+        }
+        return user
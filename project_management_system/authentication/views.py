@@ -12,7 +12,7 @@ from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 import io
 from django.utils import timezone
-from .models import TypingStatus
+import time
 from django.core.mail import send_mail # Ensure this is here too
 from django.conf import settings
 from rest_framework import generics, status, views, serializers
@@ -21,13 +21,29 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from project_management.project_analyzer import ProjectAnalyzer
+from project_management.pdf_extractor import extract_pdf_text
 from .models import (
     User, ProjectSubmission, Group, Project, Team, Message, 
     VivaSession, VivaQuestion, ProgressUpdate, ProjectArtifact, 
-    Task, CodeReview, TypingStatus, PasswordResetOTP, Checkpoint,
-    TimedAssignment, AssignmentSubmission, StudentActivityLog
+    Task, CodeReview, PasswordResetOTP, Checkpoint,
+    TimedAssignment, AssignmentSubmission, StudentActivityLog, BackgroundTask,
+    MessageReceipt, ActivityEvent, ProjectRollup
 )
 from .permissions import IsTeacherOrAdmin, IsProjectMemberOrTeacher, IsAdminUser
+from .membership import project_membership
+from .active_project import active_project, active_submission
+from .tokens import group_ids
+from .tasks import (
+    enqueue as enqueue_task, queue_depth, apply_audit_result, AI_JOBS_URL, AI_JOB_POLL_SECONDS
+)
+from project_management.realtime import publish, user_topic, project_topic
+from project_management.presence import mark_typing, typing_users, can_use_typing
+from project_management.dashboard_stats import teacher_dashboard_stats
+from project_management.utils import get_project_context
+from .pagination import (
+    MessageCursorPagination, ArtifactCursorPagination, ProjectCursorPagination,
+    SubmissionCursorPagination, UserCursorPagination, ActivityCursorPagination
+)
 from .serializers import (
     UserSerializer, ProjectSubmissionSerializer, GroupSerializer, 
     ApprovedProjectSerializer, StudentSubmissionSerializer, 
@@ -37,180 +53,15 @@ from .serializers import (
     TaskSerializer, CodeReviewSerializer, TeacherSubmissionSerializer,
     SimilarProjectSerializer, ProjectSerializer, CheckpointSerializer,
     TimedAssignmentSerializer, AssignmentSubmissionSerializer,
-    AlumniProjectSerializer, StudentActivityLogSerializer
+    AlumniProjectSerializer, StudentActivityLogSerializer, build_member_stats
 )
-from django.db.models import Count, Sum, Q
+from django.db import transaction
+from django.db.models import Count, Sum, Q, OuterRef, Subquery
 
 
 logger = logging.getLogger(__name__)
 analyzer = ProjectAnalyzer()
 
-# --- NEW HELPER FUNCTION TO BUILD CONTEXT ---
-def _build_project_context(project: Project, user_prompt: str = "") -> str:
-    """
-    Comprehensive Context Builder.
-    Includes:
-    1. Project Basics & Student Info
-    2. Initial AI Scores
-    3. Progress Update History (with Sentiment)
-    4. Viva Examination History
-    5. Artifacts (Screenshots/Code) - Full text
-    6. Documentation (PDF) - AI Feedback + Truncated Text
-    """
-    # 1. Basic Info
-    context = f"PROJECT REPORT (ID: {project.id})\n"
-    context += f"Title: {project.title}\n"
-    context += f"Status: {project.status}\n"
-    context += f"Progress: {project.progress_percentage}%\n"
-    context += f"Category: {project.category}\n"
-    if project.github_repo_link:
-        context += f"GitHub Repo: {project.github_repo_link}\n"
-    
-    # Include Audit Scores if available
-    if project.audit_security_score:
-         context += f"Security Score: {project.audit_security_score}/100\n"
-    if project.audit_quality_score:
-         context += f"Quality Score: {project.audit_quality_score}/100\n"
-
-    # Include Audit Report Summary (Key Findings) if available
-    if project.audit_report:
-        try:
-            # Assuming audit_report is a dict with 'summary' or similar
-            summary = project.audit_report.get('summary', '') or project.audit_report.get('executive_summary', '')
-            if summary:
-                context += f"Latest Audit Summary: {summary}\n"
-        except:
-            pass
-
-    # 2. Student & Team Info
-    student = project.submission.student
-    context += f"\nSTUDENT/TEAM DETAILS\n"
-    context += f"Lead Student: {student.first_name} {student.last_name} (Username: {student.username})\n"
-    
-    # Check for Group/Team
-    if hasattr(project, 'team'):
-        context += f"Team Members:\n"
-        for member in project.team.members.all():
-            context += f"- {member.first_name} {member.last_name} ({member.username})\n"
-    elif hasattr(project.submission, 'group') and project.submission.group:
-        context += f"Group: {project.submission.group.name}\n"
-        context += f"Group Members (Potential):\n"
-        for member in project.submission.group.students.all():
-            context += f"- {member.first_name} {member.last_name} ({member.username})\n"
-    
-    context += f"Email: {student.email}\n"
-
-    # 3. Initial AI Evaluation
-    sub = project.submission
-    context += f"\nINITIAL PROPOSAL EVALUATION\n"
-    context += f"Relevance Score: {sub.relevance_score}/10\n"
-    context += f"Feasibility Score: {sub.feasibility_score}/10\n"
-    context += f"Innovation Score: {sub.innovation_score}/10\n"
-    context += f"Abstract: {sub.abstract_text}\n"
-
-    # 4. PROGRESS UPDATE HISTORY
-    # Limit to last 5 updates to prevent Token Overflow (Groq 413)
-    progress_logs = ProgressUpdate.objects.filter(project=project).order_by('-created_at')[:5]
-    progress_logs = reversed(list(progress_logs)) # Chronological order
-    
-    context += f"\nPROGRESS UPDATE HISTORY (Last 5 items)\n"
-
-    # We iterate over the list now
-    has_logs = False
-    for i, log in enumerate(progress_logs, 1):
-        has_logs = True
-        context += f"\n-- Log {i} ({log.created_at.strftime('%Y-%m-%d')}) --\n"
-        # Attribute to specific author
-        author_name = log.author.username
-        if hasattr(log.author, 'first_name') and log.author.first_name:
-            author_name = f"{log.author.first_name} {log.author.last_name}"
-        
-        context += f"Author: {author_name}\n"
-        # Truncate long text
-        text = log.update_text if len(log.update_text) < 500 else log.update_text[:500] + "..."
-        context += f"Report: {text}\n"
-        # Include Sentiment if available
-        sentiment = getattr(log, 'sentiment', 'N/A')
-        context += f"Sentiment: {sentiment}\n"
-        context += f"AI-Suggested Progress: {log.ai_suggested_percentage}%\n"
-    
-    if not has_logs:
-        context += "No progress logs have been submitted yet.\n"
-
-    # 5. VIVA HISTORY
-    # Limit to last 15 sessions to cover all team members
-    viva_sessions = VivaSession.objects.filter(project=project).order_by('-created_at')[:15]
-    viva_sessions = reversed(list(viva_sessions))
-    
-    context += f"\nVIVA EXAMINATION HISTORY (Last 3 sessions)\n"
-    
-    has_vivas = False
-    for i, session in enumerate(viva_sessions, 1):
-        has_vivas = True
-        s_name = session.student.username
-        if hasattr(session.student, 'first_name') and session.student.first_name:
-                s_name = f"{session.student.first_name} {session.student.last_name}"
-        
-        context += f"\n-- Session {i} ({session.created_at.strftime('%Y-%m-%d')}) - Student: {s_name} --\n"
-        total_score = 0
-        total_questions = 0
-        # Limit details per session
-        for q in session.questions.all()[:5]:
-            context += f"Q: {q.question_text}\n"
-            ans = q.student_answer if q.student_answer else 'Not answered'
-            if len(ans) > 200: ans = ans[:200] + "..."
-            context += f"A: {ans}\n"
-            context += f"Score: {q.ai_score}/10\n"
-            context += f"Feedback: {q.ai_feedback}\n"
-            if q.ai_score is not None:
-                total_score += q.ai_score
-                total_questions += 1
-        avg_score = (total_score / total_questions) if total_questions > 0 else 0
-        context += f"Avg Score for Session {i}: {avg_score:.1f}/10\n"
-
-    if not has_vivas:
-        context += "No viva sessions have been attempted yet.\n"
-
-    # 6. PROJECT ARTIFACTS (Screenshots & Code)
-    artifacts = ProjectArtifact.objects.filter(project=project).order_by('uploaded_at')
-    context += f"\nPROJECT DOCUMENTS & SCREENSHOTS ({artifacts.count()} files)\n"
-    if not artifacts.exists():
-        context += "No screenshots or documents have been uploaded.\n"
-    else:
-        for i, art in enumerate(artifacts, 1):
-            context += f"\n-- Document {i} (Uploaded: {art.uploaded_at.strftime('%Y-%m-%d')}) --\n"
-            context += f"Description: {art.description}\n"
-            context += f"AI Auto-Tags: {art.ai_tags}\n"
-            context += f"EXTRACTED TEXT CONTENT:\n{art.extracted_text}\n"
-
-    # 7. DOCUMENTATION (PDF Report)
-    if project.final_report:
-        context += f"\nFULL PROJECT DOCUMENTATION (PDF)\n"
-        context += f"Status: Uploaded\n"
-        
-        # A. The AI Critique
-        if project.ai_report_feedback:
-             context += f"AI CRITIQUE:\n{project.ai_report_feedback}\n"
-        
-        # B. The Actual Content (Truncated to 30k chars to prevent errors)
-        if project.final_report_content:
-             context += f"PDF FULL TEXT CONTENT (First 30k chars):\n"
-             context += f"{project.final_report_content[:30000]}\n"
-             if len(project.final_report_content) > 30000:
-                context += "\n...(Text truncated for API limits)...\n"
-    else:
-        context += "\nNo full documentation uploaded.\n"
-
-    # 8. CODE REVIEWS (NEW)
-    reviews = CodeReview.objects.filter(project=project).order_by('-uploaded_at')[:3]
-    if reviews.exists():
-        context += "\n--- RECENT CODE REVIEWS ---\n"
-        for rev in reviews:
-            context += f"- File: {rev.file_name} (Score: Sec {rev.security_score}/10, Qual {rev.quality_score}/10)\n"
-            context += f"  AI Feedback: {rev.ai_feedback[:200]}...\n"
-
-    return context
-
 class ProjectSubmissionView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser, JSONParser,)
@@ -383,6 +234,7 @@ class TeacherDashboardView(APIView):
         # submissions = queryset.filter(status='Submitted').exclude(group_id__in=groups_with_projects)
         submissions = queryset.filter(status='Submitted')
             
+        submissions = TeacherSubmissionSerializer.setup_eager_loading(submissions)
         serializer = TeacherSubmissionSerializer(submissions, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -444,6 +296,7 @@ class StudentDashboardView(APIView):
             Q(student=user) | 
             Q(project__team__members=user)
         ).distinct().order_by('-submitted_at')
+        submissions = StudentSubmissionSerializer.setup_eager_loading(submissions)
         serializer = StudentSubmissionSerializer(submissions, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -482,24 +335,13 @@ class AIChatbotView(APIView):
             project_submission = None
             
             if project_id:
-                try:
-                    project_submission = ProjectSubmission.objects.get(id=project_id)
-                except ProjectSubmission.DoesNotExist:
-                     pass
+                project_submission = ProjectSubmission.objects.select_related('project').filter(id=project_id).first()
+                if project_submission and not self._can_chat_about(request, project_submission):
+                    return Response({"error": "You are not a member of this project."}, status=status.HTTP_403_FORBIDDEN)
             
             if not project_submission:
-                # 1. Prioritize Active/Completed Projects where user is a team member
-                active_project = Project.objects.filter(team__members=request.user).order_by('-submission__submitted_at').first()
-                if active_project:
-                    project_submission = active_project.submission
-                else:
-                    # 1b. Fallback: Check if user is in a Group that has a project (even if Team object is missing)
-                    group_project = Project.objects.filter(submission__group__students=request.user).order_by('-submission__submitted_at').first()
-                    if group_project:
-                         project_submission = group_project.submission
-                    else:
-                        # 2. Final Fallback: Get latest submission by this user (e.g. pending proposal/no group yet)
-                        project_submission = ProjectSubmission.objects.filter(student=request.user).order_by('-submitted_at').first()
+                # Team project, then group project, then the latest own submission (cached per user)
+                project_submission = active_submission(request.user)
             
             if project_submission:
                 # Determine role
@@ -507,11 +349,15 @@ class AIChatbotView(APIView):
                 if project_submission.student == request.user:
                     role = "Project Leader"
                     
-                status = project_submission.status
-                project_context = f"Project Title: {project_submission.title}\n"
-                project_context += f"Status: {status}\n"
-                project_context += f"User Role: {role}\n"
-                project_context += f"Abstract: {project_submission.abstract_text}"
+                project = getattr(project_submission, 'project', None)
+                if project:
+                    # The stored snapshot: one row, kept current by signals
+                    project_context = f"User Role: {role}\n{get_project_context(project)}"
+                else:
+                    project_context = f"Project Title: {project_submission.title}\n"
+                    project_context += f"Status: {project_submission.status}\n"
+                    project_context += f"User Role: {role}\n"
+                    project_context += f"Abstract: {project_submission.abstract_text}"
         except Exception as e:
             logger.warning(f"Could not load project context for chat: {e}")
 
@@ -519,6 +365,17 @@ class AIChatbotView(APIView):
         ai_response = analyzer.get_chat_response(user_prompt, context=project_context)
         return Response({"response": ai_response}, status=status.HTTP_200_OK)
 
+    @staticmethod
+    def _can_chat_about(request, submission):
+        project = getattr(submission, 'project', None)
+        if project is not None:
+            return project_membership(request, project).any
+        # A proposal with no project yet: its author and its group
+        user = request.user
+        return submission.student_id == user.id or submission.group_id in (
+            set(group_ids(user, 'student')) | set(group_ids(user, 'teaching'))
+        )
+
 
 class AIVivaView(APIView):
     permission_classes = [IsAuthenticated]
@@ -661,13 +518,21 @@ class AnalyticsView(generics.ListAPIView):
         return None
 
     def list(self, request, *args, **kwargs):
-        status_counts = Project.objects.values('status').annotate(count=Count('status'))
-        category_counts = Project.objects.values('category').annotate(count=Count('category'))
-        top_innovative = Project.objects.filter(status='Completed').order_by('-submission__innovation_score')[:5]
-        top_innovative_data = [{'title': p.title, 'score': p.submission.innovation_score} for p in top_innovative]
+        # Bucket counts are precomputed (project_management.analytics_rollups)
+        rollups = {'status': [], 'category': [], 'group': []}
+        for row in ProjectRollup.objects.filter(count__gt=0).order_by('dimension', 'key'):
+            rollups[row.dimension].append(row)
+
+        top_innovative = Project.objects.filter(
+            status='Completed', submission__innovation_score__isnull=False
+        ).order_by('-submission__innovation_score').values('title', 'submission__innovation_score')[:5]
+        top_innovative_data = [{'title': p['title'], 'score': p['submission__innovation_score']} for p in top_innovative]
         data = {
-            'project_status_counts': list(status_counts),
-            'project_category_counts': list(category_counts),
+            'project_status_counts': [{'status': r.key, 'count': r.count} for r in rollups['status']],
+            'project_category_counts': [{'category': r.key, 'count': r.count} for r in rollups['category']],
+            'project_group_counts': [
+                {'group': int(r.key), 'group_name': r.label, 'count': r.count} for r in rollups['group']
+            ],
             'top_innovative_projects': top_innovative_data,
         }
         return Response(data, status=status.HTTP_200_OK)
@@ -678,13 +543,8 @@ class LeaderboardView(generics.ListAPIView):
     serializer_class = UserSerializer
 
     def get_queryset(self):
-        queryset = User.objects.annotate(
-            total_innovation=Sum('active_projects__project__submission__innovation_score')
-        )
-        return queryset.filter(
-            total_innovation__isnull=False,
-            active_projects__project__status='Completed'
-        ).order_by('-total_innovation')[:10]
+        # Totals over completed projects are precomputed per student
+        return User.objects.filter(innovation_total__isnull=False).order_by('-innovation_total__total')[:10]
 
 
 class AlumniPortalView(generics.ListAPIView):
@@ -765,19 +625,30 @@ class AlumniProjectSearchView(APIView):
 
 class AllProjectsView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
-    queryset = Project.objects.all()
+    queryset = Project.objects.select_related('submission__student', 'team')
     serializer_class = ProjectSerializer
+    pagination_class = ProjectCursorPagination
+
+
+# Most groups the admin dashboard returns in one response
+ADMIN_GROUP_LIMIT = 500
 
 
 class AdminDashboardView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request, *args, **kwargs):
-        users = User.objects.all()
-        groups = Group.objects.all()
-        user_serializer = UserSerializer(users, many=True)
-        group_serializer = GroupSerializer(groups, many=True)
-        return Response({'users': user_serializer.data, 'groups': group_serializer.data}, status=status.HTTP_200_OK)
+        # Users are paged by join date (cursor headers, see KeysetPagination)
+        paginator = UserCursorPagination()
+        page = paginator.paginate_queryset(User.objects.all(), request, self)
+        # Groups have no cursor field; they are capped, and the flag says when the cap cut the list
+        groups = list(Group.objects.prefetch_related('teachers', 'students').order_by('name')[:ADMIN_GROUP_LIMIT + 1])
+        data = {
+            'users': UserSerializer(page, many=True).data,
+            'groups': GroupSerializer(groups[:ADMIN_GROUP_LIMIT], many=True).data,
+            'groups_truncated': len(groups) > ADMIN_GROUP_LIMIT,
+        }
+        return paginator.get_paginated_response(data)
 
     def patch(self, request, group_id, *args, **kwargs):
         return Response({"detail": "Group update not implemented yet."}, status=status.HTTP_200_OK)
@@ -821,7 +692,7 @@ class AppointedTeacherDashboard(generics.ListAPIView):
         # ).values_list('submission__group_id', flat=True)
 
         # return queryset.exclude(group_id__in=groups_with_projects).order_by('-submitted_at')
-        return queryset.order_by('-submitted_at')
+        return TeacherSubmissionSerializer.setup_eager_loading(queryset).order_by('-submitted_at')
 
 
 class UnappointedTeacherDashboard(generics.ListAPIView):
@@ -843,7 +714,7 @@ class UnappointedTeacherDashboard(generics.ListAPIView):
         # ).values_list('submission__group_id', flat=True)
         
         # return queryset.exclude(group_id__in=groups_with_projects).order_by('-submitted_at')
-        return queryset.order_by('-submitted_at')
+        return TeacherSubmissionSerializer.setup_eager_loading(queryset).order_by('-submitted_at')
 
 
 class ProjectProgressView(views.APIView):
@@ -869,16 +740,8 @@ class ProjectLogUpdateView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # --- PERMISSION FIX ---
-        # Allow if user is the submitter OR if the user is in the project's group
-        is_submitter = project.submission.student == request.user
-        is_group_member = False
-        if project.submission.group:
-            is_group_member = project.submission.group.students.filter(id=request.user.id).exists()
-            
-        # Check if user is in the official project team
-        is_team_member = project.team.members.filter(id=request.user.id).exists()
-
-        if not (is_submitter or is_group_member or is_team_member):
+        # Allow if user is the submitter, in the project's group, or in the official project team
+        if not project_membership(request, project).is_student:
             return Response({"error": "You do not have permission to update this project."}, status=status.HTTP_403_FORBIDDEN)
         # ----------------------
         
@@ -931,16 +794,45 @@ class ProjectLogUpdateView(APIView):
 class TopAlumniProjectsView(generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = AlumniProjectSerializer
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
 
     def get_queryset(self):
+        # A ranked top-N list, so it is bounded by ?limit rather than a time cursor
+        try:
+            limit = min(max(1, int(self.request.query_params.get('limit', self.DEFAULT_LIMIT))), self.MAX_LIMIT)
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
         # We now filter from Project model where is_alumni=True (or status=Completed)
         # Prioritizing: Innovation > Relevance > Current Trend (Recency)
         return Project.objects.filter(
             status__in=['Completed', 'Archived']
-        ).order_by('-submission__innovation_score', '-submission__relevance_score', '-submission__submitted_at')
+        ).select_related('submission__student').order_by('-submission__innovation_score', '-submission__relevance_score', '-submission__submitted_at')[:limit]
+
+
+class ApprovedProjectListMixin:
+    """
+    List behaviour shared by the ApprovedProjectSerializer views: relations the
+    serializer walks are loaded up front and member stats are aggregated once
+    for the whole page instead of per member.
+    """
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).select_related(
+            'team', 'submission__student', 'submission__group'
+        ).prefetch_related('team__members', 'submission__group__teachers')
 
+        page = self.paginate_queryset(queryset)
+        projects = list(page if page is not None else queryset)
 
-class ApprovedProjectsView(generics.ListAPIView):
+        context = self.get_serializer_context()
+        context['member_stats'] = build_member_stats(projects)
+        serializer = self.get_serializer_class()(projects, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+class ApprovedProjectsView(ApprovedProjectListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
     serializer_class = ApprovedProjectSerializer
 
@@ -959,6 +851,8 @@ class ApprovedProjectsView(generics.ListAPIView):
 class ProjectMessagesView(generics.ListCreateAPIView):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    # ?limit=50 for the latest page; pollers pass ?since=<X-Latest-Cursor> to get only new messages
+    pagination_class = MessageCursorPagination
 
     def get_queryset(self):
         project_id = self.kwargs.get('project_id')
@@ -969,36 +863,30 @@ class ProjectMessagesView(generics.ListCreateAPIView):
         target_user_id = self.request.query_params.get('target_user_id')
 
         # Base Query: Messages for this project
-        queryset = Message.objects.filter(project_id=project_id)
+        queryset = Message.objects.filter(project_id=project_id).select_related('sender', 'recipient')
 
         if chat_type == 'DM' and target_user_id:
             # DM Logic: Fetch messages between Me and Target
-            # (We explicitly check Sender OR Recipient here because DMs don't have self-copies)
             queryset = queryset.filter(
                 message_type='DM'
             ).filter(
                 Q(sender=user, recipient_id=target_user_id) | 
                 Q(sender_id=target_user_id, recipient=user)
             )
-        
-        elif chat_type == 'TEAM_GROUP':
-            # Team Logic: Fetch only messages meant for me in this channel
-            # This relies on the "Self Copy" we created in perform_create.
-            # We DO NOT check 'sender=user' here, to avoid fetching copies sent to others.
-            queryset = queryset.filter(
-                message_type='TEAM_GROUP',
-                recipient=user 
-            )
+            # Read state shown is the recipient's (so my sent DMs show "seen")
+            read_by = OuterRef('recipient_id')
 
         else:
-            # Guide Group Logic (Default)
-            # Same as above: Only fetch messages where I am the recipient (includes my self-copy)
+            # Team / Guide Group Logic: only messages I have a receipt for.
+            # The sender gets a receipt too, so my own messages are included.
             queryset = queryset.filter(
-                message_type='GUIDE_GROUP',
-                recipient=user
+                message_type='TEAM_GROUP' if chat_type == 'TEAM_GROUP' else 'GUIDE_GROUP',
+                receipts__recipient=user
             )
+            read_by = user.id
 
-        return queryset.order_by('timestamp')
+        is_read = MessageReceipt.objects.filter(message=OuterRef('pk'), recipient_id=read_by).values('is_read')[:1]
+        return queryset.annotate(is_read=Subquery(is_read)).order_by('timestamp')
 
     def perform_create(self, serializer):
         project_id = self.kwargs.get('project_id')
@@ -1008,8 +896,6 @@ class ProjectMessagesView(generics.ListCreateAPIView):
         message_type = self.request.data.get('message_type', 'GUIDE_GROUP')
         content = serializer.validated_data['content']
         
-        created_msgs = []
-
         if message_type == 'DM':
             # 1. Direct Message
             recipient_id = self.request.data.get('recipient_id')
@@ -1021,7 +907,8 @@ class ProjectMessagesView(generics.ListCreateAPIView):
                 project=project, sender=sender, recipient=recipient,
                 content=content, message_type='DM'
             )
-            created_msgs.append(msg)
+            MessageReceipt.objects.create(message=msg, recipient=recipient)
+            audience = {recipient.id, sender.id}
 
         else:
             # 2. Group Broadcast (GUIDE_GROUP or TEAM_GROUP)
@@ -1046,23 +933,25 @@ class ProjectMessagesView(generics.ListCreateAPIView):
                     # GUIDE_GROUP -> Send to everyone
                     recipients.append(member)
 
-            # Create copies
-            for r in recipients:
+            # One message row; the audience is stored as receipts.
+            # The sender's receipt starts read so it shows up in their own channel.
+            with transaction.atomic():
                 msg = Message.objects.create(
-                    project=project, sender=sender, recipient=r,
+                    project=project, sender=sender,
                     content=content, message_type=message_type
                 )
-                created_msgs.append(msg)
-            
-            # Create a copy for SELF so it shows up in my query
-            # (Self-copy is useful for the 'recipient=user' filter to work for my own sent msgs)
-            self_copy = Message.objects.create(
-                project=project, sender=sender, recipient=sender, # Self-message
-                content=content, message_type=message_type, is_read=True
-            )
-            created_msgs.append(self_copy)
+                receipts = [MessageReceipt(message=msg, recipient=r) for r in {r.id: r for r in recipients}.values()]
+                receipts.append(MessageReceipt(message=msg, recipient=sender, is_read=True))
+                MessageReceipt.objects.bulk_create(receipts)
+            audience = {r.recipient_id for r in receipts}
+
+        msg.is_read = False
+        self._created_message = msg
 
-        self._created_messages = created_msgs
+        # Push to everyone who can read it (open chat streams refetch with ?since=)
+        data = MessageSerializer(msg).data
+        for user_id in audience:
+            publish(user_topic(user_id), 'message', data)
 
     def create(self, request, *args, **kwargs):
         # Standard create wrapper
@@ -1070,10 +959,7 @@ class ProjectMessagesView(generics.ListCreateAPIView):
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         
-        # Return just one for the response
-        if hasattr(self, '_created_messages') and self._created_messages:
-             return Response(self.get_serializer(self._created_messages[0]).data, status=status.HTTP_201_CREATED)
-        return Response({}, status=status.HTTP_201_CREATED)
+        return Response(self.get_serializer(self._created_message).data, status=status.HTTP_201_CREATED)
         
 class MarkMessagesReadView(APIView):
     """
@@ -1083,14 +969,12 @@ class MarkMessagesReadView(APIView):
 
     def post(self, request, project_id):
         project = get_object_or_404(Project, id=project_id)
-        # Filter messages where I am the recipient and they are unread
-        unread_msgs = Message.objects.filter(
-            project=project, 
+        # Flip my unread receipts in this project in a single UPDATE
+        count = MessageReceipt.objects.filter(
+            message__project=project, 
             recipient=request.user, 
             is_read=False
-        )
-        count = unread_msgs.count()
-        unread_msgs.update(is_read=True)
+        ).update(is_read=True)
         
         return Response({"detail": f"Marked {count} messages as read."}, status=status.HTTP_200_OK)
     
@@ -1137,7 +1021,8 @@ class ProjectInquiryView(APIView):
         try:
             payload = {
                 "student_username": student_username,
-                "user_message": user_prompt
+                "user_message": user_prompt,
+                "project_context": get_project_context(project),
             }
             # Note: Port 8001 is the AI Microservice
             response = requests.post("http://127.0.0.1:8001/mcp-teacher-chat", json=payload, timeout=60)
@@ -1334,6 +1219,8 @@ class ResetPasswordView(APIView):
 
         return Response({"detail": "Password has been reset successfully."}, status=status.HTTP_200_OK)
 
+PARSE_TEXT_CHARS = 10000
+
 class ProjectExtractionView(APIView):
     """
     Extracts Title and Abstract from an uploaded project document (PDF/PPT).
@@ -1350,10 +1237,8 @@ class ProjectExtractionView(APIView):
         try:
             # 1. Extract Text based on file type
             if file_obj.name.lower().endswith('.pdf'):
-                from pypdf import PdfReader
-                reader = PdfReader(file_obj)
-                for page in reader.pages:
-                    extracted_text += page.extract_text() + "\n"
+                # Title/abstract live up front; /parse-project-text only reads this much
+                extracted_text = extract_pdf_text(file_obj, max_chars=PARSE_TEXT_CHARS)
             
             elif file_obj.name.lower().endswith(('.ppt', '.pptx')):
                 from pptx import Presentation
@@ -1425,6 +1310,7 @@ class ProjectArtifactUploadView(APIView):
 class ProjectArtifactListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ProjectArtifactSerializer
+    pagination_class = ArtifactCursorPagination
 
     def get_queryset(self):
         project_id = self.kwargs.get('project_id')
@@ -1477,27 +1363,14 @@ class ProjectReportGradeView(APIView):
         if not project.final_report:
              return Response({"error": "No report uploaded yet."}, status=status.HTTP_400_BAD_REQUEST)
              
-        try:
-            # Call the analyzer (returns a dict now)
-            result = analyzer.grade_final_report(project.final_report.path)
-            
-            # Save BOTH fields
-            project.ai_report_feedback = result['feedback']
-            project.final_report_content = result['content'] # <-- New Field
-            project.save()
-            
-            return Response({"feedback": result['feedback']}, status=status.HTTP_200_OK)
+        # Grading takes 10-90s, so it runs on the task workers.
+        # Feedback is saved to project.ai_report_feedback when done.
+        bg_task = enqueue_task('grade_final_report', project_id=project.id)
+        return Response(
+            {"task_id": bg_task.id, "status": bg_task.status},
+            status=status.HTTP_202_ACCEPTED
+        )
 
-        except google_exceptions.ResourceExhausted:
-            return Response(
-                {"detail": "AI is busy (Rate Limit). Please wait 1 minute."},
-                status=status.HTTP_429_TOO_MANY_REQUESTS
-            )
-        except Exception as e:
-            return Response(
-                {"detail": f"Analysis failed: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
 class ProjectTaskManagerView(APIView):
     """
     GET: Fetch all tasks for a project.
@@ -1574,32 +1447,24 @@ class ProjectResumeView(APIView):
         return Response({"points": points}, status=status.HTTP_200_OK)
 class TypingUpdateView(APIView):
     """
-    POST: Updates the timestamp saying 'I am typing'.
+    POST: Marks 'I am typing' in the presence store (cache, no DB write).
     GET: Returns a list of users currently typing (active in last 3 seconds).
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, project_id):
-        project = get_object_or_404(Project, id=project_id)
-        # Update or create the typing record for this user
-        TypingStatus.objects.update_or_create(
-            project=project, user=request.user,
-            defaults={'timestamp': timezone.now()}
-        )
+        # Only people on the project may show up as typing in it
+        if not can_use_typing(request, project_id):
+            return Response({"error": "You are not a member of this project."}, status=status.HTTP_403_FORBIDDEN)
+        mark_typing(project_id, request.user.id, request.user.username)
+        publish(project_topic(project_id), 'typing', {"user_id": request.user.id, "username": request.user.username})
         return Response({"status": "updated"}, status=status.HTTP_200_OK)
 
     def get(self, request, project_id):
-        project = get_object_or_404(Project, id=project_id)
-        
-        # Find anyone who typed in the last 3 seconds
-        threshold = timezone.now() - timedelta(seconds=3)
-        
-        typing_users = TypingStatus.objects.filter(
-            project=project,
-            timestamp__gte=threshold
-        ).exclude(user=request.user) # Don't show myself
-        
-        usernames = [t.user.username for t in typing_users]
+        if not can_use_typing(request, project_id):
+            return Response({"error": "You are not a member of this project."}, status=status.HTTP_403_FORBIDDEN)
+        # Don't show myself
+        usernames = typing_users(project_id, exclude_user_id=request.user.id)
         return Response({"typing_users": usernames}, status=status.HTTP_200_OK)
 class CodeReviewView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1608,7 +1473,7 @@ class CodeReviewView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # Check if user is part of the project team
-        if not project.team.members.filter(id=request.user.id).exists():
+        if not project_membership(request, project).member:
             return Response({"error": "You are not a member of this project."}, status=status.HTTP_403_FORBIDDEN)
 
         file_name = request.data.get('file_name')
@@ -1661,7 +1526,7 @@ class CodeReviewView(APIView):
         
         # Check permissions (Teacher, HOD/Admin, or Team Member)
         is_teacher = request.user.role in ['Teacher', 'HOD/Admin']
-        is_member = project.team.members.filter(id=request.user.id).exists()
+        is_member = project_membership(request, project).member
         
         if not (is_teacher or is_member):
              return Response({"error": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
@@ -1677,10 +1542,12 @@ class CheckpointListView(APIView):
     def get(self, request, project_id):
         project = get_object_or_404(Project, id=project_id)
         # Check permissions
-        if not (request.user.role in ['Teacher', 'HOD/Admin'] or project.team.members.filter(id=request.user.id).exists()):
+        if not (request.user.role in ['Teacher', 'HOD/Admin'] or project_membership(request, project).member):
             return Response({"error": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
             
-        checkpoints = Checkpoint.objects.filter(project=project).order_by('deadline')
+        checkpoints = CheckpointSerializer.setup_eager_loading(
+            Checkpoint.objects.filter(project=project)
+        ).order_by('deadline')
         serializer = CheckpointSerializer(checkpoints, many=True)
         return Response(serializer.data)
 
@@ -1689,7 +1556,7 @@ class CheckpointGenerationView(APIView):
 
     def post(self, request, project_id):
         project = get_object_or_404(Project, id=project_id)
-        if not project.team.members.filter(id=request.user.id).exists():
+        if not project_membership(request, project).member:
              return Response({"error": "Only team members can generate the roadmap."}, status=status.HTTP_403_FORBIDDEN)
 
         # Call AI Microservice to generate checkpoints
@@ -1737,7 +1604,7 @@ class CheckpointVerificationView(APIView):
         project = get_object_or_404(Project, id=project_id)
         checkpoint = get_object_or_404(Checkpoint, id=checkpoint_id, project=project)
         
-        if not project.team.members.filter(id=request.user.id).exists():
+        if not project_membership(request, project).member:
              return Response({"error": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
         proof_text = request.data.get('proof_text')
@@ -1864,11 +1731,13 @@ class TimedAssignmentListView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.role in ['Teacher', 'HOD/Admin']:
-            return TimedAssignment.objects.filter(created_by=user).order_by('-start_time')
+            queryset = TimedAssignment.objects.filter(created_by=user).order_by('-start_time')
         elif user.role == 'Student':
             # Get assignments for groups the student belongs to
-            return TimedAssignment.objects.filter(assigned_groups__students=user).distinct().order_by('-start_time')
-        return TimedAssignment.objects.none()
+            queryset = TimedAssignment.objects.filter(assigned_groups__students=user).distinct().order_by('-start_time')
+        else:
+            return TimedAssignment.objects.none()
+        return TimedAssignmentSerializer.setup_eager_loading(queryset, user)
 
 class AssignmentSubmissionView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1900,135 +1769,8 @@ class AssignmentSubmissionView(APIView):
         if serializer.is_valid():
             submission = serializer.save(submitted_by=request.user)
             
-            # Start AI verification in background thread (non-blocking)
-            import threading
-            
-            def verify_in_background():
-                try:
-                    # --- 1. Fetch Project Context (Applies to ALL assignment types) ---
-                    group = submission.group
-                    project_context = ""
-                    if group:
-                        # Find active project for this group via submission relationship
-                        active_projects = Project.objects.filter(
-                            submission__group=group,
-                            submission__status__in=['Approved', 'In Progress']
-                        ).first()
-                        
-                        if active_projects:
-                            project_context = f"Project: {active_projects.title}\nAbstract: {active_projects.abstract}\nCategory: {active_projects.category}"
-
-                    # --- 2. Determine Content to Verify ---
-                    content_to_verify = submission.text_content or ""
-                    image_data = None
-                    
-                    # Handle File Content Safely
-                    if submission.file:
-                        try:
-                            file_name = submission.file.name.lower()
-                            # Check if it's an image
-                            if file_name.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-                                import base64
-                                submission.file.seek(0)
-                                image_bytes = submission.file.read()
-                                image_data = base64.b64encode(image_bytes).decode('utf-8')
-                                submission.file.seek(0) # Reset
-                                content_to_verify += f"\n\n[Image File Uploaded]: {submission.file.name}"
-                            else:
-                                # Try to read as text (e.g., code files, txt)
-                                file_content = submission.file.read().decode('utf-8')
-                                submission.file.seek(0) # Reset pointer
-                                if not content_to_verify:
-                                    content_to_verify = file_content
-                                else:
-                                    content_to_verify += f"\n\n[Attached File Content]:\n{file_content}"
-                        except UnicodeDecodeError:
-                            # Binary file (PDF, etc.) - Don't crash!
-                            submission.file.seek(0) # Reset pointer
-                            content_to_verify += f"\n\n[Binary File Uploaded]: {submission.file.name}\n(AI Note: Assume this file contains the required diagram/report as described by the filename.)"
-                        except Exception as e:
-                            content_to_verify += f"\n\n[Error reading file]: {str(e)}"
-
-                    # --- 3. Route to Appropriate AI Endpoint ---
-                    
-                    if assignment.assignment_type == 'Code' and submission.file and not image_data:
-                        # --- Code Review Specific Logic (Text Only) ---
-                        ai_payload = {
-                            'code': content_to_verify, 
-                            'filename': submission.file.name,
-                            'context': f"{assignment.description}\n\n{project_context}" if project_context else assignment.description
-                        }
-                        
-                        try:
-                            ai_response = requests.post(
-                                'http://127.0.0.1:8001/review-code', 
-                                json=ai_payload,
-                                timeout=45
-                            )
-                            
-                            if ai_response.status_code == 200:
-                                result = ai_response.json()
-                                security_score = result.get('security_score', 0)
-                                quality_score = result.get('quality_score', 0)
-                                submission.ai_verified = True
-                                submission.ai_score = (security_score + quality_score) / 2
-                                submission.ai_feedback = f"Security: {security_score}/10, Quality: {quality_score}/10\n{result.get('ai_feedback', '')}"
-                            else:
-                                submission.ai_feedback = "Code review service unavailable"
-                        except requests.Timeout:
-                            submission.ai_feedback = "Code review timed out (45s)"
-                        except Exception as e:
-                            submission.ai_feedback = f"Code review error: {str(e)}"
-
-                    else:
-                        # --- Generic Verification (Diagram, Report, Other) ---
-                        # Uses the NEW /verify-assignment endpoint (Supports Images!)
-                        
-                        ai_payload = {
-                            'assignment_type': assignment.assignment_type,
-                            'description': assignment.description,
-                            'text_content': content_to_verify[:5000], # Limit char count
-                            'project_context': project_context,
-                            'image_data': image_data # Send base64 image if present
-                        }
-                        
-                        try:
-                            ai_response = requests.post(
-                                'http://127.0.0.1:8001/verify-assignment', 
-                                json=ai_payload,
-                                timeout=45 # Increased timeout for image processing
-                            )
-                            
-                            if ai_response.status_code == 200:
-                                result = ai_response.json()
-                                print(f"DEBUG: AI Response: {result}") # VIEW IN TERMINAL
-                                submission.ai_verified = result.get('is_approved', False)
-                                submission.ai_score = result.get('score', 0)
-                                submission.ai_feedback = result.get('feedback', '')
-                                print(f"DEBUG: Saving submission {submission.id} with feedback len={len(submission.ai_feedback)}")
-                            else:
-                                print(f"DEBUG: AI Error Status {ai_response.status_code}: {ai_response.text}")
-                                submission.ai_feedback = "Verification service unavailable"
-                        except requests.Timeout:
-                            print("DEBUG: AI Timeout")
-                            submission.ai_feedback = "Verification timed out"
-                        except Exception as e:
-                            print(f"DEBUG: AI Request Error: {e}")
-                            submission.ai_feedback = f"Verification error: {str(e)}"
-                    
-                    submission.save()
-                    print("DEBUG: Submission saved successfully.")
-                    
-                except Exception as e:
-                    # Catch-all for any background errors
-                    print(f"DEBUG: Background Thread Crash: {e}")
-                    submission.ai_feedback = f"Background verification failed: {str(e)}"
-                    submission.save()
-            
-            # Start background thread
-            thread = threading.Thread(target=verify_in_background)
-            thread.daemon = True
-            thread.start()
+            # Queue AI verification; `manage.py run_workers` picks it up
+            enqueue_task('verify_assignment', submission_id=submission.id)
             
             # Return immediately - don't wait for AI
             response_data = serializer.data
@@ -2038,6 +1780,28 @@ class AssignmentSubmissionView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BackgroundTaskStatusView(APIView):
+    permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+
+    def get(self, request, task_id):
+        bg_task = get_object_or_404(BackgroundTask, id=task_id)
+        return Response({
+            "task_id": bg_task.id,
+            "name": bg_task.name,
+            "status": bg_task.status,
+            "attempts": bg_task.attempts,
+            "last_error": bg_task.last_error,
+            "finished_at": bg_task.finished_at,
+        })
+
+class BackgroundTaskQueueView(APIView):
+    """Queue depth for the task workers (how far behind AI verification is)."""
+    permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+
+    def get(self, request):
+        return Response(queue_depth())
+
+
 class TeacherGroupListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
     serializer_class = GroupSerializer
@@ -2053,6 +1817,7 @@ class AssignmentSubmissionsListView(generics.ListAPIView):
     """Teacher view to see all submissions for a specific assignment"""
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
     serializer_class = AssignmentSubmissionSerializer
+    pagination_class = SubmissionCursorPagination
     
     def get_queryset(self):
         assignment_id = self.kwargs.get('assignment_id')
@@ -2065,63 +1830,10 @@ class TeacherDashboardStatsView(APIView):
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
 
     def get(self, request):
-        user = request.user
-        
-        # Base QuerySets
-        submissions_qs = ProjectSubmission.objects.all()
-        projects_qs = Project.objects.all()
-        vivas_qs = VivaSession.objects.all()
+        # One query on a cache miss; cached per teacher and invalidated by signals
+        return Response(teacher_dashboard_stats(request.user))
 
-        # Strict Teacher Filter
-        teacher_groups = user.teaching_groups.all()
-        
-        # 0. Identify groups that ALREADY have an active or completed project
-        groups_with_projects = Project.objects.filter(
-            status__in=['In Progress', 'Completed'],
-            submission__group__isnull=False
-        ).values_list('submission__group_id', flat=True)
-
-        # 1. Pending Approvals: Only show submissions from groups that DON'T have a project yet
-        submissions_qs = ProjectSubmission.objects.filter(
-            group__in=teacher_groups,
-            status='Submitted'
-        ).exclude(group_id__in=groups_with_projects)
-        
-        projects_qs = Project.objects.filter(submission__group__in=teacher_groups)
-        vivas_qs = VivaSession.objects.filter(project__submission__group__in=teacher_groups)
-
-        # 1. Pending Approvals (Submissions with status='Submitted')
-        pending_approvals = submissions_qs.filter(status='Submitted').count()
-
-        # 2. Active Projects (Projects with status='In Progress')
-        active_projects = projects_qs.filter(status='In Progress').count()
-
-        # 3. Active Assignments (Strictly those created by THIS teacher)
-        now = timezone.now()
-        active_assignments = TimedAssignment.objects.filter(
-            created_by=user,
-            start_time__lte=now,
-            end_time__gte=now
-        ).count()
-
-        # 4. Vivas Scheduled (Total VivaSessions for now, or could filter by future date)
-        vivas_scheduled = vivas_qs.count()
-
-        # 5. Unappointed Ongoing Projects
-        unappointed_ongoing = Project.objects.filter(
-            submission__group__teachers__isnull=True,
-            status='In Progress'
-        ).count()
-
-        return Response({
-            "pending_approvals": pending_approvals,
-            "active_projects": active_projects,
-            "active_assignments": active_assignments,
-            "vivas_scheduled": vivas_scheduled,
-            "unappointed_ongoing": unappointed_ongoing,
-        })
-
-class UnappointedOngoingProjectsView(generics.ListAPIView):
+class UnappointedOngoingProjectsView(ApprovedProjectListMixin, generics.ListAPIView):
     """
     Returns Ongoing projects that have NO teacher assigned.
     Returns only title, abstract (description), and progress.
@@ -2141,123 +1853,65 @@ class UnappointedOngoingProjectsView(generics.ListAPIView):
             submission__group__in=user.teaching_groups.all()
         ).order_by('-submission__submitted_at')
 
+def _activity_text(event, for_teacher):
+    actor = event.actor.username if event.actor else "Someone"
+    if event.kind == 'submission':
+        if for_teacher:
+            return f"New project '{event.summary}' submitted by {actor}"
+        return f"You submitted project '{event.summary}'"
+    if event.kind == 'message':
+        if for_teacher:
+            project_title = event.project.title if event.project else "a project"
+            return f"New message from {actor} in {project_title}"
+        return f"Message from {actor}: {event.summary[:30]}..."
+    if event.kind == 'assignment':
+        return f"New assignment: {event.summary}"
+    return f"{actor}: {event.summary}"
+
+
+def _activity_feed_response(request, view, events, for_teacher, page_size):
+    """One indexed range query on ActivityEvent; older pages via ?before=<X-Oldest-Cursor>."""
+    paginator = ActivityCursorPagination()
+    paginator.page_size = page_size
+    page = paginator.paginate_queryset(events.select_related('actor', 'project'), request, view)
+
+    activities = []
+    seen = set()
+    for event in page:
+        if event.ref in seen: # an assignment given to two of my groups
+            continue
+        seen.add(event.ref)
+        activities.append({
+            "id": event.ref,
+            "type": event.kind,
+            "text": _activity_text(event, for_teacher),
+            "time": event.timestamp.isoformat(),
+        })
+    return paginator.get_paginated_response(activities)
+
+
 class TeacherActivityFeedView(APIView):
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
 
     def get(self, request):
-        activities = []
-        user = request.user
-
         # Strict Teacher Filter
-        teacher_groups = user.teaching_groups.all()
-        submissions_qs = ProjectSubmission.objects.filter(group__in=teacher_groups)
-        messages_qs = Message.objects.filter(project__submission__group__in=teacher_groups)
-        logs_qs = StudentActivityLog.objects.filter(project__submission__group__in=teacher_groups)
-
-        # 1. Recent Submissions (last 5)
-        recent_subs = submissions_qs.order_by('-submitted_at')[:5]
-        for sub in recent_subs:
-            activities.append({
-                "id": f"sub_{sub.id}",
-                "type": "submission",
-                "text": f"New project '{sub.title}' submitted by {sub.student.username}",
-                "time": sub.submitted_at, # datetime object
-                "timestamp": sub.submitted_at.timestamp()
-            })
-
-        # 2. Recent Messages (last 5) - assuming Message model has created_at
-        recent_msgs = messages_qs.order_by('-timestamp')[:5]
-        for msg in recent_msgs:
-            activities.append({
-                "id": f"msg_{msg.id}",
-                "type": "message",
-                "text": f"New message from {msg.sender.username} in {msg.project.title}",
-                "time": msg.timestamp,
-                "timestamp": msg.timestamp.timestamp()
-            })
-
-        # 3. Student Activity Logs (New)
-        recent_logs = logs_qs.order_by('-timestamp')[:10]
-        for log in recent_logs:
-            activities.append({
-                "id": f"log_{log.id}",
-                "type": "system", # Use 'system' icon for now
-                "text": f"{log.student.username}: {log.action}",
-                "time": log.timestamp,
-                "timestamp": log.timestamp.timestamp()
-            })
-            
-        # Sort by timestamp descending
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Take top 20 combined
-        final_activities = activities[:20]
-        
-        # Format time for frontend (e.g., "2 hours ago" logic can be done in frontend, here send ISO)
-        for act in final_activities:
-            # act['time'] is a datetime, let's just send isoformat
-            if hasattr(act['time'], 'isoformat'):
-                act['time'] = act['time'].isoformat()
-            del act['timestamp']
-
-
-        return Response(final_activities)
+        events = ActivityEvent.objects.filter(
+            group_id__in=group_ids(request.user, 'teaching'),
+            kind__in=['submission', 'message', 'system']
+        )
+        return _activity_feed_response(request, self, events, for_teacher=True, page_size=20)
 
 class StudentActivityFeedView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        activities = []
         user = request.user
-
-        # 1. Recent Submissions by the student
-        recent_subs = ProjectSubmission.objects.filter(student=user).order_by('-submitted_at')[:5]
-        for sub in recent_subs:
-            activities.append({
-                "id": f"sub_{sub.id}",
-                "type": "submission",
-                "text": f"You submitted project '{sub.title}'",
-                "time": sub.submitted_at,
-                "timestamp": sub.submitted_at.timestamp()
-            })
-
-        # 2. Recent Messages (received)
-        recent_msgs = Message.objects.filter(recipient=user).order_by('-timestamp')[:5]
-        for msg in recent_msgs:
-            activities.append({
-                "id": f"msg_{msg.id}",
-                "type": "message",
-                "text": f"Message from {msg.sender.username}: {msg.content[:30]}...",
-                "time": msg.timestamp,
-                "timestamp": msg.timestamp.timestamp()
-            })
-
-        # 3. Recent Assignments (assigned to student's group)
-        student_groups = user.student_groups.all()
-        recent_assignments = TimedAssignment.objects.filter(assigned_groups__in=student_groups).order_by('-start_time')[:5]
-        for assign in recent_assignments:
-            activities.append({
-                "id": f"assign_{assign.id}",
-                "type": "assignment",
-                "text": f"New assignment: {assign.title}",
-                "time": assign.start_time,
-                "timestamp": assign.start_time.timestamp()
-            })
-
-        # Sort by timestamp descending
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Take top 10 combined
-        final_activities = activities[:10]
-        
-        # Format time for frontend
-        for act in final_activities:
-            if hasattr(act['time'], 'isoformat'):
-                act['time'] = act['time'].isoformat()
-            del act['timestamp']
-
-
-        return Response(final_activities)
+        # My own submissions and DMs, plus group messages and assignments of my groups
+        events = ActivityEvent.objects.filter(
+            Q(user=user, kind__in=['submission', 'message']) |
+            Q(broadcast=True, group_id__in=group_ids(user, 'student'))
+        )
+        return _activity_feed_response(request, self, events, for_teacher=False, page_size=10)
 
 class ProjectUpdateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -2266,7 +1920,8 @@ class ProjectUpdateView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # Check permissions: User must be the student who submitted or a group member
-        if project.submission.student != request.user and (not project.submission.group or request.user not in project.submission.group.students.all()):
+        membership = project_membership(request, project)
+        if not (membership.owner or membership.group_student):
              return Response({"error": "You do not have permission to update this project."}, status=status.HTTP_403_FORBIDDEN)
 
         # Allow updating github_repo_link
@@ -2278,6 +1933,47 @@ class ProjectUpdateView(APIView):
 
         return Response({'status': 'no changes made'})
 
+def _enqueue_ai_job(job_type, payload, project):
+    """
+    Queues a long-running AI call (audit, docs, issues, auto-fix) on the
+    microservice and returns 202 with the job id instead of waiting 10-90s.
+    A background task follows the job and stores its result when it finishes.
+    """
+    try:
+        response = requests.post(
+            AI_JOBS_URL,
+            json={"type": job_type, "payload": payload, "ref": f"project:{project.id}"},
+            timeout=10
+        )
+    except requests.RequestException as e:
+        logger.error(f"Could not queue {job_type} job: {e}")
+        return Response({"error": "AI Service unavailable"}, status=503)
+
+    try:
+        job = response.json()
+    except ValueError:
+        job = None
+    if response.status_code != 202 or not job:
+        logger.error(f"AI service refused {job_type} job ({response.status_code}): {response.text[:200]}")
+        if response.status_code < 500 and isinstance(job, dict):
+            return Response(job, status=response.status_code)
+        return Response({"error": "AI Service error"}, status=status.HTTP_502_BAD_GATEWAY)
+
+    # Identical requests share a job; follow each job once
+    if job["status"] in ('queued', 'running') and not BackgroundTask.objects.filter(
+        name='collect_ai_job', status__in=['queued', 'running'], payload__job_id=job["job_id"]
+    ).exists():
+        enqueue_task(
+            'collect_ai_job', delay=AI_JOB_POLL_SECONDS,
+            job_id=job["job_id"], project_id=project.id, queued_at=time.time()
+        )
+
+    return Response({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/projects/{project.id}/jobs/{job['job_id']}/"
+    }, status=status.HTTP_202_ACCEPTED)
+
 class ProjectAuditView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -2286,11 +1982,8 @@ class ProjectAuditView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # 2. Check Permissions (Student owner, Team member, or Teacher)
-        is_member = False
-        if project.submission.student == request.user:
-            is_member = True
-        elif hasattr(project, 'team') and request.user in project.team.members.all():
-            is_member = True
+        membership = project_membership(request, project)
+        is_member = membership.owner or membership.member
         
         if not is_member and request.user.role != 'Teacher':
              return Response({"error": "Not authorized to audit this project"}, status=403)
@@ -2307,35 +2000,12 @@ class ProjectAuditView(APIView):
         Tech Stack: {project.submission.tags}
         """
 
-        # 5. Call AI Service
+        # 5. Queue the audit on the AI service; the client polls ProjectJobStatusView
         ai_payload = {
             "github_repo_link": project.github_repo_link,
             "project_context": project_context
         }
-        
-        try:
-            # Call the new /audit-code endpoint
-            response = requests.post("http://127.0.0.1:8001/audit-code", json=ai_payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # 6. Save Valid Results
-                if "error" not in result:
-                    project.audit_security_score = result.get('security_score', 0)
-                    project.audit_quality_score = result.get('quality_score', 0)
-                    project.audit_report = result # Save full JSON
-                    project.last_audit_date = timezone.now()
-                    project.save()
-                    
-                    return Response(result)
-                else:
-                    return Response(result, status=500)
-            else:
-                return Response({"error": "AI Service unavailable"}, status=503)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+        return _enqueue_ai_job("audit-code", ai_payload, project)
 
 class ProjectDocsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -2344,7 +2014,8 @@ class ProjectDocsView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # Check permissions
-        if not (request.user == project.submission.student or project.team.members.filter(id=request.user.id).exists() or request.user.role == 'Teacher'):
+        membership = project_membership(request, project)
+        if not (membership.owner or membership.member or request.user.role == 'Teacher'):
              return Response({"error": "Unauthorized"}, status=403)
 
         if not project.github_repo_link:
@@ -2355,14 +2026,7 @@ class ProjectDocsView(APIView):
             "project_context": f"Title: {project.title}\nAbstract: {project.abstract}"
         }
         
-        try:
-            response = requests.post("http://127.0.0.1:8001/generate-docs", json=ai_payload)
-            if response.status_code == 200:
-                return Response(response.json())
-            else:
-                return Response({"error": "AI Service unavailable"}, status=503)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+        return _enqueue_ai_job("generate-docs", ai_payload, project)
 
 class ProjectIssuesView(APIView):
     permission_classes = [IsAuthenticated]
@@ -2371,7 +2035,8 @@ class ProjectIssuesView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # Check permissions
-        if not (request.user == project.submission.student or project.team.members.filter(id=request.user.id).exists() or request.user.role == 'Teacher'):
+        membership = project_membership(request, project)
+        if not (membership.owner or membership.member or request.user.role == 'Teacher'):
              return Response({"error": "Unauthorized"}, status=403)
              
         if not project.github_repo_link:
@@ -2384,15 +2049,7 @@ class ProjectIssuesView(APIView):
             "project_context": fake_context
         }
         
-        try:
-            response = requests.post("http://127.0.0.1:8001/analyze-issues", json=ai_payload)
-            if response.status_code == 200:
-                return Response(response.json())
-            else:
-                return Response({"error": "AI Service unavailable"}, status=503)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+        return _enqueue_ai_job("analyze-issues", ai_payload, project)
 
 class ProjectAutoFixView(APIView):
     permission_classes = [IsAuthenticated]
@@ -2400,10 +2057,9 @@ class ProjectAutoFixView(APIView):
     def post(self, request, project_id):
         # 1. Get Project & Check Permissions
         project = get_object_or_404(Project, id=project_id)
-        if project.submission.student != request.user:
-             # Also allow team members if implemented
-             if not (hasattr(project, 'team') and request.user in project.team.members.all()):
-                  return Response({"error": "Not authorized"}, status=403)
+        membership = project_membership(request, project)
+        if not (membership.owner or membership.member):
+             return Response({"error": "Not authorized"}, status=403)
 
         # 2. Proxy to AI Microservice
         if not project.github_repo_link:
@@ -2418,14 +2074,39 @@ class ProjectAutoFixView(APIView):
             "project_context": f"Title: {project.title}\nAbstract: {project.abstract}"
         }
         
+        return _enqueue_ai_job("auto-fix", ai_payload, project)
+
+class ProjectJobStatusView(APIView):
+    """
+    Polling endpoint for jobs queued by the audit/docs/issues/auto-fix views.
+    Returns the microservice job as-is: status is queued, running, succeeded or failed.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, project_id, job_id):
+        project = get_object_or_404(Project, id=project_id)
+
+        membership = project_membership(request, project)
+        is_member = membership.owner or membership.member
+        if not is_member and request.user.role != 'Teacher':
+            return Response({"error": "Unauthorized"}, status=403)
+
         try:
-            response = requests.post("http://127.0.0.1:8001/auto-fix", json=ai_payload)
-            if response.status_code == 200:
-                return Response(response.json())
-            else:
-                return Response(response.json(), status=response.status_code)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            response = requests.get(f"{AI_JOBS_URL}/{job_id}", timeout=10)
+        except requests.RequestException:
+            return Response({"error": "AI Service unavailable"}, status=503)
+
+        if response.status_code != 200:
+            return Response({"error": "Job not found"}, status=404)
+
+        job = response.json()
+        if job.get("ref") != f"project:{project.id}":
+            return Response({"error": "Job not found"}, status=404)
+
+        if job["status"] == "succeeded" and job["type"] == "audit-code":
+            apply_audit_result(project, job)
+
+        return Response(job)
 
 class TeamMemberView(APIView):
     permission_classes = [IsAuthenticated]
@@ -2453,7 +2134,7 @@ class TeamMemberView(APIView):
             if new_member.role != 'Student':
                 return Response({"detail": "Only students can be added to the team."}, status=status.HTTP_400_BAD_REQUEST)
             
-            if new_member in project.team.members.all():
+            if project.team.members.filter(id=new_member.id).exists():
                 return Response({"detail": "User is already in the team."}, status=status.HTTP_400_BAD_REQUEST)
             
             # OPTIONAL: Check if student is already in ANOTHER active team?
@@ -2495,7 +2176,7 @@ class TeamMemberView(APIView):
             if member_to_remove == project.submission.student:
                 return Response({"detail": "Cannot remove the project leader (submitter)."}, status=status.HTTP_400_BAD_REQUEST)
 
-            if member_to_remove not in project.team.members.all():
+            if not project.team.members.filter(id=member_to_remove.id).exists():
                 return Response({"detail": "User is not in the team."}, status=status.HTTP_400_BAD_REQUEST)
 
             project.team.members.remove(member_to_remove)
@@ -2508,9 +2189,8 @@ class StudentMyProjectView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user = request.user
-        # 1. Try to find a Project where the user is a team member
-        project = Project.objects.filter(team__members=user).first()
+        # Team project, then group project, then own submission (cached per user)
+        project = active_project(request.user)
         if project:
             return Response({
                 "id": project.id,
@@ -2520,19 +2200,9 @@ class StudentMyProjectView(APIView):
                 "status": project.status
             }, status=status.HTTP_200_OK)
 
-        # 2. Fallback: Find the latest ProjectSubmission by the user
-        submission = ProjectSubmission.objects.filter(student=user).order_by('-submitted_at').first()
+        # No project yet: show the latest proposal
+        submission = active_submission(request.user)
         if submission:
-            # Check if this submission has a related project (even if user isn't in team explicitly yet)
-            if hasattr(submission, 'project'):
-                 return Response({
-                    "id": submission.project.id,
-                    "title": submission.project.title,
-                    "abstract_text": submission.project.abstract,
-                    "github_link": submission.project.github_repo_link,
-                    "status": submission.project.status
-                }, status=status.HTTP_200_OK)
-            
             return Response({
                 "id": None, # No project ID yet
                 "submission_id": submission.id,
@@ -2580,9 +2250,8 @@ class ProjectChatCodebaseView(APIView):
         project = get_object_or_404(Project, id=project_id)
         
         # Check if user has access (Leader or Team)
-        is_member = project.submission.student == request.user
-        if hasattr(project, 'team') and request.user in project.team.members.all():
-            is_member = True
+        membership = project_membership(request, project)
+        is_member = membership.owner or membership.member
             
         if not is_member:
              return Response({"error": "Not authorized"}, status=403)
@@ -0,0 +1,141 @@
+"""
+XP award pipeline.
+
+Every award is an XPLog row keyed by (student, source, source_id); the unique
+constraint on that key makes awarding idempotent, so a re-saved submission or
+a retried task can't pay out twice. StudentXP counters are bumped with F()
+expressions in the same transaction as the log insert, so concurrent awards
+add up instead of overwriting each other. Each bump reports the old and new
+totals to the badge rules (gamification/badges.py).
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, Value
+from django.db.models.functions import Cast, Floor
+
+from .badges import award_crossed_badges
+from .models import StudentXP, XPLog
+from .ranking import bump_ranking_version
+from . import time_capsule
+
+# XPLog source -> StudentXP breakdown counter
+BREAKDOWN_FIELDS = {
+    'VIVA': 'viva_xp',
+    'ASSIGNMENT': 'assignment_xp',
+    'BOSS_BATTLE': 'boss_battle_xp',
+}
+
+
+def assignment_award(submission):
+    """
+    XP for an AI-verified assignment submission: 50 base plus the AI score
+    (0-100 from generic verification, 0-10 from code review). The code-review
+    score is an average and may be fractional; XP is whole.
+    """
+    return 50 + int(submission.ai_score)
+
+
+def viva_award(question):
+    """XP for a scored viva answer: 10 per point of the 0-10 score."""
+    return int(question.ai_score * 10)
+
+
+def _increment(student_id, by_source):
+    """
+    Atomically adds {source: amount} to one student's counters (and level).
+    Returns (old_total, new_total); the row stays locked until commit, so the
+    total read back is this award's.
+    """
+    amount = sum(by_source.values())
+    updates = {
+        'total_xp': F('total_xp') + amount,
+        # Same formula as StudentXP.calculate_level (integer division), evaluated on the new total
+        'level': Value(1) + Cast(Floor((F('total_xp') + amount) / 100), IntegerField()),
+    }
+    for source, part in by_source.items():
+        field = BREAKDOWN_FIELDS.get(source)
+        if field:
+            updates[field] = F(field) + part
+    profile = StudentXP.objects.filter(student_id=student_id)
+    if not profile.update(**updates):
+        # First XP for someone without a profile (e.g. a teacher-created account)
+        StudentXP.objects.get_or_create(student_id=student_id)
+        profile.update(**updates)
+    new_total = profile.values_list('total_xp', flat=True).get()
+    return new_total - amount, new_total
+
+
+def award_xp(student, amount, source, source_id, description):
+    """
+    Awards `amount` XP once per (student, source, source_id).
+    Returns False if it was already awarded (or the amount isn't positive).
+    """
+    amount = int(amount) # XP columns are integers; F() + a float would write a REAL
+    if amount <= 0:
+        return False
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                XPLog.objects.create(
+                    student=student, amount=amount, source=source,
+                    source_id=source_id, description=description[:255]
+                )
+        except IntegrityError:
+            return False
+        old_total, new_total = _increment(student.id, {source: amount})
+        award_crossed_badges([(student.id, old_total, new_total)])
+        transaction.on_commit(bump_ranking_version)
+    return True
+
+
+def award_xp_bulk(awards, batch_size=500):
+    """
+    Backfill path: `awards` is an iterable of
+    (student_id, amount, source, source_id, description). Awards already in
+    the log are skipped; the rest are inserted in batches and each student's
+    counters get one F() update. Returns the number of awards made.
+
+    Run one backfill at a time: keys are checked before the insert, so two
+    concurrent backfills over the same rows could both count them.
+    """
+    pending = {}
+    for student_id, amount, source, source_id, description in awards:
+        amount = int(amount)
+        if amount > 0:
+            pending.setdefault((student_id, source, source_id), (amount, description))
+    if not pending:
+        return 0
+
+    existing = set()
+    by_source = defaultdict(set)
+    for student_id, source, source_id in pending:
+        by_source[source].add(source_id)
+    for source, source_ids in by_source.items():
+        existing.update(
+            XPLog.objects.filter(source=source, source_id__in=source_ids)
+            .values_list('student_id', 'source', 'source_id')
+        )
+
+    new = {key: value for key, value in pending.items() if key not in existing}
+    totals = defaultdict(lambda: defaultdict(int))
+    logs = []
+    for (student_id, source, source_id), (amount, description) in new.items():
+        totals[student_id][source] += amount
+        logs.append(XPLog(
+            student_id=student_id, amount=amount, source=source,
+            source_id=source_id, description=description[:255]
+        ))
+
+    with transaction.atomic():
+        XPLog.objects.bulk_create(logs, batch_size=batch_size)
+        crossings = [
+            (student_id, *_increment(student_id, dict(amounts)))
+            for student_id, amounts in totals.items()
+        ]
+        award_crossed_badges(crossings)
+        transaction.on_commit(bump_ranking_version)
+        # bulk_create skips XPLog signals, so refresh the time capsules here
+        for student_id in totals:
+            transaction.on_commit(lambda student_id=student_id: time_capsule.bump_user(student_id))
+    return len(logs)
@@ -0,0 +1,93 @@
+"""
+Badge rules: a badge with a positive `xp_required` belongs to every student
+whose total XP has reached it.
+
+Evaluation is incremental. The award pipeline (gamification/awards.py) reports
+each student's old and new totals, and only badges whose threshold lies in
+between are granted, so nothing rescans other students or other badges. A new
+badge is granted to everyone already past its threshold when it is created.
+`manage.py recompute_badges` redoes everything in batches (after thresholds
+are edited, or to repair data).
+"""
+from bisect import bisect_right
+
+from .models import Badge, StudentXP
+
+BadgeOwner = Badge.owners.through
+
+
+def _grant(pairs):
+    """Bulk-inserts (student_id, badge_id) ownerships; ones already held are ignored."""
+    BadgeOwner.objects.bulk_create(
+        [BadgeOwner(user_id=student_id, badge_id=badge_id) for student_id, badge_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+def award_crossed_badges(crossings):
+    """`crossings` is a list of (student_id, old_total, new_total) from one award or batch."""
+    crossings = [(sid, old, new) for sid, old, new in crossings if new > old]
+    if not crossings:
+        return 0
+    low = min(old for _, old, _ in crossings)
+    high = max(new for _, _, new in crossings)
+    thresholds = list(
+        Badge.objects.filter(xp_required__gt=max(low, 0), xp_required__lte=high)
+        .values_list('xp_required', 'id')
+    )
+    if not thresholds:
+        return 0
+    pairs = [
+        (student_id, badge_id)
+        for student_id, old, new in crossings
+        for required, badge_id in thresholds
+        if old < required <= new
+    ]
+    _grant(pairs)
+    return len(pairs)
+
+
+def grant_to_qualified(badge):
+    """Gives a (new) badge to every student already at its threshold."""
+    if badge.xp_required <= 0:
+        return
+    student_ids = StudentXP.objects.filter(total_xp__gte=badge.xp_required).values_list('student_id', flat=True)
+    _grant((student_id, badge.id) for student_id in student_ids.iterator())
+
+
+def recompute_badges(batch_size=500, prune=False):
+    """
+    Full pass over StudentXP in id-keyed batches: grants every automatic badge a
+    student qualifies for and, with `prune`, takes back automatic badges they
+    no longer reach. Returns (granted, revoked) counts.
+    """
+    rules = sorted(Badge.objects.filter(xp_required__gt=0).values_list('xp_required', 'id'))
+    thresholds = [required for required, _ in rules]
+    granted = revoked = 0
+    last_id = 0
+    while True:
+        batch = list(
+            StudentXP.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'student_id', 'total_xp')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        earned = {
+            (student_id, badge_id)
+            for _, student_id, total in batch
+            for _, badge_id in rules[:bisect_right(thresholds, total)]
+        }
+        held = set(
+            BadgeOwner.objects.filter(user_id__in=[row[1] for row in batch], badge__xp_required__gt=0)
+            .values_list('user_id', 'badge_id')
+        )
+        missing = earned - held
+        _grant(missing)
+        granted += len(missing)
+
+        if prune:
+            for student_id, badge_id in held - earned:
+                BadgeOwner.objects.filter(user_id=student_id, badge_id=badge_id).delete()
+                revoked += 1
+    return granted, revoked
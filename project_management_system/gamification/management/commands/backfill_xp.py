@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from authentication.models import AssignmentSubmission, VivaQuestion
+from gamification.awards import award_xp_bulk, assignment_award, viva_award
+
+class Command(BaseCommand):
+    help = 'Award XP for verified assignments and scored viva answers that never got it (safe to re-run)'
+
+    def handle(self, *args, **kwargs):
+        submissions = AssignmentSubmission.objects.filter(
+            ai_verified=True, ai_score__isnull=False
+        ).select_related('assignment').order_by('id')
+        assignment_awards = (
+            (s.submitted_by_id, assignment_award(s), 'ASSIGNMENT', s.id, f"Assignment: {s.assignment.title} (ID: {s.id})")
+            for s in submissions.iterator()
+        )
+        awarded = award_xp_bulk(assignment_awards)
+        self.stdout.write(f"Assignments: {awarded} awards made.")
+
+        questions = VivaQuestion.objects.filter(ai_score__isnull=False).select_related('session').order_by('id')
+        viva_awards = (
+            (q.session.student_id, viva_award(q), 'VIVA', q.id, f"Viva Question ID: {q.id}")
+            for q in questions.iterator()
+        )
+        awarded = award_xp_bulk(viva_awards)
+        self.stdout.write(self.style.SUCCESS(f"Viva answers: {awarded} awards made."))
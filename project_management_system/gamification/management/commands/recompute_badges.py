@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from gamification.badges import recompute_badges
+
+class Command(BaseCommand):
+    help = 'Re-evaluate XP badges for every student in batches (after editing thresholds, or to repair data)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Students per batch')
+        parser.add_argument('--prune', action='store_true', help='Also remove XP badges students no longer qualify for')
+
+    def handle(self, *args, **kwargs):
+        granted, revoked = recompute_badges(batch_size=kwargs['batch_size'], prune=kwargs['prune'])
+        self.stdout.write(self.style.SUCCESS(f"Granted {granted} badges, revoked {revoked}."))
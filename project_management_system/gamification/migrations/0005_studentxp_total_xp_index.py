@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0004_delete_vivascore'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentxp',
+            name='total_xp',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
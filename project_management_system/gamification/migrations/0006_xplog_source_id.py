@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:01
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Descriptions the old signals used to recognise their own awards
+SOURCE_ID_PATTERNS = {
+    'ASSIGNMENT': re.compile(r'\(ID: (\d+)\)$'),
+    'VIVA': re.compile(r'^Viva Question ID: (\d+)$'),
+}
+
+
+def fill_source_ids(apps, schema_editor):
+    """Recovers source ids from descriptions; a duplicate award keeps a NULL id."""
+    XPLog = apps.get_model('gamification', 'XPLog')
+    seen = set()
+    for log in XPLog.objects.filter(source__in=list(SOURCE_ID_PATTERNS)).order_by('id').iterator():
+        match = SOURCE_ID_PATTERNS[log.source].search(log.description)
+        if not match:
+            continue
+        key = (log.student_id, log.source, int(match.group(1)))
+        if key in seen:
+            continue
+        seen.add(key)
+        log.source_id = key[2]
+        log.save(update_fields=['source_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0005_studentxp_total_xp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xplog',
+            name='source_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_source_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='xplog',
+            constraint=models.UniqueConstraint(fields=('student', 'source', 'source_id'), name='unique_xp_award'),
+        ),
+    ]
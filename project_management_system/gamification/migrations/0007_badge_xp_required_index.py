@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0006_xplog_source_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='badge',
+            name='xp_required',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
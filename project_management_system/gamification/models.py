@@ -3,7 +3,7 @@ from authentication.models import User
 
 class StudentXP(models.Model):
     student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='xp_profile')
-    total_xp = models.IntegerField(default=0)
+    total_xp = models.IntegerField(default=0, db_index=True)
     level = models.IntegerField(default=1)
     
     # Breakdown
@@ -37,8 +37,15 @@ class XPLog(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='xp_logs')
     amount = models.IntegerField()
     source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    # Row that earned the XP (AssignmentSubmission / VivaQuestion id); one award per row
+    source_id = models.PositiveIntegerField(null=True, blank=True)
     description = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'source', 'source_id'], name='unique_xp_award'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} gained {self.amount} XP from {self.source}"
@@ -47,7 +54,8 @@ class Badge(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     icon = models.CharField(max_length=50, default="Trophy") # Lucide icon name
-    xp_required = models.IntegerField(default=0)
+    # Awarded automatically when total XP crosses it (gamification/badges.py); 0 = handed out manually
+    xp_required = models.IntegerField(default=0, db_index=True)
     
     owners = models.ManyToManyField(User, related_name='badges', blank=True)
     
@@ -0,0 +1,142 @@
+"""
+Materialized XP ranking: one window-function pass over StudentXP, cached.
+
+The snapshot maps every student to their overall rank and to their rank in
+each of their groups, so rank, percentile and group-board lookups are dict
+reads. Ties share a rank (1, 2, 2, 4), like SQL RANK(). Each student's
+standing is also cached as its own small entry, so a one-student lookup
+(student_rank) never loads the whole snapshot.
+
+Cache keys carry a version stamp that gamification/signals.py bumps whenever
+total XP or group membership changes; the next read rebuilds the snapshot.
+Code that changes XP with queryset `.update()` must call bump_ranking_version()
+itself.
+
+Staleness: most XP is awarded by tasks in `manage.py run_workers`. With a
+shared cache (REDIS_URL, see settings) their bumps reach every process and
+ranks are current after the commit. With the default per-process
+local-memory cache the web process never sees those bumps, so it serves ranks
+up to RANKING_TTL old.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+
+from authentication.models import Group
+from .models import StudentXP
+
+RANKING_TTL = 300 # seconds
+VERSION_KEY = 'gamification:ranking:version'
+_MISSING = object()
+
+
+def _build():
+    rows = StudentXP.objects.annotate(
+        position=Window(Rank(), order_by=F('total_xp').desc())
+    ).order_by('position', 'student_id').values_list('student_id', 'total_xp', 'position')
+
+    membership = defaultdict(list)
+    for group_id, user_id in Group.students.through.objects.values_list('group_id', 'user_id'):
+        membership[user_id].append(group_id)
+
+    ranks, order = {}, []
+    groups = defaultdict(lambda: {'ranks': {}, 'order': [], 'last': None})
+    for student_id, xp, position in rows:
+        ranks[student_id] = position
+        order.append(student_id)
+        # Same ordering, so each group's ranks follow from one pass
+        for group_id in membership.get(student_id, ()):
+            board = groups[group_id]
+            board['order'].append(student_id)
+            last = board['last']
+            rank = last[1] if last and last[0] == xp else len(board['order'])
+            board['ranks'][student_id] = rank
+            board['last'] = (xp, rank)
+
+    return {
+        'ranks': ranks,
+        'order': order,
+        'groups': {gid: {'ranks': b['ranks'], 'order': b['order']} for gid, b in groups.items()},
+        'memberships': {sid: sorted(gids) for sid, gids in membership.items() if sid in ranks},
+        'group_names': dict(Group.objects.filter(id__in=list(groups)).values_list('id', 'name')),
+    }
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def _standing_key(version, student_id):
+    return f"gamification:rank:{version}:{student_id}"
+
+
+def get_ranking():
+    version = _version()
+    key = f"gamification:ranking:{version}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _build()
+        cache.set(key, snapshot, RANKING_TTL)
+        cache.set_many(
+            {_standing_key(version, sid): _standing(snapshot, sid) for sid in snapshot['order']}, RANKING_TTL
+        )
+    return snapshot
+
+
+def bump_ranking_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError: # key missing/evicted: any fresh value orphans old snapshots
+        cache.set(VERSION_KEY, int(timezone.now().timestamp()), None)
+
+
+def percentile(rank, total):
+    """Share of the other students ranked at or below `rank` (100 = top, 0 = last)."""
+    if total <= 1:
+        return 100.0
+    return round(100.0 * (total - rank) / (total - 1), 1)
+
+
+def _standing(ranking, student_id):
+    """One student's standing, computed from the snapshot."""
+    rank = ranking['ranks'].get(student_id)
+    if rank is None:
+        return None
+    total = len(ranking['order'])
+    groups = []
+    for group_id in ranking['memberships'].get(student_id, ()):
+        board = ranking['groups'][group_id]
+        group_rank, group_total = board['ranks'][student_id], len(board['order'])
+        groups.append({
+            'group': group_id,
+            'group_name': ranking['group_names'].get(group_id, ''),
+            'rank': group_rank,
+            'total_students': group_total,
+            'percentile': percentile(group_rank, group_total),
+        })
+    return {
+        'rank': rank,
+        'total_students': total,
+        'percentile': percentile(rank, total),
+        'groups': groups,
+    }
+
+
+def student_rank(student_id, ranking=None):
+    """Overall and per-group standing of one student, or None if they have no XP profile."""
+    if ranking is not None:
+        return _standing(ranking, student_id)
+    key = _standing_key(_version(), student_id)
+    standing = cache.get(key, _MISSING)
+    if standing is _MISSING:
+        # Evicted, or a student without XP: answer from the snapshot and remember it
+        standing = _standing(get_ranking(), student_id)
+        cache.set(key, standing, RANKING_TTL)
+    return standing
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import StudentXP, XPLog, Badge
+from .ranking import student_rank
 from authentication.serializers import UserSerializer
 
 class BadgeSerializer(serializers.ModelSerializer):
@@ -36,22 +37,26 @@ class StudentXPSerializer(serializers.ModelSerializer):
         return XPLogSerializer(logs, many=True).data
 
     def get_rank(self, obj):
-        # Calculate rank dynamically
-        # Count how many students have more XP than this student
-        higher_xp_count = StudentXP.objects.filter(total_xp__gt=obj.total_xp).count()
-        return higher_xp_count + 1
+        # The student's own cached standing (gamification/ranking.py), not the whole snapshot
+        standing = student_rank(obj.student_id)
+        return standing['rank'] if standing else None
 
 class LeaderboardSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.username', read_only=True)
     student_full_name = serializers.SerializerMethodField()
     badges_count = serializers.SerializerMethodField()
+    rank = serializers.SerializerMethodField()
 
     class Meta:
         model = StudentXP
-        fields = ['student_name', 'student_full_name', 'total_xp', 'level', 'badges_count']
+        fields = ['student_name', 'student_full_name', 'total_xp', 'level', 'badges_count', 'rank']
 
     def get_student_full_name(self, obj):
         return f"{obj.student.first_name} {obj.student.last_name}".strip() or obj.student.username
 
     def get_badges_count(self, obj):
         return obj.student.badges.count()
+
+    def get_rank(self, obj):
+        # Overall or group rank, depending on the board (see the views)
+        return self.context['ranks'].get(obj.student_id)
@@ -1,7 +1,14 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from authentication.models import AssignmentSubmission, VivaQuestion, User
-from .models import StudentXP, XPLog
+from authentication.models import (
+    AssignmentSubmission, VivaQuestion, User, Group, Project, ProjectSubmission, Checkpoint, Task
+)
+from .models import StudentXP, Badge, XPLog
+from .ranking import bump_ranking_version
+from .awards import award_xp, assignment_award, viva_award
+from .badges import grant_to_qualified
+from . import time_capsule
 
 @receiver(post_save, sender=User)
 def create_student_xp(sender, instance, created, **kwargs):
@@ -9,59 +16,79 @@ def create_student_xp(sender, instance, created, **kwargs):
         StudentXP.objects.create(student=instance)
 
 @receiver(post_save, sender=AssignmentSubmission)
-def award_assignment_xp(sender, instance, created, **kwargs):
+def award_assignment_xp(sender, instance, created, raw=False, **kwargs):
     # Check if AI has verified and scored the submission
-    if instance.ai_verified and instance.ai_score is not None:
-        student = instance.submitted_by
-        xp_profile, _ = StudentXP.objects.get_or_create(student=student)
-        
-        # Check if we already awarded XP for this submission
-        # We use a unique description pattern to identify
-        log_desc = f"Assignment: {instance.assignment.title} (ID: {instance.id})"
-        if XPLog.objects.filter(student=student, description=log_desc).exists():
-            return
-
-        # Calculate XP
-        base_xp = 50
-        score_xp = instance.ai_score # Assuming score is 0-100
-        total_award = base_xp + score_xp
-        
-        # Update Profile
-        xp_profile.total_xp += total_award
-        xp_profile.assignment_xp += total_award
-        xp_profile.save()
-        
-        # Log it
-        XPLog.objects.create(
-            student=student,
-            amount=total_award,
-            source='ASSIGNMENT',
-            description=log_desc
+    if not raw and instance.ai_verified and instance.ai_score is not None:
+        # Idempotent: a re-save of the same submission awards nothing
+        award_xp(
+            instance.submitted_by, assignment_award(instance), 'ASSIGNMENT', instance.id,
+            f"Assignment: {instance.assignment.title} (ID: {instance.id})"
         )
 
 @receiver(post_save, sender=VivaQuestion)
-def award_viva_xp(sender, instance, created, **kwargs):
+def award_viva_xp(sender, instance, created, raw=False, **kwargs):
     # Award XP for each answered and scored question
-    if instance.ai_score is not None:
-        session = instance.session
-        student = session.student
-        xp_profile, _ = StudentXP.objects.get_or_create(student=student)
-        
-        log_desc = f"Viva Question ID: {instance.id}"
-        if XPLog.objects.filter(student=student, description=log_desc).exists():
-            return
-            
-        # Calculate XP: 10 XP per point (assuming score is 0-10)
-        award = instance.ai_score * 10
-        
-        if award > 0:
-            xp_profile.total_xp += award
-            xp_profile.viva_xp += award
-            xp_profile.save()
-            
-            XPLog.objects.create(
-                student=student,
-                amount=award,
-                source='VIVA',
-                description=log_desc
-            )
+    if not raw and instance.ai_score is not None:
+        award_xp(
+            instance.session.student, viva_award(instance), 'VIVA', instance.id,
+            f"Viva Question ID: {instance.id}"
+        )
+
+@receiver(post_save, sender=Badge)
+def badge_created(sender, instance, created, raw=False, **kwargs):
+    # Existing students past the threshold get it now; later crossings are incremental
+    if created and not raw:
+        grant_to_qualified(instance)
+
+
+# --- Ranking snapshot invalidation ---
+
+@receiver(post_save, sender=StudentXP)
+def xp_changed(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Avatar edits save with update_fields and leave the ranking alone
+    if not raw and (update_fields is None or 'total_xp' in update_fields):
+        transaction.on_commit(bump_ranking_version)
+
+@receiver(post_delete, sender=StudentXP)
+def xp_deleted(sender, **kwargs):
+    transaction.on_commit(bump_ranking_version)
+
+@receiver(m2m_changed, sender=Group.students.through)
+def group_students_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_ranking_version)
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, created, raw=False, **kwargs):
+    # Group names are part of the snapshot
+    if not created and not raw:
+        transaction.on_commit(bump_ranking_version)
+
+
+# --- Time capsule cache invalidation ---
+
+@receiver([post_save, post_delete], sender=Checkpoint)
+@receiver([post_save, post_delete], sender=Task)
+def timeline_project_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: time_capsule.bump_project(instance.project_id))
+
+@receiver(post_save, sender=Project)
+def timeline_project_saved(sender, instance, raw=False, **kwargs):
+    # The inception event shows the project title
+    if not raw:
+        transaction.on_commit(lambda: time_capsule.bump_project(instance.id))
+
+@receiver(post_save, sender=ProjectSubmission)
+def timeline_submission_saved(sender, instance, created, raw=False, **kwargs):
+    # The inception event is dated by the submission; a new one has no project yet
+    if raw or created:
+        return
+    project_id = Project.objects.filter(submission=instance).values_list('id', flat=True).first()
+    if project_id:
+        transaction.on_commit(lambda: time_capsule.bump_project(project_id))
+
+@receiver([post_save, post_delete], sender=XPLog)
+def timeline_xp_event(sender, instance, raw=False, **kwargs):
+    if not raw and instance.amount >= time_capsule.XP_MILESTONE:
+        transaction.on_commit(lambda: time_capsule.bump_user(instance.student_id))
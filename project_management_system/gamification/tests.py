@@ -1,3 +1,230 @@
+import io
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import (
+    User, Group, Project, ProjectSubmission, TimedAssignment, AssignmentSubmission, VivaSession, VivaQuestion,
+    Task, Checkpoint
+)
+from .awards import award_xp
+from .ranking import _version, get_ranking, student_rank
+from .models import StudentXP, XPLog, Badge
+
+
+class RankingTest(TestCase):
+    """Ranks come from one cached window-function pass, refreshed when XP changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='Rank Group')
+        self.students = {}
+        for name, xp in [('ana', 300), ('ben', 200), ('cai', 200), ('dee', 50)]:
+            user = User.objects.create_user(username=f'rank_{name}', password='x', role='Student')
+            StudentXP.objects.filter(student=user).update(total_xp=xp)
+            self.students[name] = user
+        self.group.students.add(self.students['ben'], self.students['dee'])
+        self.client = APIClient()
+
+    def _my_rank(self, name):
+        self.client.force_authenticate(self.students[name])
+        return self.client.get(reverse('my-rank')).json()
+
+    def test_rank_percentile_and_groups(self):
+        ben = self._my_rank('ben')
+        self.assertEqual((ben['rank'], ben['total_students'], ben['percentile']), (2, 4, 66.7))
+        self.assertEqual(ben['groups'], [{
+            'group': self.group.id, 'group_name': 'Rank Group', 'rank': 1, 'total_students': 2, 'percentile': 100.0,
+        }])
+        # Ties share a rank; the snapshot is warm, so lookups cost no queries
+        self.client.force_authenticate(self.students['cai'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('my-rank')).json()['rank'], 2)
+        self.assertEqual(self._my_rank('dee')['rank'], 4)
+
+        board = self.client.get(reverse('group-leaderboard', args=[self.group.id])).json()
+        self.assertEqual([(row['student_name'], row['rank']) for row in board], [('rank_ben', 1), ('rank_dee', 2)])
+
+        # Outsiders can't read a group's board
+        self.client.force_authenticate(self.students['ana'])
+        self.assertEqual(self.client.get(reverse('group-leaderboard', args=[self.group.id])).status_code, 403)
+
+    def test_xp_change_refreshes_ranking(self):
+        self.assertEqual(self._my_rank('dee')['rank'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = StudentXP.objects.get(student=self.students['dee'])
+            profile.total_xp = 500
+            profile.save()
+        self.assertEqual(self._my_rank('dee')['rank'], 1)
+        board = self.client.get('/gamification/leaderboard/').json()
+        self.assertEqual([row['rank'] for row in board], [1, 2, 3, 3])
+
+        # Avatar edits don't invalidate the snapshot
+        self.client.get(reverse('student-stats'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('avatar-update'), {'avatar_seed': 'zed'}, format='json')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('my-rank'))
+
+    def test_single_student_lookups_skip_the_snapshot(self):
+        get_ranking()
+        with patch('gamification.ranking.get_ranking', side_effect=AssertionError('read the whole snapshot')):
+            self.assertEqual(student_rank(self.students['ben'].id)['rank'], 2)
+            self.client.force_authenticate(self.students['cai'])
+            self.assertEqual(self.client.get(reverse('student-stats')).json()['rank'], 2)
+        # An evicted entry, or a student with no profile, falls back to the snapshot once
+        cache.delete(f"gamification:rank:{_version()}:{self.students['dee'].id}")
+        self.assertEqual(student_rank(self.students['dee'].id)['rank'], 4)
+        self.assertIsNone(student_rank(999999))
+        with patch('gamification.ranking.get_ranking', side_effect=AssertionError('read the whole snapshot')):
+            self.assertIsNone(student_rank(999999))
+
+
+class XPAwardTest(TestCase):
+    """Awards are keyed by (student, source, source_id) and applied with F() increments."""
+
+    def setUp(self):
+        self.student = User.objects.create_user(username='xp_student', password='x', role='Student')
+        teacher = User.objects.create_user(username='xp_guide', password='x', role='Teacher')
+        self.group = Group.objects.create(name='XP Group')
+        self.assignment = TimedAssignment.objects.create(
+            title='Sprint', description='x', created_by=teacher, duration_minutes=30
+        )
+        submission = ProjectSubmission.objects.create(student=self.student, group=self.group, title='XP', abstract_text='x')
+        project = Project.objects.create(submission=submission, title='XP', abstract='x')
+        self.session = VivaSession.objects.create(project=project, student=self.student)
+
+    def _profile(self):
+        return StudentXP.objects.get(student=self.student)
+
+    def test_signals_award_once(self):
+        submission = AssignmentSubmission.objects.create(
+            assignment=self.assignment, group=self.group, submitted_by=self.student, ai_verified=True, ai_score=40
+        )
+        submission.ai_feedback = 'Re-saved'
+        submission.save()
+        VivaQuestion.objects.create(session=self.session, question_text='Why?', ai_score=8)
+
+        profile = self._profile()
+        self.assertEqual((profile.total_xp, profile.assignment_xp, profile.viva_xp, profile.level), (170, 90, 80, 2))
+        self.assertEqual(XPLog.objects.filter(student=self.student).count(), 2)
+
+        self.assertFalse(award_xp(self.student, 5, 'ASSIGNMENT', submission.id, 'again'))
+        self.assertTrue(award_xp(self.student, 30, 'BONUS', None, 'Hackathon'))
+        self.assertEqual(self._profile().total_xp, 200)
+
+    def test_fractional_score_awards_whole_xp(self):
+        # The code-review path stores the average of two 0-10 scores
+        submission = AssignmentSubmission(
+            assignment=self.assignment, group=self.group, submitted_by=self.student, ai_verified=True
+        )
+        submission.save()
+        submission.ai_score = 7.5
+        submission.save()
+        self.assertTrue(award_xp(self.student, 99.9, 'BONUS', None, 'Fractional'))
+
+        profile = self._profile()
+        self.assertEqual((profile.total_xp, profile.level), (57 + 99, 2))
+        self.assertIsInstance(StudentXP.objects.values_list('total_xp', flat=True).get(student=self.student), int)
+
+    def test_backfill_is_idempotent(self):
+        question = VivaQuestion.objects.create(session=self.session, question_text='How?')
+        # Scores written behind the signals' back, e.g. by an old import
+        VivaQuestion.objects.filter(id=question.id).update(ai_score=5)
+        submission = AssignmentSubmission.objects.create(
+            assignment=self.assignment, group=self.group, submitted_by=self.student
+        )
+        AssignmentSubmission.objects.filter(id=submission.id).update(ai_verified=True, ai_score=10)
+
+        call_command('backfill_xp', stdout=io.StringIO())
+        call_command('backfill_xp', stdout=io.StringIO())
+        profile = self._profile()
+        self.assertEqual((profile.total_xp, profile.viva_xp, profile.assignment_xp, profile.level), (110, 50, 60, 2))
+        self.assertEqual(XPLog.objects.filter(student=self.student).count(), 2)
+
+
+class BadgeEngineTest(TestCase):
+    """Badges are granted when an award crosses their threshold, and by the batch recompute."""
+
+    def setUp(self):
+        self.student = User.objects.create_user(username='badge_student', password='x', role='Student')
+        self.bronze = Badge.objects.create(name='Bronze', description='x', xp_required=100)
+        self.silver = Badge.objects.create(name='Silver', description='x', xp_required=150)
+        self.gold = Badge.objects.create(name='Gold', description='x', xp_required=500)
+        self.manual = Badge.objects.create(name='Mentor Pick', description='x')
+
+    def _badges(self, user=None):
+        return set((user or self.student).badges.values_list('name', flat=True))
+
+    def test_crossings_and_new_badges(self):
+        award_xp(self.student, 90, 'BONUS', None, 'Warm-up')
+        self.assertEqual(self._badges(), set())
+        # One award crossing two thresholds: one lookup, one bulk insert
+        with self.assertNumQueries(9):
+            award_xp(self.student, 80, 'BONUS', None, 'Demo day')
+        self.assertEqual(self._badges(), {'Bronze', 'Silver'})
+
+        Badge.objects.create(name='Starter', description='x', xp_required=50)
+        self.assertEqual(self._badges(), {'Bronze', 'Silver', 'Starter'})
+
+    def test_recompute_in_batches(self):
+        other = User.objects.create_user(username='badge_other', password='x', role='Student')
+        StudentXP.objects.filter(student=self.student).update(total_xp=600)
+        StudentXP.objects.filter(student=other).update(total_xp=120)
+        self.silver.owners.add(other) # stale: below the threshold
+
+        call_command('recompute_badges', '--batch-size', '1', '--prune', stdout=io.StringIO())
+        self.assertEqual(self._badges(), {'Bronze', 'Silver', 'Gold'})
+        self.assertEqual(self._badges(other), {'Bronze'})
+
+
+class TimeCapsuleTest(TestCase):
+    """The timeline is one UNION query, paged by cursor and cached until something on it changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='capsule_student', password='x', role='Student')
+        group = Group.objects.create(name='Capsule Group')
+        submission = ProjectSubmission.objects.create(student=self.student, group=group, title='Capsule', abstract_text='x')
+        self.project = Project.objects.create(submission=submission, title='Capsule', abstract='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_timeline_pages_and_invalidation(self):
+        task = Task.objects.create(project=self.project, title='Wire up login')
+        Task.objects.create(project=self.project, title='Still open')
+        Checkpoint.objects.create(
+            project=self.project, title='MVP', description='Demo', is_completed=True, date_completed=timezone.now()
+        )
+        award_xp(self.student, 60, 'BONUS', None, 'Hackathon')
+        award_xp(self.student, 10, 'BONUS', None, 'Small win')
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'Done'
+            task.save(update_fields=['status'])
+        task.refresh_from_db()
+        self.assertIsNotNone(task.completed_at)
+
+        url = reverse('time-capsule')
+        with self.assertNumQueries(2): # active project resolution + the UNION
+            response = self.client.get(url, {'limit': 3})
+        events = response.json()['events']
+        self.assertEqual([e['type'] for e in events], ['START', 'CHECKPOINT', 'ACHIEVEMENT'])
+        self.assertEqual(response['X-Has-More'], 'true')
+
+        rest = self.client.get(url, {'since': response['X-Latest-Cursor']})
+        self.assertEqual([e['description'] for e in rest.json()['events']], ['Wire up login'])
+        self.assertEqual(rest['X-Has-More'], 'false')
+
+        with self.assertNumQueries(0): # cached project resolution and page
+            self.client.get(url, {'limit': 3})
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'To Do'
+            task.save()
+        events = self.client.get(url).json()['events']
+        self.assertNotIn('TASK', [e['type'] for e in events])
@@ -0,0 +1,158 @@
+"""
+Project time capsule: one student's journey through one project.
+
+The timeline is a single UNION query over the project start, completed
+checkpoints, completed tasks and the student's big XP gains, ordered and
+cut in SQL, so a page costs one query however long the history is. Pages
+use a (date, kind, id) cursor and are cached per project and student;
+signals (gamification/signals.py) bump the project's or the student's
+version stamp when something on the timeline changes.
+
+As with the ranking (see gamification/ranking.py), bumps made in
+run_workers only reach the web process through a shared cache (REDIS_URL).
+With the per-process local-memory cache a page can be up to TIMELINE_TTL old.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import CharField, F, IntegerField, Q, TextField, Value
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from authentication.models import Checkpoint, Project, Task
+from .models import XPLog
+
+TIMELINE_TTL = 600 # seconds
+XP_MILESTONE = 50 # only show big wins
+
+# Event kind -> how it is rendered
+EVENT_STYLES = {
+    'checkpoint': ('CHECKPOINT', 'Flag'),
+    'start': ('START', 'Rocket'),
+    'task': ('TASK', 'CheckCircle'),
+    'xp': ('ACHIEVEMENT', 'Trophy'),
+}
+
+
+def encode_cursor(date, kind, ref):
+    raw = f"{date.isoformat()}|{kind}|{ref}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, kind, ref = raw.split('|')
+        return datetime.fromisoformat(date), kind, int(ref)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValidationError({'error': 'Invalid cursor.'})
+
+
+def _branches(project_id, user):
+    """(kind, queryset, date field) for every source of timeline events."""
+    return [
+        ('start', Project.objects.filter(id=project_id), 'submission__submitted_at'),
+        ('checkpoint', Checkpoint.objects.filter(project_id=project_id, is_completed=True, date_completed__isnull=False), 'date_completed'),
+        ('task', Task.objects.filter(project_id=project_id, status='Done', completed_at__isnull=False), 'completed_at'),
+        ('xp', XPLog.objects.filter(student=user, amount__gte=XP_MILESTONE), 'created_at'),
+    ]
+
+
+def _after(kind, date_field, cursor):
+    """Rows of this branch that sort after the cursor in (date, kind, id) order."""
+    date, cursor_kind, ref = cursor
+    later = Q(**{f'{date_field}__gt': date})
+    if kind > cursor_kind:
+        return later | Q(**{date_field: date})
+    if kind == cursor_kind:
+        return later | Q(**{date_field: date, 'id__gt': ref})
+    return later
+
+
+def _query(project_id, user, cursor, limit):
+    columns = ('t_date', 't_kind', 't_ref', 't_label', 't_detail', 't_amount')
+    parts = []
+    for kind, queryset, date_field in _branches(project_id, user):
+        if cursor:
+            queryset = queryset.filter(_after(kind, date_field, cursor))
+        label = {'start': 'title', 'checkpoint': 'title', 'task': 'title', 'xp': 'description'}[kind]
+        detail = F('description') if kind == 'checkpoint' else Value('', output_field=TextField())
+        amount = F('amount') if kind == 'xp' else Value(0, output_field=IntegerField())
+        parts.append(
+            queryset.order_by().annotate(
+                t_date=F(date_field),
+                t_kind=Value(kind, output_field=CharField()),
+                t_ref=F('id'),
+                t_label=F(label),
+                t_detail=detail,
+                t_amount=amount,
+            ).values_list(*columns)
+        )
+    union = parts[0].union(*parts[1:], all=True).order_by('t_date', 't_kind', 't_ref')
+    return list(union[:limit + 1])
+
+
+def _event(row):
+    date, kind, ref, label, detail, amount = row
+    event_type, icon = EVENT_STYLES[kind]
+    if kind == 'start':
+        title, description, event_id = "Project Inception", f"Started working on {label}", f"start-{ref}"
+    elif kind == 'checkpoint':
+        title, description, event_id = f"Milestone: {label}", detail, f"cp-{ref}"
+    elif kind == 'task':
+        title, description, event_id = "Task Conquered", label, f"task-{ref}"
+    else:
+        title, description, event_id = "Level Up Moment", f"Gained {amount} XP: {label}", f"xp-{ref}"
+    return {
+        "id": event_id,
+        "date": date,
+        "title": title,
+        "description": description,
+        "type": event_type,
+        "icon": icon,
+    }
+
+
+def _versions(project_id, user_id):
+    keys = [f"time_capsule:project:{project_id}", f"time_capsule:user:{user_id}"]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, 1, None)
+            found[key] = cache.get(key, 1)
+    return found[keys[0]], found[keys[1]]
+
+
+def bump_project(project_id):
+    _bump(f"time_capsule:project:{project_id}")
+
+
+def bump_user(user_id):
+    _bump(f"time_capsule:user:{user_id}")
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError: # key missing/evicted: any fresh value orphans old pages
+        cache.set(key, int(timezone.now().timestamp()), None)
+
+
+def timeline_page(project_id, user, since=None, limit=200):
+    """
+    Returns (events, latest_cursor, has_more) for events after the `since`
+    cursor, oldest first.
+    """
+    project_version, user_version = _versions(project_id, user.id)
+    key = f"time_capsule:{project_id}:{project_version}:{user.id}:{user_version}:{since or ''}:{limit}"
+    page = cache.get(key)
+    if page is None:
+        rows = _query(project_id, user, decode_cursor(since) if since else None, limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        latest = encode_cursor(*rows[-1][:3]) if rows else since
+        page = ([_event(row) for row in rows], latest, has_more)
+        cache.set(key, page, TIMELINE_TTL)
+    return page
@@ -1,10 +1,14 @@
 from django.urls import path
-from .views import LeaderboardView, StudentStatsView, AvatarUpdateView, ProjectTimeCapsuleView
+from .views import (
+    LeaderboardView, GroupLeaderboardView, MyRankView, StudentStatsView, AvatarUpdateView, ProjectTimeCapsuleView
+)
 
 
 urlpatterns = [
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/group/<int:group_id>/', GroupLeaderboardView.as_view(), name='group-leaderboard'),
     path('me/', StudentStatsView.as_view(), name='student-stats'),
+    path('me/rank/', MyRankView.as_view(), name='my-rank'),
     path('avatar/update/', AvatarUpdateView.as_view(), name='avatar-update'),
     path('time-capsule/', ProjectTimeCapsuleView.as_view(), name='time-capsule'),
 
@@ -1,10 +1,14 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.shortcuts import get_object_or_404
 from .models import StudentXP, XPLog
 
 from .serializers import StudentXPSerializer, LeaderboardSerializer
-from authentication.models import Project, Checkpoint, Task
+from .ranking import get_ranking, student_rank
+from .time_capsule import timeline_page
+from authentication.models import Group
+from authentication.active_project import resolve_active_project
 
 from django.db.models import Q
 from datetime import datetime
@@ -15,8 +19,49 @@ class LeaderboardView(generics.ListAPIView):
     serializer_class = LeaderboardSerializer
 
     def get_queryset(self):
-        # Return top 50 students ordered by total_xp
-        return StudentXP.objects.select_related('student').order_by('-total_xp')[:50]
+        # Return top 50 students ordered by total_xp (indexed; ties by student like the ranking)
+        return StudentXP.objects.select_related('student').order_by('-total_xp', 'student_id')[:50]
+
+    def get_ranks(self):
+        return get_ranking()['ranks']
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['ranks'] = self.get_ranks()
+        return context
+
+
+class GroupLeaderboardView(LeaderboardView):
+    """Top 50 of one group, ranked within the group. Members, the group's teachers and admins only."""
+
+    def list(self, request, *args, **kwargs):
+        group = get_object_or_404(Group, id=kwargs['group_id'])
+        user = request.user
+        if user.role != 'HOD/Admin' and not user.is_superuser and not (
+            group.students.filter(id=user.id).exists() or group.teachers.filter(id=user.id).exists()
+        ):
+            return Response({"error": "You are not a member of this group."}, status=status.HTTP_403_FORBIDDEN)
+        self.board = get_ranking()['groups'].get(group.id, {'ranks': {}, 'order': []})
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        top = self.board['order'][:50]
+        profiles = StudentXP.objects.select_related('student').in_bulk(top, field_name='student_id')
+        return [profiles[student_id] for student_id in top if student_id in profiles]
+
+    def get_ranks(self):
+        return self.board['ranks']
+
+
+class MyRankView(APIView):
+    """The signed-in student's overall and per-group rank and percentile."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        standing = student_rank(request.user.id)
+        if standing is None:
+            return Response({"error": "No XP profile yet."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(standing)
 
 class StudentStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -44,7 +89,7 @@ class AvatarUpdateView(APIView):
         if seed:
             xp_profile.avatar_seed = seed
             
-        xp_profile.save()
+        xp_profile.save(update_fields=['avatar_style', 'avatar_seed'])
         
         return Response({
             'message': 'Avatar updated successfully',
@@ -53,73 +98,31 @@ class AvatarUpdateView(APIView):
         })
 
 class ProjectTimeCapsuleView(APIView):
+    """
+    GET /gamification/time-capsule/?limit=200&since=<cursor>
+
+    The student's project timeline, oldest first. Pass X-Latest-Cursor back
+    as `since` to fetch only what happened after it; while X-Has-More is
+    'true' the newest events are still to come, so keep following it.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        # Get the user's active project
+        # Team project, then group project, then own submission (cached per user)
+        project_id, _ = resolve_active_project(user)
+
+        if not project_id:
+            return Response({"events": []})
+
         try:
-            # Assuming one active project for now, or get the latest
-            project = Project.objects.filter(
-                Q(team__members=user) | Q(submission__student=user)
-            ).distinct().first()
-            
-            if not project:
-                return Response({"events": []})
-
-            events = []
-
-            # 1. Project Start
-            events.append({
-                "id": f"start-{project.id}",
-                "date": project.submission.submitted_at,
-                "title": "Project Inception",
-                "description": f"Started working on {project.title}",
-                "type": "START",
-                "icon": "Rocket"
-            })
-
-            # 2. Checkpoints
-            checkpoints = Checkpoint.objects.filter(project=project, is_completed=True)
-            for cp in checkpoints:
-                if cp.date_completed:
-                    events.append({
-                        "id": f"cp-{cp.id}",
-                        "date": cp.date_completed,
-                        "title": f"Milestone: {cp.title}",
-                        "description": cp.description,
-                        "type": "CHECKPOINT",
-                        "icon": "Flag"
-                    })
-
-            # 3. Tasks Completed
-            tasks = Task.objects.filter(project=project, status='Done')
-            for task in tasks:
-                events.append({
-                    "id": f"task-{task.id}",
-                    "date": task.created_at, # Using created_at as completion time isn't always tracked explicitly in simple models, or we could add updated_at
-                    "title": "Task Conquered",
-                    "description": task.title,
-                    "type": "TASK",
-                    "icon": "CheckCircle"
-                })
-
-            # 4. XP Gains (Significant ones)
-            xp_logs = XPLog.objects.filter(student=user, amount__gte=50) # Only show big wins
-            for log in xp_logs:
-                events.append({
-                    "id": f"xp-{log.id}",
-                    "date": log.created_at,
-                    "title": "Level Up Moment",
-                    "description": f"Gained {log.amount} XP: {log.description}",
-                    "type": "ACHIEVEMENT",
-                    "icon": "Trophy"
-                })
-
-            # Sort by date
-            events.sort(key=lambda x: x['date'])
-
-            return Response({"events": events})
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            limit = max(1, min(int(request.query_params.get('limit', 200)), 500))
+        except ValueError:
+            limit = 200
+        events, latest, has_more = timeline_page(project_id, user, request.query_params.get('since'), limit)
+
+        response = Response({"events": events})
+        if latest:
+            response['X-Latest-Cursor'] = latest
+        response['X-Has-More'] = 'true' if has_more else 'false'
+        return response
@@ -0,0 +1,122 @@
+"""
+Precomputed rows behind AnalyticsView and the innovation LeaderboardView.
+
+ProjectRollup keeps project counts per status, category and group;
+InnovationTotal keeps each student's summed innovation score over the
+completed projects they are a team member of. Signals
+(authentication/signals.py) recount only the buckets and users a commit
+touched. `manage.py refresh_analytics` rebuilds everything, for a cron job
+or after bulk `.update()`s that bypass signals.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from authentication.models import Group, Project, ProjectRollup, InnovationTotal
+
+# Rollup dimension -> the Project field it groups by
+DIMENSIONS = {
+    'status': 'status',
+    'category': 'category',
+    'group': 'submission__group',
+}
+
+
+def project_keys(status, category, group_id):
+    """The (dimension, key) buckets one project is counted in."""
+    keys = {('status', status), ('category', category)}
+    if group_id is not None:
+        keys.add(('group', str(group_id)))
+    return keys
+
+
+def _count_buckets(dimension, keys=None):
+    field = DIMENSIONS[dimension]
+    projects = Project.objects.filter(**{f'{field}__isnull': False})
+    if keys is not None:
+        projects = projects.filter(**{f'{field}__in': keys})
+    rows = projects.order_by().values(field).annotate(n=Count('id'))
+    return {str(row[field]): row['n'] for row in rows}
+
+
+def _labels(counts):
+    group_ids = [key for dimension, key in counts if dimension == 'group']
+    names = {str(pk): name for pk, name in Group.objects.filter(id__in=group_ids).values_list('id', 'name')}
+    return {
+        (dimension, key): names.get(key, '') if dimension == 'group' else key
+        for dimension, key in counts
+    }
+
+
+def refresh_project_rollups(keys=None):
+    """Recounts the given (dimension, key) buckets, or rebuilds every row when keys is None."""
+    if keys is None:
+        counts = {
+            (dimension, key): n
+            for dimension in DIMENSIONS
+            for key, n in _count_buckets(dimension).items()
+        }
+        labels = _labels(counts)
+        with transaction.atomic():
+            ProjectRollup.objects.all().delete()
+            ProjectRollup.objects.bulk_create([
+                ProjectRollup(dimension=dimension, key=key, label=labels[(dimension, key)], count=n)
+                for (dimension, key), n in counts.items()
+            ])
+        return
+
+    by_dimension = defaultdict(set)
+    for dimension, key in keys:
+        by_dimension[dimension].add(key)
+    counts = {}
+    for dimension, dim_keys in by_dimension.items():
+        found = _count_buckets(dimension, dim_keys)
+        counts.update({(dimension, key): found.get(key, 0) for key in dim_keys})
+    labels = _labels(counts)
+
+    with transaction.atomic():
+        for (dimension, key), n in counts.items():
+            if n:
+                ProjectRollup.objects.update_or_create(
+                    dimension=dimension, key=key,
+                    defaults={'count': n, 'label': labels[(dimension, key)]}
+                )
+            else:
+                ProjectRollup.objects.filter(dimension=dimension, key=key).delete()
+
+
+def refresh_innovation_totals(user_ids=None):
+    """Recomputes the innovation totals of the given users, or of everyone when user_ids is None."""
+    completed = Project.objects.filter(status='Completed', submission__innovation_score__isnull=False)
+    if user_ids is not None:
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        completed = completed.filter(team__members__in=user_ids)
+
+    rows = completed.order_by().values('team__members').annotate(
+        total=Sum('submission__innovation_score'),
+        projects=Count('id'),
+    )
+    totals = {row['team__members']: row for row in rows if row['team__members'] is not None}
+
+    with transaction.atomic():
+        if user_ids is None:
+            InnovationTotal.objects.all().delete()
+            InnovationTotal.objects.bulk_create([
+                InnovationTotal(user_id=user_id, total=row['total'], completed_projects=row['projects'])
+                for user_id, row in totals.items()
+            ])
+            return
+
+        InnovationTotal.objects.filter(user_id__in=user_ids).exclude(user_id__in=list(totals)).delete()
+        for user_id, row in totals.items():
+            InnovationTotal.objects.update_or_create(
+                user_id=user_id,
+                defaults={'total': row['total'], 'completed_projects': row['projects']}
+            )
+
+
+def rename_group(group):
+    ProjectRollup.objects.filter(dimension='group', key=str(group.id)).update(label=group.name)
@@ -13,4 +13,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
 
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Serve with an ASGI server (uvicorn) so /realtime/stream/ can hold many
+# Server-Sent Event connections open without tying up a thread each.
 application = get_asgi_application()
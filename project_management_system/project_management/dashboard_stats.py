@@ -0,0 +1,130 @@
+"""
+Teacher dashboard counters, computed in one query and cached per teacher.
+
+Each counter is cached on its own under a version stamp of its own. Signals
+(authentication/signals.py) bump, after the commit, only the stamps of the
+counters a change can move (STATS_AFFECTED_BY): a new viva session orphans
+every teacher's `vivas_scheduled` and nothing else. A request then recomputes
+just the counters that are missing, still in one query. Stamps are global, so
+the "unappointed projects" counter, which is global too, stays correct for
+everyone.
+
+Staleness: with a shared cache (REDIS_URL, see settings) a write anywhere,
+run_workers included, invalidates on commit. With the default per-process
+local-memory cache a write only invalidates the process that made it, so other
+processes may serve a counter up to STATS_TTL old. The TTL also covers what no
+signal sees: assignments expiring with time.
+"""
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from authentication.models import User, Project, ProjectSubmission, TimedAssignment, VivaSession
+
+STATS_TTL = 60 # seconds
+STAT_NAMES = ['pending_approvals', 'active_projects', 'active_assignments', 'vivas_scheduled', 'unappointed_ongoing']
+
+# Counters a saved/deleted row of each model can change, and the fields whose
+# update can change them (saves with other update_fields leave the counters alone)
+STATS_AFFECTED_BY = {
+    'ProjectSubmission': (
+        {'group', 'status'},
+        ['pending_approvals', 'active_projects', 'vivas_scheduled', 'unappointed_ongoing'],
+    ),
+    'Project': (
+        {'status', 'submission'},
+        ['pending_approvals', 'active_projects', 'vivas_scheduled', 'unappointed_ongoing'],
+    ),
+    'VivaSession': ({'project'}, ['vivas_scheduled']),
+    'TimedAssignment': ({'created_by', 'start_time', 'end_time'}, ['active_assignments']),
+}
+# Counters that depend on which teachers a group has
+GROUP_TEACHER_STATS = ['pending_approvals', 'active_projects', 'vivas_scheduled', 'unappointed_ongoing']
+
+
+def _count(queryset, distinct=False):
+    """Scalar COUNT subquery (NULL-safe) so several counts share one SELECT."""
+    counted = (
+        queryset.order_by()
+        .annotate(_one=Value(1, output_field=IntegerField())).values('_one')
+        .annotate(n=Count('id', distinct=distinct)).values('n')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _compute(user, names=STAT_NAMES):
+    teacher_groups = user.teaching_groups.values('id')
+
+    # Groups that ALREADY have an active or completed project
+    groups_with_projects = Project.objects.filter(
+        status__in=['In Progress', 'Completed'],
+        submission__group__isnull=False
+    ).values('submission__group_id')
+
+    now = timezone.now()
+    counts = {
+        # Pending Approvals: only submissions from groups that DON'T have a project yet
+        'pending_approvals': _count(
+            ProjectSubmission.objects.filter(group__in=teacher_groups, status='Submitted')
+            .exclude(group_id__in=groups_with_projects)
+        ),
+        'active_projects': _count(
+            Project.objects.filter(submission__group__in=teacher_groups, status='In Progress')
+        ),
+        # Strictly those created by THIS teacher
+        'active_assignments': _count(
+            TimedAssignment.objects.filter(created_by=user, start_time__lte=now, end_time__gte=now)
+        ),
+        'vivas_scheduled': _count(
+            VivaSession.objects.filter(project__submission__group__in=teacher_groups)
+        ),
+        'unappointed_ongoing': _count(
+            Project.objects.filter(submission__group__teachers__isnull=True, status='In Progress'),
+            distinct=True
+        ),
+    }
+    # The teacher's own row just carries the scalar subqueries; prefixed
+    # aliases keep them clear of User fields (User.active_projects exists)
+    row = User.objects.filter(pk=user.pk).annotate(
+        **{f'stat_{name}': counts[name] for name in names}
+    ).values(*[f'stat_{name}' for name in names]).get()
+    return {name: row[f'stat_{name}'] for name in names}
+
+
+def _version_key(name):
+    return f'teacher_stats:version:{name}'
+
+
+def _versions():
+    keys = {name: _version_key(name) for name in STAT_NAMES}
+    found = cache.get_many(keys.values())
+    missing = {key: 1 for key in keys.values() if key not in found}
+    if missing:
+        for key in missing:
+            cache.add(key, 1, None)
+        found.update(cache.get_many(missing))
+    return {name: found.get(key, 1) for name, key in keys.items()}
+
+
+def teacher_dashboard_stats(user):
+    versions = _versions()
+    keys = {name: f"teacher_stats:{name}:{versions[name]}:{user.id}" for name in STAT_NAMES}
+    cached = cache.get_many(keys.values())
+    stats = {name: cached[key] for name, key in keys.items() if key in cached}
+
+    stale = [name for name in STAT_NAMES if name not in stats]
+    if stale:
+        fresh = _compute(user, stale)
+        cache.set_many({keys[name]: value for name, value in fresh.items()}, STATS_TTL)
+        stats.update(fresh)
+    return {name: stats[name] for name in STAT_NAMES}
+
+
+def bump_stats_version(names=STAT_NAMES):
+    """Orphans every teacher's cached value of the given counters."""
+    for name in names:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError: # key missing/evicted: any fresh value orphans old entries
+            cache.set(_version_key(name), int(timezone.now().timestamp()), None)
@@ -0,0 +1,55 @@
+import requests
+from django.core.management.base import BaseCommand
+from authentication.models import ProgressUpdate
+
+SENTIMENT_BATCH_URL = "http://127.0.0.1:8001/sentiment:batch"
+
+class Command(BaseCommand):
+    help = 'Fill in missing ProgressUpdate sentiment using the AI microservice batch endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Progress updates per request')
+        parser.add_argument('--all', action='store_true', help='Re-score updates that already have a sentiment')
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+
+        queryset = ProgressUpdate.objects.order_by('id')
+        if not kwargs['all']:
+            queryset = queryset.filter(sentiment__isnull=True)
+
+        total = queryset.count()
+        self.stdout.write(f"Scoring sentiment for {total} progress updates...")
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).only('id', 'update_text')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            try:
+                response = requests.post(
+                    SENTIMENT_BATCH_URL,
+                    json={"texts": [u.update_text for u in batch]},
+                    timeout=120
+                )
+            except requests.ConnectionError:
+                self.stdout.write(self.style.ERROR("Could not connect to AI microservice at port 8001."))
+                return
+
+            results = response.json().get('results') if response.status_code == 200 else None
+            if not results:
+                self.stdout.write(self.style.WARNING(f"Batch ending at ID {last_id} failed: {response.text[:200]}"))
+                continue
+
+            to_save = []
+            for update, result in zip(batch, results):
+                if result.get('sentiment'):
+                    update.sentiment = result['sentiment']
+                    to_save.append(update)
+            ProgressUpdate.objects.bulk_update(to_save, ['sentiment'])
+            updated += len(to_save)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated sentiment on {updated} progress updates."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from project_management.analytics_rollups import refresh_project_rollups, refresh_innovation_totals
+from authentication.models import ProjectRollup, InnovationTotal
+
+class Command(BaseCommand):
+    help = 'Rebuild the analytics rollups (project counts per status/category/group, innovation totals per student)'
+
+    def handle(self, *args, **kwargs):
+        # Signals keep these current; run from cron to repair anything bulk updates skipped
+        refresh_project_rollups()
+        refresh_innovation_totals()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {ProjectRollup.objects.count()} project rollups and "
+            f"{InnovationTotal.objects.count()} innovation totals."
+        ))
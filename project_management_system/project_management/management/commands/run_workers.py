@@ -0,0 +1,102 @@
+import os
+import socket
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from authentication import tasks
+from project_management import realtime
+
+class Command(BaseCommand):
+    help = 'Run the background task workers (AI verification, report grading)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker threads (max concurrent tasks)')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the due tasks and exit')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and exit')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['stats']:
+            self._print_depth()
+            return
+
+        self._sweep_stale()
+
+        num_workers = max(1, kwargs['workers'])
+        stop = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self._worker_loop,
+                args=(f"{prefix}:{i}", stop, kwargs['poll_interval'], kwargs['once']),
+                daemon=True,
+            )
+            for i in range(num_workers)
+        ]
+
+        if settings.REALTIME_BROKER.endswith('.InMemoryBroker'):
+            # Task results can't reach streams in the web process; clients see them on their next fetch
+            self.stdout.write(self.style.WARNING("Realtime pushes from workers need REDIS_URL (RedisBroker)."))
+        self.stdout.write(f"Starting {num_workers} workers...")
+        self._print_depth()
+        for t in threads:
+            t.start()
+
+        try:
+            last_report = last_sweep = time.monotonic()
+            while any(t.is_alive() for t in threads):
+                time.sleep(1)
+                if time.monotonic() - last_sweep >= tasks.STALE_SWEEP_INTERVAL:
+                    # Catches tasks of workers in other processes that died
+                    self._sweep_stale()
+                    last_sweep = time.monotonic()
+                if time.monotonic() - last_report >= 60:
+                    self._print_depth()
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers (waiting for running tasks)...")
+            stop.set()
+            for t in threads:
+                t.join()
+
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
+
+    def _worker_loop(self, worker_id, stop, poll_interval, once):
+        try:
+            while not stop.is_set():
+                # Each worker thread owns a DB connection; drop it if it went stale.
+                close_old_connections()
+                bg_task = tasks.claim_next_task(worker_id)
+                if bg_task is None:
+                    if once:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+
+                if tasks.run_task(bg_task):
+                    self.stdout.write(f"[{worker_id}] {bg_task} done")
+                else:
+                    self.stdout.write(self.style.WARNING(f"[{worker_id}] {bg_task.name} #{bg_task.id} failed: {bg_task.last_error}"))
+        finally:
+            connection.close()
+
+    def _sweep_stale(self):
+        close_old_connections()
+        requeued, failed = tasks.requeue_stale_tasks()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Re-queued {requeued} stale task(s)."))
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Failed {failed} stale task(s) that were out of attempts."))
+        # Relayed realtime events (DatabaseBroker) are only needed for a few minutes
+        realtime.prune_events()
+
+    def _print_depth(self):
+        close_old_connections()
+        depth = tasks.queue_depth()
+        self.stdout.write(
+            f"Queue: {depth['queued']} queued, {depth['running']} running, "
+            f"{depth['failed']} failed, oldest wait {depth['oldest_wait_seconds']}s "
+            f"{depth['queued_by_task'] or ''}"
+        )
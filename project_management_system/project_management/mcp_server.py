@@ -2,6 +2,8 @@ from mcp.server.fastmcp import FastMCP
 from authentication.models import Project, User, ProgressUpdate, VivaSession, Task, TimedAssignment, AssignmentSubmission, ProjectSubmission, CodeReview, Group, Team, ProjectArtifact, VivaQuestion
 from django.db.models import Avg
 import json
+from .utils import get_project_context
+from authentication.active_project import active_project
 
 # Initialize the MCP Server (scoped to Django)
 mcp = FastMCP("Django PMS Data")
@@ -25,18 +27,8 @@ def get_student_project_context(student_username: str) -> str:
         if not user:
             return "Error: Student not found."
 
-        # 1. Prioritize Team Projects
-        project = Project.objects.filter(team__members=user).last()
-        
-        # 2. Fallback: Group Projects
-        if not project:
-            project = Project.objects.filter(submission__group__students=user).last()
-            
-        if not project:
-             # 3. Fallback: Approved Submissions
-             submission = user.submissions.filter(status='Approved').last()
-             if submission and hasattr(submission, 'project'):
-                 project = submission.project
+        # Team project, then group project, then own submission (cached per user)
+        project = active_project(user)
 
         if not project:
             return "No active project found for this student."
@@ -211,9 +203,7 @@ def get_pending_tasks(student_username: str) -> str:
         if not user: return "Error: Student not found."
         
         # Determine active project
-        project = Project.objects.filter(team__members=user).last()
-        if not project:
-             project = Project.objects.filter(submission__group__students=user).last()
+        project = active_project(user)
              
         if not project:
             return "No active project found to list tasks."
@@ -317,15 +307,7 @@ def get_project_audit(student_username: str) -> str:
         user = User.objects.filter(username=student_username).first()
         if not user: return "Error: Student not found."
         
-        project = Project.objects.filter(team__members=user).last()
-        if not project:
-            project = Project.objects.filter(submission__group__students=user).last()
-            
-        if not project:
-            # Fallback: Check submission directly
-            submission = user.submissions.filter(status='Approved').last()
-            if submission and hasattr(submission, 'project'):
-                 project = submission.project
+        project = active_project(user)
 
         if not project:
             return "No active project found."
@@ -354,7 +336,7 @@ def get_group_details(student_username: str) -> str:
         
         # Fallback: Check project's group if student_groups relation is not set
         if not group:
-             project = Project.objects.filter(submission__student=user).last()
+             project = active_project(user)
              if project and project.submission.group:
                  group = project.submission.group
                   
@@ -399,8 +381,7 @@ def get_project_artifacts(student_username: str) -> str:
     """
     try:
         user = User.objects.filter(username=student_username).first()
-        project = Project.objects.filter(team__members=user).last()
-        if not project: project = Project.objects.filter(submission__group__students=user).last()
+        project = active_project(user) if user else None
         
         if not project: return "No project found."
         
@@ -419,3 +400,23 @@ def get_project_artifacts(student_username: str) -> str:
         return json.dumps(art_list, indent=2)
     except Exception as e:
         return f"Error fetching artifacts: {str(e)}"
+
+@register_tool
+def get_full_project_report(student_username: str) -> str:
+    """
+    Returns the complete stored context for the student's project in one call:
+    overview, team, progress logs, viva history, artifacts, report critique and code reviews.
+    Read from the project's context snapshot (kept current by signals), so it is a single row lookup.
+    """
+    try:
+        user = User.objects.filter(username=student_username).first()
+        if not user: return "Error: Student not found."
+
+        project = active_project(user)
+
+        if not project:
+            return "No active project found."
+
+        return get_project_context(project)
+    except Exception as e:
+        return f"Error fetching project report: {str(e)}"
@@ -8,9 +8,7 @@ def get_project_audit(student_username: str) -> str:
         user = User.objects.filter(username=student_username).first()
         if not user: return "Error: Student not found."
         
-        project = Project.objects.filter(team__members=user).last()
-        if not project:
-            project = Project.objects.filter(submission__group__students=user).last()
+        project = active_project(user)
             
         if not project:
             return "No active project found."
@@ -61,8 +59,7 @@ def get_project_artifacts(student_username: str) -> str:
     """
     try:
         user = User.objects.filter(username=student_username).first()
-        project = Project.objects.filter(team__members=user).last()
-        if not project: project = Project.objects.filter(submission__group__students=user).last()
+        project = active_project(user) if user else None
         
         if not project: return "No project found."
         
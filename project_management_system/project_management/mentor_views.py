@@ -1,10 +1,11 @@
-from .utils import _build_project_context
+from .utils import get_project_context
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
 import requests
 from authentication.models import Project, VivaSession, AssignmentSubmission, ProgressUpdate
+from authentication.active_project import active_project
 from gamification.models import StudentXP
 
 
@@ -22,24 +23,8 @@ class ProjectMentorChatView(APIView):
         # 1. Fetch Project Context
         project = None
         try:
-            # 1. Prioritize Projects where user is a Team Member
-            project = Project.objects.filter(team__members=user).last()
-            
-            # 2. Fallback: Projects where user is in the Group
-            if not project:
-                project = Project.objects.filter(submission__group__students=user).last()
-
-            # 3. Fallback: Direct approved submission
-            if not project:
-                submission = user.submissions.filter(status='Approved').last()
-                if submission and hasattr(submission, 'project'):
-                    project = submission.project
-            
-            # 4. Final Fallback: Any submission
-            if not project:
-                 submission = user.submissions.last()
-                 if submission and hasattr(submission, 'project'):
-                     project = submission.project
+            # Team project, then group project, then own submission (cached per user)
+            project = active_project(user)
 
             if not project:
                 return Response({"response": "I couldn't find an active project linked to your account. Please create or join a project first."}, status=200)
@@ -47,11 +32,12 @@ class ProjectMentorChatView(APIView):
         except Exception as e:
             return Response({"error": f"Error fetching project: {str(e)}"}, status=500)
 
-        # 2. Call AI Microservice (MCP Endpoint)
+        # 2. Call AI Microservice (MCP Endpoint) with the stored project context
         try:
             payload = {
                 "student_username": user.username,
-                "user_message": user_message
+                "user_message": user_message,
+                "project_context": get_project_context(project),
             }
             # Note: Port 8001 is the AI Microservice
             response = requests.post("http://127.0.0.1:8001/mcp-chat", json=payload, timeout=60)
@@ -132,6 +118,9 @@ class ProjectMentorChatMCPView(APIView):
                  "student_username": user.username,
                  # "github_repo_link": ... (optional, can be added later)
              }
+             project = active_project(user)
+             if project:
+                 payload["project_context"] = get_project_context(project)
              
              # We assume requests is imported
              response = requests.post(MICROSERVICE_URL, json=payload, timeout=30)
@@ -198,7 +187,8 @@ class TeacherChatMCPView(APIView):
              MICROSERVICE_URL = "http://127.0.0.1:8001/mcp-teacher-chat"
              payload = {
                  "student_username": student_username,
-                 "user_message": message
+                 "user_message": message,
+                 "project_context": get_project_context(project),
              }
              
              response = requests.post(MICROSERVICE_URL, json=payload, timeout=60)
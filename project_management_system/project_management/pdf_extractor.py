@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pypdf
+from django.core.cache import cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# PDFs up to this many pages are read in-process; pool start-up isn't worth it.
+SERIAL_PAGE_LIMIT = 8
+# Pages handed to a worker process per job.
+PAGES_PER_JOB = 8
+EXTRACT_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+# Extracted text is cached by the file's SHA-256 (same bytes -> same text).
+CACHE_TIMEOUT = 7 * 24 * 3600
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # 'spawn' so workers don't inherit the web server's threads/DB sockets
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _pool
+
+
+def _extract_page_range(path, start, end):
+    """Runs in a worker process: returns the text of pages [start, end)."""
+    reader = pypdf.PdfReader(path)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _as_path(source):
+    """
+    Yields a filesystem path for `source`: a path string, a FieldFile
+    (project.final_report) or an uploaded file. In-memory uploads are spooled
+    to a temp file since worker processes need something they can open.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield str(source)
+        return
+    if hasattr(source, 'temporary_file_path'):
+        yield source.temporary_file_path()
+        return
+    try:
+        path = source.path
+    except (AttributeError, NotImplementedError):
+        path = None
+    if path:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        source.seek(0)
+        shutil.copyfileobj(source, tmp)
+        tmp_path = tmp.name
+    try:
+        yield tmp_path
+    finally:
+        source.seek(0)
+        os.remove(tmp_path)
+
+
+def iter_pdf_pages(path):
+    """
+    Yields the text of each page in order.
+    Long documents are split into page ranges extracted in parallel by a
+    process pool; at most EXTRACT_WORKERS ranges are in flight, so a caller
+    that stops iterating early leaves little wasted work behind.
+    """
+    reader = pypdf.PdfReader(path)
+    page_count = len(reader.pages)
+
+    if page_count <= SERIAL_PAGE_LIMIT:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    ranges = [(start, min(start + PAGES_PER_JOB, page_count)) for start in range(0, page_count, PAGES_PER_JOB)]
+    try:
+        pool = _get_pool()
+    except Exception as e:
+        logger.warning(f"PDF process pool unavailable, extracting serially: {e}")
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    pending = []
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < EXTRACT_WORKERS:
+                start, end = ranges[next_range]
+                pending.append(pool.submit(_extract_page_range, path, start, end))
+                next_range += 1
+            for text in pending.pop(0).result():
+                yield text
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def extract_pdf_text(source, max_chars=None):
+    """
+    Returns the text of a PDF (path, FieldFile or uploaded file).
+    With `max_chars`, extraction stops once that much text has been read;
+    only complete extractions are cached.
+    """
+    with _as_path(source) as path:
+        cache_key = f"pdf_text:{file_sha256(path)}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached[:max_chars] if max_chars else cached
+
+        pages = []
+        length = 0
+        complete = True
+        pages_iter = iter_pdf_pages(path)
+        try:
+            for text in pages_iter:
+                pages.append(text)
+                length += len(text) + 1
+                if max_chars and length >= max_chars:
+                    complete = False
+                    break
+        finally:
+            pages_iter.close()
+
+    extracted_text = "\n".join(pages)
+    if complete:
+        cache.set(cache_key, extracted_text, CACHE_TIMEOUT)
+    return extracted_text[:max_chars] if max_chars else extracted_text
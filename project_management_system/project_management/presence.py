@@ -0,0 +1,56 @@
+"""
+Ephemeral "who is typing" presence, kept in the cache instead of the database.
+
+Each project has one cache entry, {user_id: [username, expires_at]}, so a read
+is a single cache get. Entries expire TYPING_TTL seconds after the last
+keystroke; the cache key itself expires too, so idle projects cost nothing.
+With the default local-memory cache this is per process; point CACHES at a
+shared backend (Redis/Memcached) to share presence across workers.
+
+Updates are read-modify-write without a lock: a concurrent update can drop
+someone's indicator, but only until their next keystroke (well within the TTL).
+
+Only project members may read or write a project's indicators. That check is
+cached per user and project for MEMBERSHIP_TTL seconds, so keystrokes and
+polls don't query the database; someone removed from a project can still see
+indicators until the entry expires.
+"""
+import time
+
+from django.core.cache import cache
+
+from authentication.membership import project_membership
+
+TYPING_TTL = 3 # seconds
+MEMBERSHIP_TTL = 60 # seconds
+
+
+def _key(project_id):
+    return f"presence:typing:{project_id}"
+
+
+def _live(entries, now):
+    return {uid: entry for uid, entry in entries.items() if entry[1] > now}
+
+
+def mark_typing(project_id, user_id, username):
+    now = time.time()
+    entries = _live(cache.get(_key(project_id)) or {}, now)
+    entries[user_id] = [username, now + TYPING_TTL]
+    cache.set(_key(project_id), entries, TYPING_TTL + 1)
+
+
+def typing_users(project_id, exclude_user_id=None):
+    """Usernames typing in the project within the last TYPING_TTL seconds."""
+    entries = _live(cache.get(_key(project_id)) or {}, time.time())
+    return [username for uid, (username, _) in entries.items() if uid != exclude_user_id]
+
+
+def can_use_typing(request, project_id):
+    """project_membership(...).any for the request user, cached per user and project."""
+    key = f"presence:member:{request.user.pk}:{project_id}"
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed = project_membership(request, project_id).any
+        cache.set(key, allowed, MEMBERSHIP_TTL)
+    return allowed
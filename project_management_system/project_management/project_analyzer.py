@@ -16,6 +16,8 @@ from django.conf import settings
 
 # import ollama  # local fallback chat
 from project_management.utils import clone_and_read_repo # Import the local utility
+from project_management.pdf_extractor import extract_pdf_text
+from project_management.report_grader import ReportGrader
 
 from groq import Groq
 import requests
@@ -25,6 +27,9 @@ import numpy as np # efficient math
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Longest chatbot prompt sent to the providers (Groq rejects larger ones with 413)
+CHAT_PROMPT_CHARS = 24000
+
 class ProjectAnalyzer:
     def __init__(self):
         # Load the pool of keys
@@ -732,10 +737,11 @@ Output JSON:
     # Chatbot / Conversational / Mentor
     # -----------------------
     def get_chat_response(self, prompt, context="", conversation_history=None):
-        full_prompt = f"""
+        header = """
 You are a helpful Project Guide Assistant.
 Context Info:
-{context}
+"""
+        footer = f"""
 
 User Query: {prompt}
 
@@ -744,9 +750,12 @@ Instructions:
 2. If the user asks about the team, look at the Context Info.
 3. Answer concisely and helpfuly.
 """
-        # GLOBAL SAFETY NET: Truncate to ~24k chars to prevent Groq 413
-        if len(full_prompt) > 24000:
-             full_prompt = full_prompt[:24000] + "\n... (Truncated for AI Safety)"
+        # GLOBAL SAFETY NET: keep the prompt under ~24k chars to prevent Groq 413.
+        # Only the context is cut, so the user's question always gets through.
+        room = max(CHAT_PROMPT_CHARS - len(header) - len(footer), 0)
+        if len(context) > room:
+            context = context[:room] + "\n... (Truncated for AI Safety)"
+        full_prompt = header + context + footer
 
         # Switch back to Groq First as requested to save Gemini quota
         response = self._ask_ai_with_fallback(full_prompt, "Chatbot")
@@ -946,32 +955,40 @@ Output JSON:
 
     def grade_final_report(self, file_path):
         """
-        Analyzes project documentation using Gemini's native PDF handling.
+        Grades project documentation with a map-reduce pass over the full text
+        (see report_grader.ReportGrader); nothing is truncated. A PDF with no
+        extractable text is sent to Gemini as a file instead.
+        Extraction and AI errors propagate so the grade_final_report task can
+        retry them.
         """
-        extracted_text = ""
-        try:
-            # Still try simple text extraction for database storage
-            reader = pypdf.PdfReader(file_path)
-            for page in reader.pages:
-                extracted_text += (page.extract_text() or "") + "\n"
-        except Exception:
-            extracted_text = "Could not extract raw text."
-
-        try:
-            uploaded_file = genai.upload_file(file_path)
-            
-            # Wait for processing
-            start_time = time.time()
-            while uploaded_file.state.name == "PROCESSING":
-                if time.time() - start_time > 20: # Timeout
-                    raise TimeoutError("Gemini PDF processing timed out")
-                time.sleep(1)
-                uploaded_file = genai.get_file(uploaded_file.name)
-
-            if uploaded_file.state.name == "FAILED":
-                raise ValueError("Gemini failed to process PDF")
-
-            prompt = """
+        # Text extraction is cached by file hash
+        extracted_text = extract_pdf_text(file_path)
+
+        if not extracted_text.strip():
+            # Scanned or image-only PDF: let Gemini read the pages itself
+            if not self.api_keys:
+                return {"feedback": "Analysis failed: no text could be extracted from the PDF.", "content": extracted_text}
+            return self._grade_pdf_natively(file_path)
+
+        result = ReportGrader(self).grade(extracted_text)
+        return {"feedback": result["feedback"], "scores": result["scores"], "content": extracted_text}
+
+    def _grade_pdf_natively(self, file_path):
+        """Grades a PDF with no text layer by uploading it to Gemini's native PDF handling."""
+        uploaded_file = self.client.files.upload(file=file_path)
+
+        # Wait for processing
+        start_time = time.time()
+        while uploaded_file.state.name == "PROCESSING":
+            if time.time() - start_time > 20: # Timeout
+                raise TimeoutError("Gemini PDF processing timed out")
+            time.sleep(1)
+            uploaded_file = self.client.files.get(name=uploaded_file.name)
+
+        if uploaded_file.state.name == "FAILED":
+            raise ValueError("Gemini failed to process PDF")
+
+        prompt = """
 You are a Senior Technical Lead. Review this Project Documentation PDF.
 Output JSON:
 {
@@ -979,16 +996,16 @@ Output JSON:
     "scores": { "completeness": 0, "accuracy": 0, "presentation": 0 }
 }
 """
-            response = self.llm_model.generate_content([prompt, uploaded_file])
-            data = self._extract_json(response.text)
-            
-            feedback = data.get("feedback", response.text) if data else response.text
-            
-            return {"feedback": feedback, "content": extracted_text[:50000]} # Truncate for DB limits
-            
-        except Exception as e:
-            logger.error(f"Error analyzing PDF: {e}")
-            return {"feedback": f"Analysis failed: {str(e)}", "content": extracted_text}
+        response = self.client.models.generate_content(
+            model='gemini-flash-latest',
+            contents=[prompt, uploaded_file]
+        )
+        data = self._extract_json(response.text) or {}
+        return {
+            "feedback": data.get("feedback", response.text),
+            "scores": data.get("scores", {}),
+            "content": "",
+        }
 
     # -----------------------
     # Audio transcription
@@ -0,0 +1,239 @@
+"""
+Realtime event fan-out for the SSE stream (see realtime_views.py).
+
+Code anywhere in Django calls `publish(topic, event, data)`; every open stream
+subscribed to that topic receives the event. Topics in use:
+
+    user:<id>       chat messages, DMs and background task results for one user
+    project:<id>    project-wide events (typing, report grading)
+
+The default InMemoryBroker only reaches streams in the publishing process,
+which is enough for a single web process. Background tasks run in
+`manage.py run_workers`, a separate process, and several web processes need
+each other's events too: multi-process deployments set REDIS_URL, and
+settings then pick RedisBroker, where every process relays Redis pub/sub into
+its own in-memory subscribers. DatabaseBroker is a fallback for sites that
+cannot run Redis; it is opt-in through the REALTIME_BROKER setting.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Events buffered per stream before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, topics, loop):
+        self.topics = set(topics)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when events were dropped; the stream then asks the client to refetch
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class InMemoryBroker:
+    """Topic -> subscriptions map shared by all streams in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        subscription = Subscription(topics, asyncio.get_running_loop())
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers[topic].discard(subscription)
+                if not self._subscribers[topic]:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, event):
+        # Called from request threads: hand the event to each stream's own loop
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Loop already closed: the stream is going away
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(InMemoryBroker):
+    """Cross-process broker: publishes go through Redis, a listener thread relays them locally."""
+
+    CHANNEL_PREFIX = 'realtime:'
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the 'redis' package.")
+        url = getattr(settings, 'REALTIME_BROKER_URL', 'redis://localhost:6379/0')
+        self._redis = redis.Redis.from_url(url)
+        self._listener = threading.Thread(target=self._listen, daemon=True, name='realtime-redis')
+        self._listener.start()
+
+    def publish(self, topic, event):
+        self._redis.publish(self.CHANNEL_PREFIX + topic, json.dumps(event))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.CHANNEL_PREFIX + '*')
+                for message in pubsub.listen():
+                    topic = message['channel'].decode()[len(self.CHANNEL_PREFIX):]
+                    super().publish(topic, json.loads(message['data']))
+            except Exception as e:
+                logger.warning(f"Realtime Redis listener dropped, reconnecting: {e}")
+                time.sleep(2)
+
+
+class DatabaseBroker(InMemoryBroker):
+    """
+    Cross-process broker needing nothing but the database: publishes are rows,
+    and a process with open streams polls for new rows and relays them locally.
+    Latency is up to POLL_INTERVAL. Typing events never touch the table; they
+    only reach streams in the publishing process. run_workers deletes rows
+    older than RETENTION (see prune_events).
+    """
+
+    POLL_INTERVAL = 1 # seconds
+    RETENTION = 300 # seconds a row is kept
+    # Rows are re-read this far back, so one committed after a higher id is still relayed
+    REORDER_WINDOW = 5 # seconds
+    # Per-keystroke events, too frequent to write a row for
+    LOCAL_EVENTS = {'typing'}
+
+    def __init__(self):
+        super().__init__()
+        # Ids relayed within the window -> created_at; None until the first poll
+        self._seen = None
+        self._listener = None
+
+    def subscribe(self, topics):
+        subscription = super().subscribe(topics)
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True, name='realtime-db')
+                self._listener.start()
+        return subscription
+
+    def publish(self, topic, event):
+        if event.get('event') in self.LOCAL_EVENTS:
+            super().publish(topic, event)
+            return
+        from authentication.models import RealtimeEvent
+        RealtimeEvent.objects.create(topic=topic, payload=event)
+
+    def relay_new_events(self):
+        """Hands rows published since the previous call to local streams; returns how many."""
+        from authentication.models import RealtimeEvent
+        cutoff = timezone.now() - timedelta(seconds=self.REORDER_WINDOW)
+        events = list(
+            RealtimeEvent.objects.filter(created_at__gte=cutoff).order_by('id')
+            .values_list('id', 'topic', 'payload', 'created_at')
+        )
+        if self._seen is None:
+            # Start from the tail: new streams don't replay old events
+            self._seen = {event_id: created_at for event_id, _, _, created_at in events}
+            return 0
+
+        relayed = 0
+        for event_id, topic, payload, created_at in events:
+            if event_id not in self._seen:
+                self._seen[event_id] = created_at
+                super().publish(topic, payload)
+                relayed += 1
+        # Rows older than the window are no longer read, so they can be forgotten
+        self._seen = {event_id: created_at for event_id, created_at in self._seen.items() if created_at >= cutoff}
+        return relayed
+
+    def _listen(self):
+        while True:
+            if self._subscribers:
+                try:
+                    self.relay_new_events()
+                except Exception as e:
+                    logger.warning(f"Realtime database relay failed, retrying: {e}")
+                    connection.close()
+            else:
+                # Nobody listening: skip the queries, resume from the tail later
+                self._seen = None
+            time.sleep(self.POLL_INTERVAL)
+
+
+def prune_events():
+    """Deletes RealtimeEvent rows past DatabaseBroker.RETENTION; returns how many."""
+    from authentication.models import RealtimeEvent
+    cutoff = timezone.now() - timedelta(seconds=DatabaseBroker.RETENTION)
+    deleted, _ = RealtimeEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'REALTIME_BROKER', 'project_management.realtime.InMemoryBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(topic, event, data):
+    """
+    Sends `event` with JSON-serializable `data` to every stream on `topic`.
+    Inside a transaction the event waits for the commit, so clients never
+    hear about rows they can't read yet.
+    """
+    payload = {'event': event, 'data': data, 'ts': time.time()}
+
+    def send():
+        try:
+            get_broker().publish(topic, payload)
+        except Exception as e:
+            # Realtime is best effort; clients still catch up with ?since= fetches
+            logger.warning(f"Realtime publish to {topic} failed: {e}")
+
+    transaction.on_commit(send)
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+def project_topic(project_id):
+    return f"project:{project_id}"
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from authentication.models import Project
+from authentication.tokens import ClaimsJWTAuthentication
+from .realtime import get_broker, user_topic, project_topic
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Comment line sent on idle streams so proxies don't time them out
+HEARTBEAT_SECONDS = 15
+
+
+def _authenticate(request):
+    """
+    EventSource can't set headers, so the JWT access token may come as
+    ?token=...; an Authorization header works too.
+    """
+    auth = ClaimsJWTAuthentication()
+    try:
+        raw_token = request.GET.get('token')
+        if raw_token:
+            return auth.get_claims_user(auth.get_validated_token(raw_token))
+        result = auth.authenticate(request)
+        return result[0] if result else None
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _allowed_project_ids(user, requested_ids):
+    if not requested_ids:
+        return []
+    projects = Project.objects.filter(id__in=requested_ids)
+    if user.role != 'HOD/Admin' and not user.is_superuser:
+        projects = projects.filter(
+            Q(team__members=user) |
+            Q(submission__student=user) |
+            Q(submission__group__students=user) |
+            Q(submission__group__teachers=user)
+        )
+    return list(projects.values_list('id', flat=True).distinct())
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _event_stream(topics):
+    broker = get_broker()
+    subscription = broker.subscribe(topics)
+    try:
+        yield "retry: 3000\n\n"
+        yield _sse('ready', {'topics': sorted(topics)})
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if subscription.overflowed:
+                # Events were dropped for a slow client: tell it to refetch with ?since=
+                subscription.overflowed = False
+                yield _sse('resync', {})
+            yield _sse(event['event'], event['data'])
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def realtime_stream(request):
+    """
+    GET /realtime/stream/?token=<access>&projects=1,2
+
+    Server-Sent Events for the signed-in user: their chat messages and task
+    results, plus typing and project events for the listed projects they
+    belong to. Needs an ASGI server (uvicorn) to hold many streams open.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    try:
+        requested = [int(pid) for pid in request.GET.get('projects', '').split(',') if pid.strip()]
+    except ValueError:
+        return JsonResponse({"error": "projects must be a comma-separated list of ids."}, status=400)
+
+    project_ids = await sync_to_async(_allowed_project_ids)(user, requested)
+    topics = [user_topic(user.id)] + [project_topic(pid) for pid in project_ids]
+
+    response = StreamingHttpResponse(_event_stream(topics), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # don't let nginx buffer the stream
+    return response
@@ -0,0 +1,198 @@
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from google import genai
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GRADER_MODEL = 'gemini-flash-latest'
+# ~12k chars is ~3k tokens: small enough for a fast, focused critique per chunk.
+CHUNK_CHARS = 12000
+MAX_PARALLEL_CHUNKS = 8
+
+SCORE_KEYS = ("completeness", "accuracy", "presentation")
+
+# Headings seen in student reports: "CHAPTER 3", "2.1 System Design",
+# "4. IMPLEMENTATION", or a bare well-known section name on its own line.
+HEADING_RE = re.compile(
+    r"^\s*(?:"
+    r"chapter\s+\d+.*"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z][^\n]{2,80}"
+    r"|(?:abstract|introduction|literature\s+(?:review|survey)|methodology|system\s+(?:design|architecture|requirements?)"
+    r"|implementation|testing|results?(?:\s+and\s+discussion)?|conclusions?(?:\s+and\s+future\s+(?:work|scope))?"
+    r"|future\s+(?:work|scope)|references|bibliography|appendix(?:\s+\w+)?)\s*:?"
+    r")\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+MAP_PROMPT = """
+You are a Senior Technical Lead reviewing PART {index} of {total} of a student's project report.
+Sections in this part: {sections}
+
+Review only this part. Output JSON:
+{{
+    "summary": "2-3 sentences on what this part covers",
+    "strengths": ["..."],
+    "weaknesses": ["..."],
+    "scores": {{ "completeness": 0-10, "accuracy": 0-10, "presentation": 0-10 }}
+}}
+
+--- REPORT PART ---
+{text}
+"""
+
+REDUCE_PROMPT = """
+You are a Senior Technical Lead. You reviewed a student's project report in {total} parts;
+the per-part notes are below, in document order. Write the final review of the whole report.
+
+Averaged part scores: {scores}
+
+Per-part notes:
+{notes}
+
+Output JSON:
+{{
+    "feedback": "Detailed critique of the whole report (structure, technical depth, gaps, presentation), in Markdown",
+    "scores": {{ "completeness": 0-10, "accuracy": 0-10, "presentation": 0-10 }}
+}}
+"""
+
+
+def split_report_sections(text):
+    """Splits report text at detected headings into [(heading, body), ...]."""
+    matches = list(HEADING_RE.finditer(text))
+    if not matches:
+        return [("Report", text)]
+
+    sections = []
+    if matches[0].start() > 0 and text[:matches[0].start()].strip():
+        sections.append(("Front Matter", text[:matches[0].start()]))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append((match.group(0).strip(), text[match.start():end]))
+    return sections
+
+
+def pack_chunks(sections, chunk_chars=CHUNK_CHARS):
+    """
+    Packs consecutive sections into chunks of at most `chunk_chars`, never
+    splitting a section unless it is larger than a chunk on its own (then it
+    is split on paragraph boundaries). Returns [(section_titles, text), ...].
+    """
+    chunks = []
+    titles, parts, size = [], [], 0
+
+    def flush():
+        nonlocal titles, parts, size
+        if parts:
+            chunks.append((titles, "".join(parts)))
+        titles, parts, size = [], [], 0
+
+    for heading, body in sections:
+        if len(body) > chunk_chars:
+            flush()
+            piece = ""
+            for paragraph in re.split(r"(\n\s*\n)", body):
+                if piece and len(piece) + len(paragraph) > chunk_chars:
+                    chunks.append(([heading], piece))
+                    piece = ""
+                piece += paragraph
+                while len(piece) > chunk_chars: # one giant paragraph
+                    chunks.append(([heading], piece[:chunk_chars]))
+                    piece = piece[chunk_chars:]
+            if piece.strip():
+                chunks.append(([heading], piece))
+            continue
+
+        if size + len(body) > chunk_chars:
+            flush()
+        titles.append(heading)
+        parts.append(body)
+        size += len(body)
+
+    flush()
+    return chunks
+
+
+class ReportGrader:
+    """
+    Map-reduce grading of a long report.
+    Map: every chunk is critiqued in parallel, each pinned to a different
+    Gemini key so the pool's rate limits are spread out.
+    Reduce: the per-chunk notes and length-weighted scores are merged into
+    the final feedback.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.clients = [genai.Client(api_key=key) for key in analyzer.api_keys]
+        # The analyzer's own fallback chain rotates shared keys; don't run it concurrently.
+        self._fallback_lock = threading.Lock()
+
+    def _ask(self, prompt, key_index, task_name):
+        # Try the assigned key first, then the rest of the pool
+        for offset in range(len(self.clients)):
+            client = self.clients[(key_index + offset) % len(self.clients)]
+            try:
+                response = client.models.generate_content(model=GRADER_MODEL, contents=prompt)
+                return response.text.strip()
+            except Exception as e:
+                logger.warning(f"⚠️ {task_name}: Gemini key #{(key_index + offset) % len(self.clients) + 1} failed: {e}")
+
+        with self._fallback_lock:
+            return self.analyzer._ask_ai_gemini_first(prompt, task_name, expect_json=True)
+
+    def _map_chunk(self, index, total, titles, text):
+        prompt = MAP_PROMPT.format(index=index + 1, total=total, sections=", ".join(titles), text=text)
+        raw = self._ask(prompt, index, f"Report Part {index + 1}/{total}")
+        data = self.analyzer._extract_json(raw) if raw else None
+        if not data:
+            return {"summary": (raw or "")[:1000], "strengths": [], "weaknesses": [], "scores": {}}
+        return data
+
+    def grade(self, text):
+        chunks = pack_chunks(split_report_sections(text))
+        total = len(chunks)
+        logger.info(f"Grading report: {len(text)} chars in {total} chunks")
+
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_CHUNKS, total)) as pool:
+            notes = list(pool.map(
+                lambda args: self._map_chunk(args[0], total, *args[1]),
+                enumerate(chunks),
+            ))
+
+        # Length-weighted average of the part scores
+        averages = {}
+        for key in SCORE_KEYS:
+            weighted, weight = 0.0, 0
+            for (titles, chunk_text), note in zip(chunks, notes):
+                try:
+                    value = float((note.get("scores") or {}).get(key))
+                except (TypeError, ValueError):
+                    continue
+                weighted += value * len(chunk_text)
+                weight += len(chunk_text)
+            averages[key] = round(weighted / weight, 1) if weight else None
+
+        notes_text = "\n\n".join(
+            f"PART {i + 1} ({', '.join(titles)}):\n"
+            f"Summary: {note.get('summary', '')}\n"
+            f"Strengths: {'; '.join(map(str, note.get('strengths') or []))}\n"
+            f"Weaknesses: {'; '.join(map(str, note.get('weaknesses') or []))}"
+            for i, ((titles, _), note) in enumerate(zip(chunks, notes))
+        )
+        raw = self._ask(
+            REDUCE_PROMPT.format(total=total, scores=averages, notes=notes_text),
+            total,
+            "Report Reduce",
+        )
+        data = self.analyzer._extract_json(raw) if raw else None
+
+        if data and data.get("feedback"):
+            scores = {**averages, **(data.get("scores") or {})}
+            return {"feedback": data["feedback"], "scores": scores}
+        # Reduce step failed: the part notes are still a usable review
+        return {"feedback": raw or notes_text, "scores": averages}
@@ -50,6 +50,9 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Cursor headers set by authentication.pagination.KeysetPagination
+CORS_EXPOSE_HEADERS = ['X-Latest-Cursor', 'X-Oldest-Cursor', 'X-Has-More']
+
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:5173",
 #     "https://collage-project-main-zkm2-8y5yr4czk-avinashs-projects-df1b1dea.vercel.app",
@@ -87,6 +90,19 @@ DATABASES = {
     )
 }
 
+# Shared Redis (optional). The cache holds state every process must agree on
+# (dashboard counters, ranks, token staleness marks), and run_workers writes it
+# from its own process, so production should set REDIS_URL. Without it each
+# process has a private local-memory cache that other processes can't invalidate.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator' },
     { 'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator' },
@@ -103,7 +119,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that trusts fresh token claims on safe requests
+        'authentication.tokens.ClaimsJWTAuthentication',
     ),
 }
 
@@ -119,9 +136,12 @@ DJOSER = {
 }
 
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=2),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Short-lived: it bounds how long a role change can go unseen (authentication/tokens.py);
+    # the frontend trades the refresh token for a new access token on a 401
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=2),
     'USER_MODEL': 'authentication.User',
+    'TOKEN_OBTAIN_SERIALIZER': 'authentication.tokens.ClaimsTokenObtainPairSerializer',
 }
 
 MEDIA_URL = '/media/'
@@ -145,3 +165,12 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 GROQ_KEY_POOL = os.environ.get("GROQ_KEY_POOL", "[]") # Expects JSON string of list
+
+# Realtime push (project_management/realtime.py). InMemoryBroker only reaches
+# streams in its own process; events from run_workers or other web processes
+# need RedisBroker, picked when REDIS_URL is set.
+REALTIME_BROKER = os.environ.get(
+    "REALTIME_BROKER",
+    "project_management.realtime.RedisBroker" if REDIS_URL else "project_management.realtime.InMemoryBroker",
+)
+REALTIME_BROKER_URL = os.environ.get("REALTIME_BROKER_URL", REDIS_URL or "redis://localhost:6379/0")
@@ -4,6 +4,7 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 from .mentor_views import ProjectMentorChatView, MCPToolView, ProjectMentorChatMCPView, AIVivaMCPView, TeacherChatMCPView
+from .realtime_views import realtime_stream
 from authentication.views import (
     ProjectSubmissionView,
     TeacherDashboardView,
@@ -60,6 +61,9 @@ from authentication.views import (
     ProjectIssuesView, # <-- NEW
 
     ProjectAutoFixView, # <-- NEW (PR Agent)
+    ProjectJobStatusView,
+    BackgroundTaskStatusView,
+    BackgroundTaskQueueView,
     ProjectChatCodebaseView, # <-- NEW (RAG)
     TeamMemberView, # <-- ADD
     StudentMyProjectView, 
@@ -143,6 +147,9 @@ urlpatterns = [
     path('projects/<int:project_id>/issues/analyze/', ProjectIssuesView.as_view(), name='project-issues-analyze'), # <-- NEW
 
     path('projects/<int:project_id>/auto-fix/', ProjectAutoFixView.as_view(), name='project-auto-fix'), # <-- NEW (PR Agent)
+    path('projects/<int:project_id>/jobs/<str:job_id>/', ProjectJobStatusView.as_view(), name='project-job-status'),
+    path('tasks/queue/', BackgroundTaskQueueView.as_view(), name='task-queue'),
+    path('tasks/<int:task_id>/', BackgroundTaskStatusView.as_view(), name='task-status'),
     path('projects/<int:project_id>/chat-codebase/', ProjectChatCodebaseView.as_view(), name='project-chat-codebase'), # <-- NEW (RAG)
     path('progress-updates/<int:update_id>/decision/', ProgressUpdateDecisionView.as_view(), name='progress-update-decision'), 
 
@@ -185,6 +192,9 @@ urlpatterns = [
     
     # MCP Server Endpoint
     path('api/mcp/', MCPToolView.as_view(), name='django-mcp-server'),
+
+    # Realtime push (Server-Sent Events)
+    path('realtime/stream/', realtime_stream, name='realtime-stream'),
 ]
 
 if settings.DEBUG:
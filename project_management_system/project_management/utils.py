@@ -4,11 +4,19 @@ import tempfile
 import time
 import logging
 from django.core.cache import cache
-from authentication.models import Project, VivaSession, ProgressUpdate
+from django.db.models import Prefetch
+from authentication.models import (
+    Project, VivaSession, VivaQuestion, ProgressUpdate, ProjectArtifact, CodeReview, ProjectContextSnapshot
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Images sent to the vision model are downscaled to this longest edge and
+# re-encoded as JPEG; a 12MP phone photo drops from ~4MB to ~150KB.
+MODEL_IMAGE_MAX_EDGE = 1600
+MODEL_IMAGE_QUALITY = 80
+
 # Simple in-memory cache: { "url": (timestamp, content) }
 REPO_CACHE = {}
 CACHE_DURATION = 600  # 10 minutes
@@ -129,17 +137,99 @@ def clone_and_read_repo(repo_url: str) -> str:
         logger.error(f"Error processing repository: {str(e)}")
         return f"Error processing repository: {str(e)}"
 
-def _build_project_context(project: Project, user_prompt: str = "") -> str:
+def downscale_image_for_model(file_obj, max_edge=MODEL_IMAGE_MAX_EDGE, quality=MODEL_IMAGE_QUALITY):
     """
-    Comprehensive Context Builder.
-    Includes:
-    1. Project Basics & Student Info
-    2. Initial AI Scores
-    3. Progress Update History (with Sentiment)
-    4. Viva Examination History
-    5. Artifacts (Screenshots/Code) - Full text
-    6. Documentation (PDF) - AI Feedback + Truncated Text
+    Reads an image from an open file object and returns a BytesIO holding a
+    JPEG no larger than `max_edge` on its longest side.
+    PIL decodes from the file handle directly, and for JPEGs `draft()` lets
+    the decoder skip straight to a reduced scale, so the full-size bitmap is
+    never held in memory.
+    """
+    import io
+    from PIL import Image, ImageOps
+
+    with Image.open(file_obj) as image:
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Diagrams are often transparent PNGs; flatten onto white for JPEG
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+
+    output.seek(0)
+    return output
+
+# How much history goes into the AI context (keeps prompts under provider limits)
+CONTEXT_PROGRESS_LOGS = 5
+CONTEXT_VIVA_SESSIONS = 15
+CONTEXT_QUESTIONS_PER_SESSION = 5
+CONTEXT_CODE_REVIEWS = 3
+CONTEXT_REPORT_CHARS = 30000
+
+def _progress_logs_queryset():
+    return ProgressUpdate.objects.select_related('author').order_by('-created_at')
+
+def _viva_sessions_queryset():
+    return VivaSession.objects.select_related('student').prefetch_related(
+        Prefetch(
+            'questions',
+            queryset=VivaQuestion.objects.order_by('id')[:CONTEXT_QUESTIONS_PER_SESSION],
+            to_attr='context_questions',
+        )
+    ).order_by('-created_at')
+
+def project_context_queryset():
     """
+    Project queryset that loads everything _build_project_context reads in a
+    fixed number of queries (8), however many logs, sessions or members exist.
+    The 'latest N' limits are applied inside the prefetches.
+    """
+    return Project.objects.select_related(
+        'submission__student', 'submission__group', 'team'
+    ).prefetch_related(
+        'team__members',
+        'submission__group__students',
+        Prefetch(
+            'progress_updates',
+            queryset=_progress_logs_queryset()[:CONTEXT_PROGRESS_LOGS],
+            to_attr='context_progress_logs',
+        ),
+        Prefetch(
+            'viva_sessions',
+            queryset=_viva_sessions_queryset()[:CONTEXT_VIVA_SESSIONS],
+            to_attr='context_viva_sessions',
+        ),
+        Prefetch(
+            'artifacts',
+            queryset=ProjectArtifact.objects.order_by('uploaded_at'),
+            to_attr='context_artifacts',
+        ),
+        Prefetch(
+            'code_reviews',
+            queryset=CodeReview.objects.order_by('-uploaded_at')[:CONTEXT_CODE_REVIEWS],
+            to_attr='context_code_reviews',
+        ),
+    )
+
+def _display_name(user):
+    if user.first_name:
+        return f"{user.first_name} {user.last_name}"
+    return user.username
+
+# Each section reads the prefetched lists when the project came from
+# project_context_queryset(), and otherwise queries only its own data, so a
+# signal can rebuild one section without loading the others.
+
+def _context_overview(project):
     # 1. Basic Info
     context = f"PROJECT REPORT (ID: {project.id})\n"
     context += f"Title: {project.title}\n"
@@ -150,117 +240,193 @@ def _build_project_context(project: Project, user_prompt: str = "") -> str:
         context += f"GitHub Repo: {project.github_repo_link}\n"
     
     # Include Audit Scores if available
-    try:
-        if project.audit_security_score:
-             context += f"Security Score: {project.audit_security_score}/100\n"
-        if project.audit_quality_score:
-             context += f"Quality Score: {project.audit_quality_score}/100\n"
-    except:
-        pass
+    if project.audit_security_score:
+         context += f"Security Score: {project.audit_security_score}/100\n"
+    if project.audit_quality_score:
+         context += f"Quality Score: {project.audit_quality_score}/100\n"
 
     # Include Audit Report Summary (Key Findings) if available
     if project.audit_report:
-        try:
-            # Assuming audit_report is a dict with 'summary' or similar
-            if isinstance(project.audit_report, dict):
-                summary = project.audit_report.get('summary', '') or project.audit_report.get('executive_summary', '')
-                if summary:
-                    context += f"Latest Audit Summary: {summary}\n"
-            else:
-                 context += f"Latest Audit Summary: {str(project.audit_report)[:500]}...\n"
-        except:
-            pass
+        if isinstance(project.audit_report, dict):
+            summary = project.audit_report.get('summary', '') or project.audit_report.get('executive_summary', '')
+            if summary:
+                context += f"Latest Audit Summary: {summary}\n"
+        else:
+             context += f"Latest Audit Summary: {str(project.audit_report)[:500]}...\n"
 
     # 2. Student & Team Info
-    # Handle potential missing submission link inverse
-    student = None
-    if hasattr(project, 'submission') and project.submission:
-         student = project.submission.student
-    else:
-         # Fallback: try to find via related name or assume generic
-         student_str = "Unknown"
-
-    if student:
-        context += f"\nSTUDENT/TEAM DETAILS\n"
-        context += f"Lead Student: {student.first_name} {student.last_name} (Username: {student.username})\n"
-        context += f"Email: {student.email}\n"
+    sub = project.submission
+    student = sub.student
+    context += f"\nSTUDENT/TEAM DETAILS\n"
+    context += f"Lead Student: {student.first_name} {student.last_name} (Username: {student.username})\n"
     
     # Check for Group/Team
-    if hasattr(project, 'team') and project.team:
+    if hasattr(project, 'team'):
         context += f"Team Members:\n"
         for member in project.team.members.all():
             context += f"- {member.first_name} {member.last_name} ({member.username})\n"
-    elif hasattr(project, 'submission') and project.submission and project.submission.group:
-        context += f"Group: {project.submission.group.name}\n"
+    elif sub.group:
+        context += f"Group: {sub.group.name}\n"
         context += f"Group Members (Potential):\n"
-        for member in project.submission.group.students.all():
+        for member in sub.group.students.all():
             context += f"- {member.first_name} {member.last_name} ({member.username})\n"
     
-    
+    context += f"Email: {student.email}\n"
+
     # 3. Initial AI Evaluation
-    if hasattr(project, 'submission') and project.submission:
-        sub = project.submission
-        context += f"\nINITIAL PROPOSAL EVALUATION\n"
-        context += f"Relevance Score: {sub.relevance_score}/10\n"
-        context += f"Feasibility Score: {sub.feasibility_score}/10\n"
-        context += f"Innovation Score: {sub.innovation_score}/10\n"
-        context += f"Abstract: {sub.abstract_text}\n"
-
-    # 4. PROGRESS UPDATE HISTORY
-    # Limit to last 5 updates to save tokens
-    progress_logs = ProgressUpdate.objects.filter(project=project).order_by('-created_at')[:5]
-    # Re-reverse to show in chronological order
-    progress_logs = reversed(list(progress_logs))
-    
-    context += f"\nPROGRESS UPDATE HISTORY (Last 5 items)\n"
-    
-    # We iterate over the list now, not the queryset directly
-    has_logs = False
-    for i, log in enumerate(progress_logs, 1):
-        has_logs = True
+    context += f"\nINITIAL PROPOSAL EVALUATION\n"
+    context += f"Relevance Score: {sub.relevance_score}/10\n"
+    context += f"Feasibility Score: {sub.feasibility_score}/10\n"
+    context += f"Innovation Score: {sub.innovation_score}/10\n"
+    context += f"Abstract: {sub.abstract_text}\n"
+    return context
+
+def _context_progress(project):
+    logs = getattr(project, 'context_progress_logs', None)
+    if logs is None:
+        logs = list(_progress_logs_queryset().filter(project=project)[:CONTEXT_PROGRESS_LOGS])
+
+    # 4. PROGRESS UPDATE HISTORY (chronological)
+    context = f"\nPROGRESS UPDATE HISTORY (Last {CONTEXT_PROGRESS_LOGS} items)\n"
+    for i, log in enumerate(reversed(logs), 1):
         context += f"\n-- Log {i} ({log.created_at.strftime('%Y-%m-%d')}) --\n"
-        author_name = "Unknown"
-        if log.author:
-            author_name = log.author.username
-            if hasattr(log.author, 'first_name') and log.author.first_name:
-                author_name = f"{log.author.first_name} {log.author.last_name}"
-        
-        context += f"Author: {author_name}\n"
-        # Truncate very long log text
-        log_text = log.update_text if len(log.update_text) < 500 else log.update_text[:500] + "..."
-        context += f"Report: {log_text}\n"
-        sentiment = getattr(log, 'sentiment', 'N/A')
-        context += f"Sentiment: {sentiment}\n"
+        context += f"Author: {_display_name(log.author)}\n"
+        # Truncate long text
+        text = log.update_text if len(log.update_text) < 500 else log.update_text[:500] + "..."
+        context += f"Report: {text}\n"
+        context += f"Sentiment: {log.sentiment or 'N/A'}\n"
         context += f"AI-Suggested Progress: {log.ai_suggested_percentage}%\n"
-
-    if not has_logs:
+    
+    if not logs:
         context += "No progress logs have been submitted yet.\n"
+    return context
 
-    # 5. VIVA HISTORY
-    # Limit to last 3 sessions
-    viva_sessions = VivaSession.objects.filter(project=project).order_by('-created_at')[:3]
-    viva_sessions = reversed(list(viva_sessions))
-    
-    context += f"\nVIVA EXAMINATION HISTORY (Last 3 sessions)\n"
-    
-    has_viva = False
-    for i, session in enumerate(viva_sessions, 1):
-        has_viva = True
-        s_name = "Unknown"
-        if session.student:
-            s_name = session.student.username
-            if hasattr(session.student, 'first_name') and session.student.first_name:
-                    s_name = f"{session.student.first_name} {session.student.last_name}"
-        
-        context += f"\n-- Session {i} ({session.created_at.strftime('%Y-%m-%d')}) - Student: {s_name} --\n"
-        for q in session.questions.all()[:3]: # Limit questions per session too
+def _context_viva(project):
+    sessions = getattr(project, 'context_viva_sessions', None)
+    if sessions is None:
+        sessions = list(_viva_sessions_queryset().filter(project=project)[:CONTEXT_VIVA_SESSIONS])
+
+    # 5. VIVA HISTORY (chronological)
+    context = f"\nVIVA EXAMINATION HISTORY (Last {CONTEXT_VIVA_SESSIONS} sessions)\n"
+    for i, session in enumerate(reversed(sessions), 1):
+        context += f"\n-- Session {i} ({session.created_at.strftime('%Y-%m-%d')}) - Student: {_display_name(session.student)} --\n"
+        scores = []
+        for q in session.context_questions:
             context += f"Q: {q.question_text}\n"
-            a_text = q.student_answer if q.student_answer else 'Not answered'
-            if len(a_text) > 200: a_text = a_text[:200] + "..." # Truncate answers
-            context += f"A: {a_text}\n"
+            ans = q.student_answer if q.student_answer else 'Not answered'
+            if len(ans) > 200: ans = ans[:200] + "..."
+            context += f"A: {ans}\n"
             context += f"Score: {q.ai_score}/10\n"
+            context += f"Feedback: {q.ai_feedback}\n"
+            if q.ai_score is not None:
+                scores.append(q.ai_score)
+        avg_score = (sum(scores) / len(scores)) if scores else 0
+        context += f"Avg Score for Session {i}: {avg_score:.1f}/10\n"
 
-    if not has_viva:
+    if not sessions:
         context += "No viva sessions have been attempted yet.\n"
-        
     return context
+
+def _context_artifacts(project):
+    artifacts = getattr(project, 'context_artifacts', None)
+    if artifacts is None:
+        artifacts = list(project.artifacts.order_by('uploaded_at'))
+
+    # 6. PROJECT ARTIFACTS (Screenshots & Code)
+    context = f"\nPROJECT DOCUMENTS & SCREENSHOTS ({len(artifacts)} files)\n"
+    if not artifacts:
+        context += "No screenshots or documents have been uploaded.\n"
+    for i, art in enumerate(artifacts, 1):
+        context += f"\n-- Document {i} (Uploaded: {art.uploaded_at.strftime('%Y-%m-%d')}) --\n"
+        context += f"Description: {art.description}\n"
+        context += f"AI Auto-Tags: {art.ai_tags}\n"
+        context += f"EXTRACTED TEXT CONTENT:\n{art.extracted_text}\n"
+    return context
+
+def _context_documentation(project):
+    # 7. DOCUMENTATION (PDF Report)
+    if not project.final_report:
+        return "\nNo full documentation uploaded.\n"
+
+    context = f"\nFULL PROJECT DOCUMENTATION (PDF)\n"
+    context += f"Status: Uploaded\n"
+    
+    # A. The AI Critique
+    if project.ai_report_feedback:
+         context += f"AI CRITIQUE:\n{project.ai_report_feedback}\n"
+    
+    # B. The Actual Content (Truncated to prevent errors)
+    if project.final_report_content:
+         context += f"PDF FULL TEXT CONTENT (First {CONTEXT_REPORT_CHARS // 1000}k chars):\n"
+         context += f"{project.final_report_content[:CONTEXT_REPORT_CHARS]}\n"
+         if len(project.final_report_content) > CONTEXT_REPORT_CHARS:
+            context += "\n...(Text truncated for API limits)...\n"
+    return context
+
+def _context_code_reviews(project):
+    reviews = getattr(project, 'context_code_reviews', None)
+    if reviews is None:
+        reviews = list(project.code_reviews.order_by('-uploaded_at')[:CONTEXT_CODE_REVIEWS])
+
+    # 8. CODE REVIEWS
+    if not reviews:
+        return ""
+    context = "\n--- RECENT CODE REVIEWS ---\n"
+    for rev in reviews:
+        context += f"- File: {rev.file_name} (Score: Sec {rev.security_score}/10, Qual {rev.quality_score}/10)\n"
+        context += f"  AI Feedback: {(rev.ai_feedback or '')[:200]}...\n"
+    return context
+
+# Snapshot field -> section builder, in document order
+CONTEXT_SECTIONS = {
+    'overview': _context_overview,
+    'progress': _context_progress,
+    'viva': _context_viva,
+    'artifacts': _context_artifacts,
+    'documentation': _context_documentation,
+    'code_reviews': _context_code_reviews,
+}
+
+def _build_project_context(project: Project, user_prompt: str = "") -> str:
+    """
+    Comprehensive Context Builder (always rebuilt from the database).
+    Includes:
+    1. Project Basics & Student Info
+    2. Initial AI Scores
+    3. Progress Update History (with Sentiment)
+    4. Viva Examination History
+    5. Artifacts (Screenshots/Code) - Full text
+    6. Documentation (PDF) - AI Feedback + Truncated Text
+    7. Recent Code Reviews
+    Prefer get_project_context(), which reads the stored snapshot.
+    """
+    # Reload through the prefetching queryset unless the caller already did
+    if not hasattr(project, 'context_progress_logs'):
+        project = project_context_queryset().get(id=project.id)
+    return "".join(build(project) for build in CONTEXT_SECTIONS.values())
+
+def refresh_project_context(project_id, sections=None):
+    """
+    Rebuilds the given snapshot sections (all when None) for one project.
+    Called from the post_save signals in authentication.signals.
+    """
+    snapshot = ProjectContextSnapshot.objects.filter(project_id=project_id).first()
+    if snapshot is None or sections is None:
+        project = project_context_queryset().get(id=project_id)
+        sections = list(CONTEXT_SECTIONS)
+    else:
+        project = Project.objects.select_related('submission__student', 'submission__group').get(id=project_id)
+
+    # update_or_create re-reads instead of failing when a concurrent first build inserts the row first
+    snapshot, _ = ProjectContextSnapshot.objects.update_or_create(
+        project_id=project_id,
+        defaults={section: CONTEXT_SECTIONS[section](project) for section in sections},
+    )
+    return snapshot
+
+def get_project_context(project: Project) -> str:
+    """The project's AI context, read from its snapshot row (built on first use)."""
+    snapshot = ProjectContextSnapshot.objects.filter(project_id=project.id).first()
+    if snapshot is None:
+        snapshot = refresh_project_context(project.id)
+    return snapshot.as_text()